@@ -0,0 +1,66 @@
+"""
+Drive Client Micro-benchmark
+
+Compares the per-call cost of building a fresh Drive service (the old
+behaviour of every DriveService method) with fetching one from the
+DriveClientPool. No network calls are made: each iteration builds a
+files().list request without executing it.
+
+Usage (from the backend directory):
+    python -m benchmarks.drive_client_benchmark --iterations 200 --threads 8
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+import google_auth_httplib2
+import httplib2
+
+from src.services.drive_client_pool import DriveClientPool
+
+
+def _fresh_service(credentials: Credentials):
+    authed_http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=60))
+    return build('drive', 'v3', http=authed_http)
+
+
+def _run(get_service, iterations: int, threads: int) -> float:
+    """Return the mean seconds per call across all threads."""
+    def work(_):
+        for _ in range(iterations):
+            get_service().files().list(pageSize=1, fields="files(id)")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return (time.perf_counter() - start) / (iterations * threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per thread")
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    # A token without expiry never triggers a refresh, so nothing leaves the process
+    credentials = Credentials(token="benchmark-token")
+    pool = DriveClientPool(get_credentials=lambda: credentials)
+
+    fresh = _run(lambda: _fresh_service(credentials), args.iterations, args.threads)
+    pooled = _run(pool.get_service, args.iterations, args.threads)
+
+    print(json.dumps({
+        "iterations": args.iterations,
+        "threads": args.threads,
+        "fresh_build_ms_per_call": round(fresh * 1000, 4),
+        "pooled_ms_per_call": round(pooled * 1000, 4),
+        "speedup": round(fresh / pooled, 1) if pooled else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
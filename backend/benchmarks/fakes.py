@@ -0,0 +1,292 @@
+"""
+In-process stand-ins for Google Drive and OpenAI used by the offline suite.
+
+FakeDriveService serves a synthetic corpus of Docs, Sheets and PDFs through
+the same methods ingestion calls on DriveService. FakeOpenAI answers
+embeddings and chat completion calls (sync, async and streaming) in the shape
+the openai package returns. Both sleep for a configurable latency per call so
+that network-bound behaviour such as concurrency and batching shows up in the
+measurements. Embeddings come from the local feature-hashing model, so search
+results are still meaningful.
+"""
+
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+from src.services.embedding_provider import LocalEmbeddingProvider
+from src.services.folder_tree import FOLDER_MIME_TYPE, FolderTree
+from src.types import MimeType
+
+WORDS = (
+    "invoice budget contract renewal quarterly revenue forecast hiring roadmap launch "
+    "customer churn pricing discount vendor audit compliance security incident backlog "
+    "migration database latency capacity outage postmortem onboarding training payroll "
+    "expense travel policy approval milestone deadline proposal margin inventory supplier "
+    "shipment warehouse region strategy partnership license retention survey feedback"
+).split()
+
+
+@dataclass
+class CorpusSpec:
+    """Size and file mix of a synthetic Drive."""
+
+    files: int = 200
+    docs_share: float = 0.6
+    sheets_share: float = 0.2
+    pdfs_share: float = 0.2
+    doc_kb: int = 8
+    sheet_rows: int = 200
+    pdf_pages: int = 5
+    folders: int = 10
+    seed: int = 7
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_doc(rng: random.Random, size_kb: int) -> str:
+    """Plain text with headings and paragraphs, about size_kb long."""
+    parts = []
+    size = 0
+    section = 1
+    while size < size_kb * 1024:
+        if not parts or rng.random() < 0.15:
+            heading = f"{section}. {rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}"
+            parts.append(heading)
+            section += 1
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+        parts.append(paragraph)
+        size += len(paragraph)
+    return "\n\n".join(parts)
+
+
+def make_sheet(rng: random.Random, rows: int) -> str:
+    """CSV export of a sheet with a header row."""
+    lines = ["id,region,category,amount,owner,notes"]
+    for i in range(rows):
+        lines.append(
+            f"{i},{rng.choice(WORDS)},{rng.choice(WORDS)},{rng.randint(10, 99999)},"
+            f"{rng.choice(WORDS)},\"{_sentence(rng)}\""
+        )
+    return "\n".join(lines)
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """A minimal PDF with one page per text, extractable by PyPDF2."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        lines = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.split("\n")]
+        stream = ("BT /F1 10 Tf 12 TL 50 750 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % (i + 1) + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return out
+
+
+def make_pdf_pages(rng: random.Random, pages: int) -> List[str]:
+    # About 40 short lines per page, a typical text page
+    return [
+        "\n".join(" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(40))
+        for _ in range(pages)
+    ]
+
+
+def build_corpus(spec: CorpusSpec) -> Tuple[List[dict], Dict[str, bytes]]:
+    """Return (Drive listing including folders, content by file ID)."""
+    rng = random.Random(spec.seed)
+    listing = [
+        {"id": f"folder-{i}", "name": f"Folder {i}", "mimeType": FOLDER_MIME_TYPE, "parents": ["root"]}
+        for i in range(spec.folders)
+    ]
+    content: Dict[str, bytes] = {}
+    kinds = rng.choices(
+        (MimeType.DOCUMENT, MimeType.SPREADSHEET, MimeType.PDF),
+        weights=(spec.docs_share, spec.sheets_share, spec.pdfs_share),
+        k=spec.files
+    )
+    for i, kind in enumerate(kinds):
+        file_id = f"file-{i}"
+        if kind == MimeType.DOCUMENT:
+            data = make_doc(rng, spec.doc_kb).encode()
+        elif kind == MimeType.SPREADSHEET:
+            data = make_sheet(rng, spec.sheet_rows).encode()
+        else:
+            data = make_pdf(make_pdf_pages(rng, spec.pdf_pages))
+        content[file_id] = data
+        listing.append({
+            "id": file_id,
+            "name": f"{kind.name.title()} {i}",
+            "mimeType": kind.value,
+            "modifiedTime": "2024-01-01T00:00:00.000Z",
+            "md5Checksum": hashlib.md5(data).hexdigest(),
+            "size": str(len(data)),
+            "parents": [f"folder-{i % spec.folders}"] if spec.folders else [],
+            "webViewLink": f"https://drive.example/{file_id}",
+        })
+    return listing, content
+
+
+class FakeDriveService:
+    """Serves a synthetic corpus through the DriveService methods ingestion uses."""
+
+    def __init__(self, listing: List[dict], content: Dict[str, bytes], latency_ms: float = 50, mb_per_second: float = 50):
+        self.listing = listing
+        self.content = content
+        self.latency_seconds = latency_ms / 1000
+        self.mb_per_second = mb_per_second
+        self.folder_tree = FolderTree()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, size: int = 0) -> None:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_seconds + size / (self.mb_per_second * 1024 * 1024))
+
+    def is_authenticated(self) -> bool:
+        return True
+
+    def list_files(self, folder_id: Optional[str] = None, page_size: int = 100) -> List[dict]:
+        # One call per page of the listing
+        for _ in range(0, len(self.listing), 1000):
+            self._call()
+        return [dict(f) for f in self.listing if not folder_id or folder_id in f.get("parents", [])]
+
+    def get_start_page_token(self) -> str:
+        self._call()
+        return "1"
+
+    def list_changes(self, page_token: str, page_size: int = 1000) -> Tuple[List[dict], str]:
+        self._call()
+        return [], page_token
+
+    def get_file_metadata(self, file_id: str) -> dict:
+        self._call()
+        return next(dict(f) for f in self.listing if f["id"] == file_id)
+
+    def download_file_to(self, file_id: str, fh: BinaryIO) -> int:
+        data = self.content[file_id]
+        self._call(len(data))
+        fh.write(data)
+        return len(data)
+
+    def export_google_doc_to(self, file_id: str, fh: BinaryIO, mime_type: str = "text/plain") -> int:
+        return self.download_file_to(file_id, fh)
+
+
+class _Embeddings:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    def _respond(self, input, dimensions: Optional[int] = None):
+        texts = [input] if isinstance(input, str) else list(input)
+        self.owner.embedding_requests += 1
+        self.owner.embedded_texts += len(texts)
+        vectors = self.owner.embedder(dimensions).embed(texts)
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=vector, index=i) for i, vector in enumerate(vectors)],
+            usage=SimpleNamespace(prompt_tokens=0, total_tokens=0)
+        )
+
+    def create(self, model: str, input, dimensions: Optional[int] = None, **kwargs):
+        time.sleep(self.owner.embedding_latency_seconds)
+        return self._respond(input, dimensions)
+
+
+class _AsyncEmbeddings(_Embeddings):
+    async def create(self, model: str, input, dimensions: Optional[int] = None, **kwargs):
+        await asyncio.sleep(self.owner.embedding_latency_seconds)
+        return self._respond(input, dimensions)
+
+
+class _FakeStream:
+    """Async iterator of completion chunks with the close() of an openai stream."""
+
+    def __init__(self, owner: "FakeOpenAI", tokens: List[str]):
+        self.owner = owner
+        self.tokens = tokens
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.owner.chat_first_token_seconds)
+        for token in self.tokens:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            await asyncio.sleep(self.owner.chat_token_seconds)
+
+    async def close(self) -> None:
+        pass
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self.owner = owner
+
+    async def create(self, model: str, messages: List[dict], stream: bool = False, **kwargs):
+        self.owner.chat_requests += 1
+        tokens = [f"{WORDS[i % len(WORDS)]} " for i in range(self.owner.chat_tokens)]
+        if stream:
+            return _FakeStream(self.owner, tokens)
+        await asyncio.sleep(self.owner.chat_first_token_seconds + self.owner.chat_token_seconds * len(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(tokens)))])
+
+
+class FakeOpenAI:
+    """
+    Stand-in for the AsyncOpenAI client; sync_client() gives the matching
+    OpenAI client view. Both share the latency settings and counters.
+
+    Embedding calls take embedding_latency_ms each; chat completions take
+    chat_first_token_ms before the first of chat_tokens tokens and
+    chat_token_ms per token after that.
+    """
+
+    def __init__(
+        self,
+        embedding_latency_ms: float = 100,
+        chat_first_token_ms: float = 300,
+        chat_token_ms: float = 10,
+        chat_tokens: int = 150
+    ):
+        self.embedding_latency_seconds = embedding_latency_ms / 1000
+        self.chat_first_token_seconds = chat_first_token_ms / 1000
+        self.chat_token_seconds = chat_token_ms / 1000
+        self.chat_tokens = chat_tokens
+        self.embedding_requests = 0
+        self.embedded_texts = 0
+        self.chat_requests = 0
+        self._embedders: Dict[int, LocalEmbeddingProvider] = {}
+        self.embeddings = _AsyncEmbeddings(self)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def sync_client(self) -> SimpleNamespace:
+        return SimpleNamespace(embeddings=_Embeddings(self))
+
+    def embedder(self, dimensions: Optional[int]) -> LocalEmbeddingProvider:
+        dimensions = dimensions or 1536
+        if dimensions not in self._embedders:
+            self._embedders[dimensions] = LocalEmbeddingProvider(dimensions)
+        return self._embedders[dimensions]
@@ -0,0 +1,116 @@
+"""
+HNSW Parameter Benchmark
+
+Builds a Chroma collection for each HNSW parameter set over the same corpus
+and reports build time, recall@k against exact brute-force search and
+p50/p95/p99 single-query latency, so that HNSW_M, HNSW_CONSTRUCTION_EF and
+HNSW_SEARCH_EF can be chosen from measurements. Indexes are built in a
+temporary directory; the live collection is only read (--source collection).
+
+Usage (from the backend directory):
+    python -m benchmarks.hnsw_benchmark --vectors 20000 --dimensions 1536 --queries 200 --k 10
+    python -m benchmarks.hnsw_benchmark --params M=16,construction_ef=100,search_ef=10 \\
+        --params M=32,construction_ef=200,search_ef=100
+    python -m benchmarks.hnsw_benchmark --source file --vectors-file recorded.npy
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Dict, List
+
+import chromadb
+from chromadb.config import Settings
+import numpy as np
+
+from .vectors import exact_neighbours, load_vectors, recall, split_queries
+
+DEFAULT_PARAM_SETS = [
+    {"M": 16, "construction_ef": 100, "search_ef": 10},
+    {"M": 16, "construction_ef": 100, "search_ef": 50},
+    {"M": 16, "construction_ef": 100, "search_ef": 100},
+    {"M": 32, "construction_ef": 200, "search_ef": 50},
+    {"M": 32, "construction_ef": 200, "search_ef": 100},
+]
+
+
+def _parse_params(value: str) -> Dict[str, int]:
+    params = {}
+    for pair in value.split(","):
+        key, _, number = pair.partition("=")
+        if key.strip() not in ("M", "construction_ef", "search_ef"):
+            raise argparse.ArgumentTypeError(f"Unknown HNSW parameter '{key}'")
+        params[key.strip()] = int(number)
+    return params
+
+
+def _benchmark(client, name: str, params: Dict[str, int], corpus, queries, truth, k: int) -> dict:
+    collection = client.create_collection(
+        name=name,
+        metadata={"hnsw:space": "cosine", **{f"hnsw:{key}": value for key, value in params.items()}}
+    )
+    ids = [str(i) for i in range(len(corpus))]
+    batch_size = client.get_max_batch_size()
+
+    started = time.perf_counter()
+    for start in range(0, len(corpus), batch_size):
+        collection.add(ids=ids[start:start + batch_size], embeddings=corpus[start:start + batch_size].tolist())
+    build_seconds = time.perf_counter() - started
+
+    found: List[List[int]] = []
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        timings.append((time.perf_counter() - started) * 1000)
+        found.append([int(i) for i in result["ids"][0]])
+
+    client.delete_collection(name)
+    return {
+        "params": params,
+        "build_seconds": round(build_seconds, 2),
+        f"recall_at_{k}": recall(found, truth, k),
+        "query_p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "query_p99_ms": round(float(np.percentile(timings, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("synthetic", "collection", "file"), default="synthetic")
+    parser.add_argument("--vectors-file", help=".npy matrix of recorded vectors, for --source file")
+    parser.add_argument("--vectors", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--dimensions", type=int, default=1536, help="synthetic vector size")
+    parser.add_argument("--queries", type=int, default=200, help="held-out query vectors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--params", type=_parse_params, action="append",
+        help="a parameter set such as M=16,construction_ef=100,search_ef=10 (repeatable)"
+    )
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.source, args.vectors + args.queries, args.dimensions, args.seed, args.vectors_file)
+    corpus, queries = split_queries(vectors, args.queries, args.seed)
+    truth = exact_neighbours(corpus, queries, args.k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        for i, params in enumerate(args.params or DEFAULT_PARAM_SETS):
+            results.append(_benchmark(client, f"hnsw_benchmark_{i}", params, corpus, queries, truth, args.k))
+
+    print(json.dumps({
+        "source": args.source,
+        "vectors": len(corpus),
+        "dimensions": corpus.shape[1],
+        "queries": len(queries),
+        "k": args.k,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline Benchmark Suite
+
+Runs ingestion, search and chat end to end against in-process stand-ins for
+Google Drive and OpenAI (see benchmarks.fakes), so performance can be measured
+without credentials or network access and compared between commits. All
+indexes and caches are created in a temporary directory.
+
+Reports ingestion files/s and chunks/s, search latency per mode and chat
+latency (plus streaming time to first token) as flat JSON metrics. With
+--baseline, the run is compared with an earlier --output file and the exit
+status is 1 if any metric regressed by more than --tolerance.
+
+Usage (from the backend directory):
+    python -m benchmarks.offline_suite --files 200 --output bench.json
+    python -m benchmarks.offline_suite --files 200 --baseline bench.json --tolerance 0.1
+    python -m benchmarks.offline_suite --docs 0.2 --sheets 0.2 --pdfs 0.6 --embed-latency-ms 300
+"""
+
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Metrics where a higher value is better; for the others (latencies, memory) lower is better
+HIGHER_IS_BETTER_SUFFIXES = ("_per_second",)
+# Counters reported for context that aren't compared
+INFORMATIONAL_METRICS = ("ingest_files", "ingest_chunks", "embedding_requests", "answer_cache_hits")
+
+
+def _isolate_state(directory: str) -> None:
+    """Point every index, cache and provider setting at the benchmark's own state."""
+    # Must run before any src module is imported, since their singletons read these at import
+    os.environ.update({
+        "CHROMA_DB_PATH": os.path.join(directory, "chroma_db"),
+        "INDEX_STATE_PATH": os.path.join(directory, "index_state.db"),
+        "LEXICAL_INDEX_PATH": os.path.join(directory, "lexical_index.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(directory, "embedding_cache.db"),
+        "QUANTIZED_INDEX_PATH": os.path.join(directory, "quantized_index.db"),
+        "DRIVE_CATALOG_PATH": os.path.join(directory, "drive_catalog.db"),
+        "SLOW_QUERY_LOG_PATH": os.path.join(directory, "slow_queries.log"),
+        "EMBEDDING_PROVIDER": "openai",
+        "OPENAI_API_KEY": "offline-benchmark",
+    })
+
+
+def _percentiles(prefix: str, timings: List[float]) -> Dict[str, float]:
+    return {
+        f"{prefix}_p{p}_ms": round(float(np.percentile(timings, p)), 2) for p in (50, 95, 99)
+    } if timings else {}
+
+
+def _queries(count: int, words: List[str], seed: int, template: str = "{}") -> List[str]:
+    # Unique queries, so the query and answer caches don't turn the runs into cache lookups
+    rng = random.Random(seed)
+    queries = set()
+    while len(queries) < count:
+        queries.add(template.format(" ".join(rng.sample(words, 3))))
+    return sorted(queries)
+
+
+async def _timed_concurrently(calls, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def run(call):
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(run(call) for call in calls))
+    return timings
+
+
+async def _run_suite(args) -> Dict[str, float]:
+    from src.services import ingestion_service as ingestion_module
+    from src.services.answer_cache import answer_cache
+    from src.services.chat_service import chat_service
+    from src.services.embedding_provider import OpenAIEmbeddingProvider, embedding_provider
+    from src.services.index_state import index_state
+    from src.services.pdf_extractor import pdf_extractor
+    from src.tools.search_tool import search_documents
+    from src.types import ChatRequest
+    from .fakes import WORDS, CorpusSpec, FakeDriveService, FakeOpenAI, build_corpus
+
+    spec = CorpusSpec(
+        files=args.files,
+        docs_share=args.docs,
+        sheets_share=args.sheets,
+        pdfs_share=args.pdfs,
+        doc_kb=args.doc_kb,
+        sheet_rows=args.sheet_rows,
+        pdf_pages=args.pdf_pages,
+        seed=args.seed
+    )
+    listing, content = build_corpus(spec)
+    drive = FakeDriveService(listing, content, latency_ms=args.drive_latency_ms, mb_per_second=args.drive_mbps)
+    openai = FakeOpenAI(
+        embedding_latency_ms=args.embed_latency_ms,
+        chat_first_token_ms=args.chat_first_token_ms,
+        chat_token_ms=args.chat_token_ms,
+        chat_tokens=args.chat_tokens
+    )
+
+    if not isinstance(embedding_provider, OpenAIEmbeddingProvider):
+        raise SystemExit("The offline suite measures the OpenAI embedding path; unset EMBEDDING_PROVIDER")
+    ingestion_module.drive_service = drive
+    embedding_provider._client = openai.sync_client()
+    embedding_provider._async_client = openai
+    chat_service.llm = openai
+
+    metrics: Dict[str, float] = {}
+    try:
+        # Ingestion
+        service = ingestion_module.ingestion_service
+        started = time.perf_counter()
+        await service.start_ingestion(full_sync=True)
+        elapsed = time.perf_counter() - started
+        if service.error:
+            raise SystemExit(f"Ingestion failed: {service.error}")
+        chunks = sum(count or 0 for count in index_state.get_chunk_counts().values())
+        metrics.update({
+            "ingest_files": service.processed_files,
+            "ingest_chunks": chunks,
+            "ingest_seconds": round(elapsed, 2),
+            "ingest_files_per_second": round(service.processed_files / elapsed, 2),
+            "ingest_chunks_per_second": round(chunks / elapsed, 1),
+            "ingest_peak_memory_mb": service.peak_memory_mb,
+            "embedding_requests": openai.embedding_requests,
+        })
+
+        # Search
+        for i, mode in enumerate(("vector", "lexical", "hybrid")):
+            queries = _queries(args.searches, WORDS, args.seed + i)
+            timings = await _timed_concurrently(
+                [lambda q=q: search_documents(q, limit=10, mode=mode) for q in queries],
+                args.concurrency
+            )
+            metrics.update(_percentiles(f"search_{mode}", timings))
+
+        # Chat, answered in full and streamed
+        messages = _queries(args.chats * 2, WORDS, args.seed + 10, "What do the documents say about {}?")
+        timings = await _timed_concurrently(
+            [lambda m=m: chat_service.chat(ChatRequest(message=m)) for m in messages[:args.chats]],
+            args.concurrency
+        )
+        metrics.update(_percentiles("chat", timings))
+
+        first_tokens = []
+
+        async def stream(message: str) -> None:
+            async for event in chat_service.chat_stream(ChatRequest(message=message)):
+                if event["event"] == "done" and event["data"].get("time_to_first_token_ms") is not None:
+                    first_tokens.append(event["data"]["time_to_first_token_ms"])
+
+        stream_timings = await _timed_concurrently(
+            [lambda m=m: stream(m) for m in messages[args.chats:]],
+            args.concurrency
+        )
+        metrics.update(_percentiles("chat_stream", stream_timings))
+        metrics.update(_percentiles("chat_stream_first_token", first_tokens))
+        metrics["answer_cache_hits"] = answer_cache.stats().get("hits", 0)
+    finally:
+        pdf_extractor.shutdown()
+    return metrics
+
+
+def _compare(metrics: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> Dict[str, dict]:
+    """Relative change of every comparable metric, flagging regressions beyond tolerance."""
+    comparison = {}
+    for name, value in metrics.items():
+        previous = baseline.get(name)
+        if name in INFORMATIONAL_METRICS or not isinstance(value, (int, float)) or not previous:
+            continue
+        change = (value - previous) / previous
+        higher_is_better = name.endswith(HIGHER_IS_BETTER_SUFFIXES)
+        comparison[name] = {
+            "baseline": previous,
+            "current": value,
+            "change": round(change, 4),
+            "regression": (-change if higher_is_better else change) > tolerance,
+        }
+    return comparison
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    corpus = parser.add_argument_group("corpus")
+    corpus.add_argument("--files", type=int, default=200)
+    corpus.add_argument("--docs", type=float, default=0.6, help="share of Google Docs")
+    corpus.add_argument("--sheets", type=float, default=0.2, help="share of Google Sheets")
+    corpus.add_argument("--pdfs", type=float, default=0.2, help="share of PDFs")
+    corpus.add_argument("--doc-kb", type=int, default=8)
+    corpus.add_argument("--sheet-rows", type=int, default=200)
+    corpus.add_argument("--pdf-pages", type=int, default=5)
+    corpus.add_argument("--seed", type=int, default=7)
+    latency = parser.add_argument_group("simulated latency")
+    latency.add_argument("--drive-latency-ms", type=float, default=50, help="per Drive API call")
+    latency.add_argument("--drive-mbps", type=float, default=50, help="Drive download throughput in MB/s")
+    latency.add_argument("--embed-latency-ms", type=float, default=100, help="per embeddings request")
+    latency.add_argument("--chat-first-token-ms", type=float, default=300)
+    latency.add_argument("--chat-token-ms", type=float, default=10)
+    latency.add_argument("--chat-tokens", type=int, default=150, help="tokens per chat answer")
+    load = parser.add_argument_group("load")
+    load.add_argument("--searches", type=int, default=100, help="queries per search mode")
+    load.add_argument("--chats", type=int, default=20, help="chats, answered in full and again streamed")
+    load.add_argument("--concurrency", type=int, default=4)
+    output = parser.add_argument_group("output")
+    output.add_argument("--output", help="write the results JSON here")
+    output.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    output.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        _isolate_state(directory)
+        # The services log with print; keep stdout for the results
+        with redirect_stdout(sys.stderr):
+            metrics = asyncio.run(_run_suite(args))
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "metrics": metrics,
+    }
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["baseline_commit"] = baseline.get("commit")
+        # Runs with different settings aren't comparable metric by metric
+        results["config_differences"] = sorted(
+            key for key, value in results["config"].items()
+            if key != "tolerance" and baseline.get("config", {}).get(key) != value
+        )
+        results["comparison"] = _compare(metrics, baseline["metrics"], args.tolerance)
+        regressed = any(entry["regression"] for entry in results["comparison"].values())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Vector Storage Profile Report
+
+Measures what each storage profile costs and how much recall it keeps:
+vectors shortened to 256, 512 or 1536 dimensions (text-embedding-3 vectors
+can be truncated and re-normalised), stored as float32 or as int8 with the
+top candidates re-scored in float, as search_tool does with
+VECTOR_QUANTIZATION=int8.
+
+Recall@k is measured against exact float search over the full-size vectors.
+Memory is reported both for the vectors a query scans and for everything
+kept resident: Chroma's HNSW index (float vectors plus graph links) exists
+in every profile, because int8 search re-scores with the float vectors and
+falls back to Chroma, so the int8 matrix is an addition to it, not a
+replacement.
+Vectors are read from the Chroma collection (--source collection), a
+recorded .npy matrix (--source file), or generated as a synthetic clustered
+corpus whose variance decays across dimensions the way Matryoshka-trained
+embeddings do (--source synthetic, the default, needs no index).
+
+Usage (from the backend directory):
+    python -m benchmarks.storage_profile_report --vectors 20000 --queries 200 --k 10
+    python -m benchmarks.storage_profile_report --source collection
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.services.quantized_index import quantize
+from .vectors import exact_neighbours, load_vectors, normalize, recall, split_queries, top_k
+
+PROFILE_DIMENSIONS = (256, 512, 1536)
+
+
+def hnsw_bytes_per_vector(dimensions: int, m: int) -> int:
+    """Approximate bytes per element of Chroma's hnswlib index: float vector, level-0 links, label."""
+    # Level 0 holds up to 2*M links of 4 bytes plus a link count; upper levels
+    # add M links for the ~1/M of elements that reach them
+    return dimensions * 4 + (2 * m * 4 + 4) + 8 + (m * 4 + 4) // m
+
+
+def _profile(corpus, queries, truth, dimensions, int8, k, oversample, hnsw_m):
+    """Recall, memory and latency for one storage profile."""
+    vectors = normalize(corpus[:, :dimensions])
+    query_vectors = normalize(queries[:, :dimensions])
+    if int8:
+        codes, scales = quantize(vectors)
+        bytes_per_vector = dimensions + 4
+    else:
+        bytes_per_vector = dimensions * 4
+
+    found = []
+    timings = []
+    for query in query_vectors:
+        started = time.perf_counter()
+        if int8:
+            candidates = top_k((codes.astype(np.float32) @ query) * scales, k * oversample)
+            found.append(candidates[top_k(vectors[candidates] @ query, k)].tolist())
+        else:
+            found.append(top_k(vectors @ query, k).tolist())
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Chroma's index stays resident either way; int8 adds its matrix on top
+    hnsw_bytes = hnsw_bytes_per_vector(dimensions, hnsw_m)
+    resident_bytes = hnsw_bytes + (bytes_per_vector if int8 else 0)
+    return {
+        "dimensions": dimensions,
+        "storage": "int8+float rescoring" if int8 else "float32",
+        f"recall_at_{k}": recall(found, truth, k),
+        "search_bytes_per_vector": bytes_per_vector,
+        "search_index_mb": round(bytes_per_vector * len(corpus) / 1024 / 1024, 2),
+        "chroma_hnsw_mb": round(hnsw_bytes * len(corpus) / 1024 / 1024, 2),
+        "resident_bytes_per_vector": resident_bytes,
+        "resident_mb": round(resident_bytes * len(corpus) / 1024 / 1024, 2),
+        "query_p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(timings, 95)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("synthetic", "collection", "file"), default="synthetic")
+    parser.add_argument("--vectors-file", help=".npy matrix of recorded vectors, for --source file")
+    parser.add_argument("--vectors", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200, help="held-out query vectors")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=4, help="int8 candidates per result, as INT8_OVERSAMPLE")
+    parser.add_argument("--hnsw-m", type=int, default=16, help="HNSW_M of the Chroma collection, for its memory estimate")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    vectors = load_vectors(
+        args.source, args.vectors + args.queries, max(PROFILE_DIMENSIONS), args.seed, args.vectors_file
+    )
+    corpus, queries = split_queries(vectors, args.queries, args.seed)
+    full_dimensions = corpus.shape[1]
+    if len(corpus) < args.k * args.oversample:
+        raise SystemExit("Not enough vectors for the requested --k and --oversample")
+
+    truth = exact_neighbours(corpus, queries, args.k)
+
+    profiles = []
+    for dimensions in sorted({d for d in PROFILE_DIMENSIONS if d < full_dimensions} | {full_dimensions}):
+        for int8 in (False, True):
+            profiles.append(_profile(corpus, queries, truth, dimensions, int8, args.k, args.oversample, args.hnsw_m))
+
+    print(json.dumps({
+        "source": args.source,
+        "vectors": len(corpus),
+        "queries": len(queries),
+        "full_dimensions": full_dimensions,
+        "k": args.k,
+        "int8_oversample": args.oversample,
+        "hnsw_m": args.hnsw_m,
+        "profiles": profiles,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Vector corpora and exact-search helpers shared by the index benchmarks.
+
+A corpus is either synthetic (clustered vectors whose variance decays across
+dimensions, like Matryoshka-trained embeddings), recorded in a .npy file, or
+read from the live Chroma collection.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def synthetic_vectors(count: int, dimensions: int, seed: int) -> np.ndarray:
+    """Clustered float32 vectors with earlier dimensions carrying more of the signal."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 200, 8), dimensions))
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.6 * rng.standard_normal((count, dimensions))
+    vectors *= 1.0 / np.sqrt(1.0 + np.arange(dimensions) / 64.0)
+    return vectors.astype(np.float32)
+
+
+def collection_vectors(page_size: int = 5000) -> np.ndarray:
+    """All vectors of the drive_documents collection."""
+    from src.services.vector_store import get_collection
+
+    collection = get_collection()
+    pages = []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not pages:
+        raise SystemExit("The collection is empty; run an ingestion first or use --source synthetic")
+    return np.concatenate(pages)
+
+
+def load_vectors(source: str, count: int, dimensions: int, seed: int, path: Optional[str] = None) -> np.ndarray:
+    """Load a corpus from "synthetic", "collection" or "file" (a .npy matrix at path)."""
+    if source == "collection":
+        return collection_vectors()
+    if source == "file":
+        if not path:
+            raise SystemExit("--vectors-file is required with --source file")
+        return np.load(path).astype(np.float32)
+    return synthetic_vectors(count, dimensions, seed)
+
+
+def split_queries(vectors: np.ndarray, queries: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hold out query vectors so no query finds itself; returns (corpus, queries)."""
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[queries:]], vectors[order[:queries]]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[np.ndarray]:
+    """Brute-force cosine nearest neighbours of each query."""
+    full = normalize(corpus)
+    return [top_k(full @ query, k) for query in normalize(queries)]
+
+
+def recall(found: List[List[int]], truth: List[np.ndarray], k: int) -> float:
+    """Mean fraction of the true top k that was found."""
+    hits = sum(len(set(f) & set(t.tolist())) for f, t in zip(found, truth))
+    return round(hits / (len(truth) * k), 4)
@@ -8,7 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 
-from .routes import auth, drive, ingest, chat
+from .routes import auth, drive, ingest, chat, search, metrics
+from .services.answer_cache import answer_cache
+from .services.embedding_batcher import embedding_batcher
+from .services.embedding_cache import embedding_cache
+from .services.pdf_extractor import pdf_extractor
+from .tools.query_cache import query_embedding_cache
 
 # Load environment variables
 load_dotenv()
@@ -34,6 +39,21 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(drive.router, prefix="/api")
 app.include_router(ingest.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+
+
+@app.on_event("startup")
+async def start_monitoring():
+    """Start sampling event loop lag for /api/metrics"""
+    metrics.start_monitoring()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stop the PDF extraction worker processes and the event loop lag monitor"""
+    metrics.stop_monitoring()
+    pdf_extractor.shutdown()
 
 
 @app.get("/")
@@ -54,7 +74,13 @@ async def health():
         "google_oauth_configured": bool(
             os.getenv("GOOGLE_CLIENT_ID") and
             os.getenv("GOOGLE_CLIENT_SECRET")
-        )
+        ),
+        "caches": {
+            "embeddings": embedding_cache.stats(),
+            "query_embeddings": query_embedding_cache.stats(),
+            "answers": answer_cache.stats(),
+        },
+        "embedding_batcher": embedding_batcher.stats()
     }
 
 
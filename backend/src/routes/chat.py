@@ -3,7 +3,10 @@ Chat Routes - Candidates implement the service logic
 These routes are complete, but call ChatService methods that need implementation
 """
 
+import json
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from ..services.chat_service import chat_service
 from ..types import ChatRequest, ChatResponse
 
@@ -34,3 +37,23 @@ async def chat(request: ChatRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat using Server-Sent Events.
+
+    Emits a "sources" event with the retrieved sources first, then one
+    "token" event per piece of the answer, then "done" with timings (or
+    "error"). If the client disconnects, generation is cancelled.
+    """
+    async def event_stream():
+        async for event in chat_service.chat_stream(request):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
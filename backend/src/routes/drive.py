@@ -7,6 +7,7 @@ import asyncio
 from typing import Optional, List
 
 from fastapi import APIRouter, HTTPException
+from ..services.drive_catalog import drive_catalog
 from ..services.drive_service import drive_service
 from ..types import DriveFile, DriveFolder
 
@@ -17,10 +18,9 @@ router = APIRouter(prefix="/drive", tags=["drive"])
 async def get_files(folderId: Optional[str] = None):
     """Returns a list of all files in the user's Drive, optionally filtered by folder."""
     try:
-        files = await asyncio.to_thread(drive_service.list_files, folder_id=folderId)
-        # Filter out folders from the general file list
-        files = [f for f in files if f['mimeType'] != 'application/vnd.google-apps.folder']
-        return sorted(files, key=lambda f: f['name'])
+        await drive_catalog.ensure_fresh()
+        # Folders are excluded and results are sorted by name in the catalog query
+        return await asyncio.to_thread(drive_catalog.list_files, folder_id=folderId)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -29,14 +29,8 @@ async def get_files(folderId: Optional[str] = None):
 async def get_folders():
     """Returns a list of all folders in the user's Drive."""
     try:
-        # We get all files and then filter for folders.
-        # This can be optimized if needed.
-        all_files = await asyncio.to_thread(drive_service.list_files)
-        folders = [
-            f for f in all_files
-            if f['mimeType'] == 'application/vnd.google-apps.folder'
-        ]
-        return sorted(folders, key=lambda f: f['name'])
+        await drive_catalog.ensure_fresh()
+        return await asyncio.to_thread(drive_catalog.list_folders)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,20 +41,18 @@ async def get_folder(folder_id: str):
     Get details about a specific folder.
     """
     try:
-        folder_metadata = drive_service.get_file_metadata(folder_id)
+        await drive_catalog.ensure_fresh()
+        folder_metadata = await asyncio.to_thread(drive_catalog.get_file, folder_id)
+        if folder_metadata is None:
+            # Not in the catalog yet (e.g. created since the last refresh)
+            folder_metadata = await asyncio.to_thread(drive_service.get_file_metadata, folder_id)
+            drive_service.folder_tree.add_folders([folder_metadata])
 
         if folder_metadata['mimeType'] != 'application/vnd.google-apps.folder':
             raise HTTPException(status_code=400, detail="File is not a folder")
 
-        # Count files in folder
-        files_in_folder = drive_service.list_files(folder_id=folder_id)
-        file_count = len([f for f in files_in_folder if f['mimeType'] != 'application/vnd.google-apps.folder'])
-
-        path = drive_service.build_file_path(
-            folder_metadata['id'],
-            folder_metadata['name'],
-            folder_metadata.get('parents')
-        )
+        file_count = await asyncio.to_thread(drive_catalog.get_file_count, folder_id)
+        path = await asyncio.to_thread(drive_service.folder_tree.folder_path, folder_metadata['id'])
 
         return DriveFolder(
             id=folder_metadata['id'],
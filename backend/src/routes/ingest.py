@@ -4,6 +4,8 @@ These routes are complete, but call IngestionService methods that need implement
 """
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+from ..services.index_gc import index_gc
 from ..services.ingestion_service import ingestion_service
 from ..types import IngestionStatus
 
@@ -11,24 +13,25 @@ router = APIRouter(prefix="/ingest", tags=["ingestion"])
 
 
 @router.post("/start")
-async def start_ingestion(background_tasks: BackgroundTasks):
+async def start_ingestion(background_tasks: BackgroundTasks, full: bool = False):
     """
     Start the ingestion process in the background.
 
     This endpoint is COMPLETE. Candidates implement the
     ingestion_service.start_ingestion() method.
+
+    By default only files changed since the last run are ingested.
+    Pass ?full=true to re-crawl and re-ingest the whole Drive.
     """
     try:
-        # Check if already ingesting
-        status = ingestion_service.get_status()
-        if status.is_ingesting:
-            raise HTTPException(
-                status_code=400,
-                detail="Ingestion already in progress"
-            )
+        # Claim the index now, so nothing can start between this check and the run
+        try:
+            ingestion_service.reserve()
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
 
         # Start ingestion in background
-        background_tasks.add_task(ingestion_service.start_ingestion)
+        background_tasks.add_task(ingestion_service.start_ingestion, full_sync=full, reserved=True)
 
         return {"message": "Ingestion started"}
     except HTTPException:
@@ -48,3 +51,29 @@ async def get_ingestion_status():
         return ingestion_service.get_status()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/gc")
+async def collect_garbage(dry_run: bool = False):
+    """
+    Delete orphaned chunks from the vector and lexical indexes.
+
+    Removes chunks of files that are no longer indexed and chunks left over
+    from longer, older versions of files. Returns a report with index size,
+    dead-vector ratio and query latency before and after. Pass
+    ?dry_run=true to only report.
+    """
+    # collect() takes the index lock shared with ingestion and raises
+    # ValueError while ingestion (or another GC run) holds it
+    try:
+        return await asyncio.to_thread(index_gc.collect, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/gc")
+async def get_garbage_collection_report():
+    """Get the report of the last index garbage collection run."""
+    return {"is_running": index_gc.is_running, "last_report": index_gc.last_report}
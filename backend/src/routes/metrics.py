@@ -0,0 +1,54 @@
+"""
+Metrics Routes
+Exposes the metrics registry in the Prometheus text format
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utils.metrics import EventLoopLagMonitor, executor_queue_depth, registry
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer callback",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+EVENT_LOOP_LAG_LATEST = registry.gauge("event_loop_lag_latest_seconds", "Most recent event loop lag sample")
+
+loop_lag_monitor = EventLoopLagMonitor(EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_LAG_LATEST)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _default_executor_depth() -> dict:
+    # asyncio.to_thread work (Drive calls, caches, index state) queues on the loop's default executor
+    executor = getattr(_loop, "_default_executor", None) if _loop else None
+    return {("default",): executor_queue_depth(executor)} if executor else {}
+
+
+registry.gauge(
+    "threadpool_queue_depth", "Tasks waiting for a thread in a pool", ["pool"],
+    callback=_default_executor_depth
+)
+
+
+def start_monitoring() -> None:
+    """Start sampling event loop lag on the running loop."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    loop_lag_monitor.start()
+
+
+def stop_monitoring() -> None:
+    loop_lag_monitor.stop()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Counters, gauges and latency histograms for every stage, in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,51 @@
+"""
+Search Routes
+Exposes document search directly, without generating an answer
+"""
+
+from fastapi import APIRouter, HTTPException, Response
+from ..tools.search_tool import search_documents
+from ..types import SearchRequest, SearchResponse
+from ..utils.tracing import RequestTrace
+
+router = APIRouter(tags=["search"])
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest, response: Response):
+    """
+    Search ingested Drive documents.
+
+    mode selects "vector", "lexical" (no network calls) or "hybrid"
+    retrieval; it defaults to the server's SEARCH_MODE. With debug, the
+    full trace (stage timings and candidate counts) is returned in the
+    response's debug field, and the stage timings in a Server-Timing header
+    for browser dev tools.
+    """
+    limit = request.limit or 10
+    trace = RequestTrace("search", request.query, {
+        "folder_id": request.folder_id,
+        "file_id": request.file_id,
+        "mode": request.mode,
+        "limit": limit,
+    })
+    try:
+        results = await search_documents(
+            query=request.query,
+            folder_id=request.folder_id,
+            file_id=request.file_id,
+            limit=limit,
+            mode=request.mode,
+            trace=trace
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        trace.finish()
+
+    if not request.debug:
+        return SearchResponse(results=results)
+    response.headers["Server-Timing"] = trace.server_timing()
+    return SearchResponse(results=results, debug=trace.to_dict())
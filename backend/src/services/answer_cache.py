@@ -0,0 +1,148 @@
+"""
+Answer Cache - Semantic cache of chat answers
+
+Questions are matched to previously answered ones by cosine similarity of
+their embeddings, within the same folder/file scope. Only conversation-free
+turns are cached, and an entry is dropped as soon as ingestion changes or
+removes any file the cached answer cited.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+import numpy as np
+
+from ..types import ChatResponse
+
+Scope = Tuple[Optional[str], Optional[str]]
+
+
+class SemanticAnswerCache:
+    """In-process cache of chat answers keyed by question embedding."""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 86400):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.latency_saved_seconds = 0.0
+        self._entries: Dict[Scope, List[dict]] = {}
+        self._matrices: Dict[Scope, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding: List[float], scope: Scope) -> Optional[ChatResponse]:
+        """Return a cached answer to a sufficiently similar question, if any."""
+        query = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            entries = self._entries.get(scope)
+            if entries:
+                # Expired entries would otherwise stay in the scan and could
+                # shadow a valid match that is slightly less similar
+                live = [e for e in entries if e["expires_at"] > now]
+                if len(live) != len(entries):
+                    self.expirations += len(entries) - len(live)
+                    self._set_entries(scope, live)
+                    entries = live
+            if entries:
+                matrix = self._matrix(scope)
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                entry = entries[best]
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self.latency_saved_seconds += entry["latency_seconds"]
+                    return entry["response"].model_copy(deep=True)
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: List[float],
+        scope: Scope,
+        response: ChatResponse,
+        latency_seconds: float
+    ) -> None:
+        """Cache an answer along with the files it cited."""
+        entry = {
+            "embedding": self._normalize(embedding),
+            "response": response.model_copy(deep=True),
+            "file_ids": {source.metadata.get("file_id") for source in response.sources},
+            "latency_seconds": latency_seconds,
+            "created_at": time.time(),
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._entries.setdefault(scope, []).append(entry)
+            self._matrices.pop(scope, None)
+            if self._size() > self.max_entries:
+                self._evict_oldest()
+
+    def invalidate_files(self, file_ids: Iterable[str]) -> int:
+        """Drop every cached answer that cited one of the given files."""
+        file_ids = set(file_ids)
+        removed = 0
+        with self._lock:
+            for scope, entries in list(self._entries.items()):
+                kept = [e for e in entries if not (e["file_ids"] & file_ids)]
+                if len(kept) != len(entries):
+                    removed += len(entries) - len(kept)
+                    self._set_entries(scope, kept)
+            self.invalidations += removed
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit rate and latency saved."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_seconds * 1000, 1),
+            "invalidations": self.invalidations,
+            "expirations": self.expirations,
+            "entries": self._size(),
+            "threshold": self.threshold,
+        }
+
+    def _matrix(self, scope: Scope) -> np.ndarray:
+        matrix = self._matrices.get(scope)
+        if matrix is None:
+            matrix = np.vstack([e["embedding"] for e in self._entries[scope]])
+            self._matrices[scope] = matrix
+        return matrix
+
+    def _set_entries(self, scope: Scope, entries: List[dict]) -> None:
+        if entries:
+            self._entries[scope] = entries
+        else:
+            self._entries.pop(scope, None)
+        self._matrices.pop(scope, None)
+
+    def _size(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _evict_oldest(self) -> None:
+        # Entries are appended in time order, so each scope's first entry is its oldest
+        scope = min(self._entries, key=lambda s: self._entries[s][0]["created_at"])
+        self._set_entries(scope, self._entries[scope][1:])
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Global instance
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+)
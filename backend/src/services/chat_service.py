@@ -8,18 +8,44 @@ This service:
 4. Cites sources clearly in responses
 """
 
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 from ..types import ChatRequest, ChatResponse, SearchRequest, SearchResult
-from ..tools.search_tool import search_documents
+from ..tools.search_tool import (
+    QUERY_EMBEDDING_TIMEOUT_SECONDS,
+    SEARCH_MODE,
+    generate_query_embedding,
+    search_documents,
+)
+from ..utils.chunking import count_tokens
+from ..utils.metrics import registry
+from ..utils.tracing import RequestTrace
+from .answer_cache import answer_cache
 
 # Load environment variables
 load_dotenv()
 
+# Concurrency limit and timeout for LLM calls
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_seconds", "LLM completion latency, until the last token for streams", ["mode"]
+)
+LLM_FIRST_TOKEN_SECONDS = registry.histogram("llm_first_token_seconds", "Time to the first streamed LLM token")
+LLM_ERRORS = registry.counter("llm_errors_total", "Failed LLM completions", ["mode"])
+CHAT_SECONDS = registry.histogram("chat_seconds", "End-to-end chat latency", ["mode", "cached"])
+
 # Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=LLM_TIMEOUT_SECONDS)
+
+
+def _count_prompt_tokens(messages: List[dict]) -> int:
+    return sum(count_tokens(message["content"] or "") for message in messages)
 
 
 class ChatService:
@@ -35,6 +61,8 @@ class ChatService:
         self.model = "gpt-4o-mini"  # Good balance of quality and cost
         self.max_tokens = 1000
         self.temperature = 0.7
+        # Bounds in-flight completions so a burst of chats queues here, not at OpenAI
+        self._llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
     async def chat(self, request: ChatRequest) -> ChatResponse:
         """
@@ -47,16 +75,46 @@ class ChatService:
         4. Generate response using LLM
         5. Format response with source citations
         6. Return ChatResponse with message and sources
+
+        With request.debug set, the response carries the stage timings and
+        token counts of this request.
         """
+        trace = self._start_trace(request)
+        try:
+            response = await self._chat(request, trace)
+        finally:
+            trace.finish()
+        if request.debug:
+            # A copy, so the breakdown never ends up in the answer cache
+            response = response.model_copy(update={"debug": trace.to_dict()})
+        return response
+
+    async def _chat(self, request: ChatRequest, trace: RequestTrace) -> ChatResponse:
         try:
+            started = time.perf_counter()
+            scope = (request.folder_id, request.file_id)
+
+            # Step 0: Conversation-free turns can be answered from the semantic cache
+            query_embedding = await self._question_embedding(request, trace)
+            if query_embedding is not None:
+                with trace.span("answer_cache"):
+                    cached = answer_cache.lookup(query_embedding, scope)
+                if cached is not None:
+                    print(f"Answer cache hit for: {request.message}")
+                    trace.count("answer_cache_hit", 1)
+                    CHAT_SECONDS.observe(time.perf_counter() - started, mode="complete", cached="true")
+                    return cached
+
             # Step 1: Retrieve relevant documents
             print(f"Searching for: {request.message}")
-            sources = await search_documents(
-                query=request.message,
-                folder_id=request.folder_id,
-                file_id=request.file_id,
-                limit=5  # Get top 5 most relevant chunks
-            )
+            with trace.span("search"):
+                sources = await search_documents(
+                    query=request.message,
+                    folder_id=request.folder_id,
+                    file_id=request.file_id,
+                    limit=5,  # Get top 5 most relevant chunks
+                    trace=trace
+                )
             
             print(f"Found {len(sources)} relevant sources")
             
@@ -65,20 +123,27 @@ class ChatService:
                 return ChatResponse(message=response_text, sources=[])
             
             # Step 2: Build context from sources
-            context = self._build_context(sources)
+            messages = self._build_traced_messages(request, sources, trace)
             
             # Step 3: Generate response using LLM
-            response_text = await self._generate_response(
-                message=request.message,
-                context=context,
-                history=request.conversation_history
-            )
+            try:
+                response_text = await self._complete(messages, trace)
+            except Exception as e:
+                print(f"Error calling LLM: {str(e)}")
+                return ChatResponse(
+                    message=f"I encountered an error generating a response: {str(e)}",
+                    sources=sources
+                )
             
             # Step 4: Return with sources
-            return ChatResponse(
+            response = ChatResponse(
                 message=response_text,
                 sources=sources
             )
+            if query_embedding is not None:
+                answer_cache.store(query_embedding, scope, response, time.perf_counter() - started)
+            CHAT_SECONDS.observe(time.perf_counter() - started, mode="complete", cached="false")
+            return response
             
         except Exception as e:
             print(f"Error in chat: {str(e)}")
@@ -88,6 +153,155 @@ class ChatService:
                 sources=[]
             )
 
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[dict]:
+        """
+        Process a chat message and stream the response.
+
+        Yields events as {"event": name, "data": payload}:
+        - "sources": the retrieved sources, sent before generation starts
+        - "token": {"content": ...} for each piece of the answer
+        - "done": timings, including time to first token
+        - "error": {"message": ...} if anything fails
+
+        If the consumer stops iterating (e.g. the client disconnected), the
+        upstream completion stream is closed and the LLM slot released.
+        With request.debug set, "done" also carries the stage breakdown.
+        """
+        started = time.perf_counter()
+        first_token_at = None
+        trace = self._start_trace(request)
+        try:
+            scope = (request.folder_id, request.file_id)
+            query_embedding = await self._question_embedding(request, trace)
+            if query_embedding is not None:
+                with trace.span("answer_cache"):
+                    cached = answer_cache.lookup(query_embedding, scope)
+                if cached is not None:
+                    trace.count("answer_cache_hit", 1)
+                    yield {"event": "sources", "data": [source.model_dump() for source in cached.sources]}
+                    yield {"event": "token", "data": {"content": cached.message}}
+                    CHAT_SECONDS.observe(time.perf_counter() - started, mode="stream", cached="true")
+                    total_ms = round((time.perf_counter() - started) * 1000, 1)
+                    done = {"time_to_first_token_ms": total_ms, "total_ms": total_ms, "cached": True}
+                    yield {"event": "done", "data": self._with_debug(done, request, trace)}
+                    return
+
+            print(f"Searching for: {request.message}")
+            with trace.span("search"):
+                sources = await search_documents(
+                    query=request.message,
+                    folder_id=request.folder_id,
+                    file_id=request.file_id,
+                    limit=5,
+                    trace=trace
+                )
+            yield {"event": "sources", "data": [source.model_dump() for source in sources]}
+
+            if not sources:
+                first_token_at = time.perf_counter()
+                yield {
+                    "event": "token",
+                    "data": {"content": "I couldn't find any relevant information in your Google Drive to answer that question."}
+                }
+            else:
+                messages = self._build_traced_messages(request, sources, trace)
+                async with self._llm_semaphore:
+                    llm_started = time.perf_counter()
+                    try:
+                        stream = await self.llm.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=self.temperature,
+                            max_tokens=self.max_tokens,
+                            stream=True
+                        )
+                    except Exception:
+                        LLM_ERRORS.inc(mode="stream")
+                        raise
+                    parts = []
+                    try:
+                        async for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            content = chunk.choices[0].delta.content
+                            if content:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                    LLM_FIRST_TOKEN_SECONDS.observe(first_token_at - llm_started)
+                                    trace.stages["llm_first_token"] = (first_token_at - llm_started) * 1000
+                                parts.append(content)
+                                yield {"event": "token", "data": {"content": content}}
+                    finally:
+                        await stream.close()
+                        LLM_REQUEST_SECONDS.observe(time.perf_counter() - llm_started, mode="stream")
+                        trace.stages["llm"] = (time.perf_counter() - llm_started) * 1000
+                        # Streamed chunks carry no usage, so both sides are counted locally
+                        trace.count("prompt_tokens", _count_prompt_tokens(messages))
+                        trace.count("completion_tokens", count_tokens("".join(parts)))
+
+                if query_embedding is not None:
+                    answer_cache.store(
+                        query_embedding,
+                        scope,
+                        ChatResponse(message="".join(parts), sources=sources),
+                        time.perf_counter() - started
+                    )
+
+            finished = time.perf_counter()
+            CHAT_SECONDS.observe(finished - started, mode="stream", cached="false")
+            done = {
+                "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "total_ms": round((finished - started) * 1000, 1),
+            }
+            yield {"event": "done", "data": self._with_debug(done, request, trace)}
+
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield {"event": "error", "data": {"message": str(e)}}
+        finally:
+            trace.finish()
+
+    def _start_trace(self, request: ChatRequest) -> RequestTrace:
+        return RequestTrace("chat", request.message, {
+            "folder_id": request.folder_id,
+            "file_id": request.file_id,
+            "history_messages": len(request.conversation_history or []),
+        })
+
+    async def _question_embedding(self, request: ChatRequest, trace: RequestTrace) -> Optional[List[float]]:
+        """
+        Embed the question for the answer cache, or return None to skip the cache.
+
+        Only conversation-free turns are cached. Lexical mode makes no
+        embeddings call, and a slow or failing embeddings API only costs the
+        cache lookup, not the answer, which retrieval can still produce.
+        """
+        if request.conversation_history or SEARCH_MODE == "lexical":
+            return None
+        try:
+            with trace.span("query_embedding"):
+                return await asyncio.wait_for(
+                    generate_query_embedding(request.message),
+                    timeout=QUERY_EMBEDDING_TIMEOUT_SECONDS
+                )
+        except Exception as e:
+            print(f"Skipping the answer cache, query embedding failed: {e!r}")
+            trace.count("answer_cache_skipped", 1)
+            return None
+
+    def _with_debug(self, done: dict, request: ChatRequest, trace: RequestTrace) -> dict:
+        if request.debug:
+            done["debug"] = trace.finish().to_dict()
+        return done
+
+    def _build_traced_messages(self, request: ChatRequest, sources: List[SearchResult], trace: RequestTrace) -> List[dict]:
+        """_build_messages for a request, recording the context-building time and size."""
+        with trace.span("context_building"):
+            context = self._build_context(sources)
+            messages = self._build_messages(request.message, context, request.conversation_history)
+        trace.count("context_tokens", count_tokens(context))
+        return messages
+
     def _build_context(self, sources: List[SearchResult]) -> str:
         """
         Build context string from search results.
@@ -100,18 +314,13 @@ class ChatService:
             context += f"```{source.text}```\n\n"
         return context
 
-    async def _generate_response(
-        self, 
-        message: str, 
-        context: str, 
+    def _build_messages(
+        self,
+        message: str,
+        context: str,
         history: Optional[List] = None
-    ) -> str:
-        """
-        Generate LLM response given message, context, and history.
-        
-        Uses OpenAI's chat completion API with carefully crafted prompts
-        to ensure accurate, cited responses.
-        """
+    ) -> List[dict]:
+        """Build the chat completion messages for a question, its context and history."""
         # System prompt - instructions for the LLM
         system_prompt = """You are a helpful AI assistant that helps users find and understand information from their Google Drive documents.
 
@@ -148,21 +357,31 @@ Please provide a helpful answer based on the information above. Remember to cite
             "role": "user",
             "content": user_message
         })
-        
-        try:
-            # Call OpenAI API
-            response = self.llm.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"Error calling LLM: {str(e)}")
-            return f"I encountered an error generating a response: {str(e)}"
+        return messages
+
+    async def _complete(self, messages: List[dict], trace: RequestTrace) -> str:
+        """Call the OpenAI chat completion API, raising on failure."""
+        async with self._llm_semaphore:
+            try:
+                with LLM_REQUEST_SECONDS.time(mode="complete"), trace.span("llm"):
+                    response = await self.llm.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens
+                    )
+            except Exception:
+                LLM_ERRORS.inc(mode="complete")
+                raise
+        content = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            trace.count("prompt_tokens", usage.prompt_tokens)
+            trace.count("completion_tokens", usage.completion_tokens)
+        else:
+            trace.count("prompt_tokens", _count_prompt_tokens(messages))
+            trace.count("completion_tokens", count_tokens(content or ""))
+        return content
 
 
 # Global instance
@@ -0,0 +1,290 @@
+"""
+Drive Catalog - Local SQLite copy of Drive file and folder metadata
+
+The /drive routes answer from this catalog instead of paging through the Drive
+API on every UI load. The first load crawls the Drive once; after that the
+catalog is kept current in the background by replaying the Drive Changes API,
+and per-folder file counts are maintained as files change.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from .drive_service import drive_service
+from .folder_tree import FOLDER_MIME_TYPE
+
+
+class DriveCatalog:
+    """Persistent, incrementally refreshed index of Drive metadata."""
+
+    PAGE_TOKEN_KEY = "changes_page_token"
+    REFRESHED_AT_KEY = "refreshed_at"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("DRIVE_CATALOG_PATH", "./drive_catalog.db")
+        self.refresh_interval = float(os.getenv("DRIVE_CATALOG_REFRESH_SECONDS", "60"))
+        self._lock = threading.Lock()
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    mime_type TEXT NOT NULL,
+                    modified_time TEXT,
+                    size TEXT,
+                    web_view_link TEXT,
+                    md5_checksum TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_files_mime_type ON files (mime_type, name);
+
+                CREATE TABLE IF NOT EXISTS file_parents (
+                    file_id TEXT NOT NULL,
+                    parent_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (file_id, parent_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_file_parents_parent ON file_parents (parent_id);
+
+                CREATE TABLE IF NOT EXISTS folder_stats (
+                    folder_id TEXT PRIMARY KEY,
+                    file_count INTEGER NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS catalog_state (key TEXT PRIMARY KEY, value TEXT);
+                """
+            )
+        self._folders_loaded = False
+
+    # ------------------------------------------------------------------
+    # Refreshing
+    # ------------------------------------------------------------------
+
+    async def ensure_fresh(self) -> None:
+        """
+        Make sure the catalog can answer a request.
+
+        An empty catalog is loaded before returning. A stale one is served as-is
+        while an incremental refresh runs in the background.
+        """
+        # SQLite reads (and the folder scan after a restart) stay off the event loop
+        page_token, refreshed_at = await asyncio.to_thread(self._load_state)
+        if page_token is None:
+            await self._refresh_once()
+            return
+
+        if time.time() - refreshed_at > self.refresh_interval:
+            if not self._refresh_task or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    def _load_state(self) -> Tuple[Optional[str], float]:
+        """Return (page token, refreshed-at time), seeding the folder tree on first use."""
+        page_token = self._get_state(self.PAGE_TOKEN_KEY)
+        if page_token is not None and not self._folders_loaded:
+            # Seed the shared folder tree from the persisted catalog after a restart
+            drive_service.folder_tree.add_folders(self.list_folders())
+            self._folders_loaded = True
+        return page_token, float(self._get_state(self.REFRESHED_AT_KEY) or 0)
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self._refresh_once()
+        except Exception as e:
+            print(f"Error refreshing Drive catalog: {e}")
+
+    async def _refresh_once(self) -> None:
+        # Never run two refreshes at once; a waiter's refresh is then just a cheap delta
+        async with self._refresh_lock:
+            await asyncio.to_thread(self.refresh)
+
+    def refresh(self) -> None:
+        """Bring the catalog up to date with Drive (full crawl on first use)."""
+        page_token = self._get_state(self.PAGE_TOKEN_KEY)
+        if page_token is None:
+            print("Building Drive catalog from a full listing...")
+            new_page_token = drive_service.get_start_page_token()
+            files = drive_service.list_files()
+            self._replace_all(files)
+        else:
+            changes, new_page_token = drive_service.list_changes(page_token)
+            if changes:
+                print(f"Applying {len(changes)} Drive changes to the catalog")
+            self._apply_changes(changes)
+
+        self._set_state(self.PAGE_TOKEN_KEY, new_page_token)
+        self._set_state(self.REFRESHED_AT_KEY, str(time.time()))
+
+    def _replace_all(self, files: List[dict]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM file_parents")
+            for f in files:
+                self._upsert_file(f)
+            self._conn.execute("DELETE FROM folder_stats")
+            self._conn.execute(
+                f"""
+                INSERT INTO folder_stats (folder_id, file_count)
+                SELECT p.parent_id, COUNT(*) FROM file_parents p
+                JOIN files f ON f.id = p.file_id
+                WHERE f.mime_type != '{FOLDER_MIME_TYPE}'
+                GROUP BY p.parent_id
+                """
+            )
+        drive_service.folder_tree.add_folders(files)
+        self._folders_loaded = True
+
+    def _apply_changes(self, changes: List[dict]) -> None:
+        touched_folders: Set[str] = set()
+        with self._lock, self._conn:
+            for change in changes:
+                file_id = change['fileId']
+                touched_folders.update(self._parent_ids(file_id))
+                self._conn.execute("DELETE FROM file_parents WHERE file_id = ?", (file_id,))
+
+                file = change.get('file')
+                if change.get('removed') or not file or file.get('trashed'):
+                    self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                    continue
+
+                self._upsert_file(file)
+                touched_folders.update(file.get('parents') or [])
+
+            self._recount_folders(touched_folders)
+
+        drive_service.folder_tree.add_folders(
+            c['file'] for c in changes
+            if c.get('file') and not c['file'].get('trashed')
+        )
+
+    def _upsert_file(self, f: dict) -> None:
+        self._conn.execute(
+            """
+            INSERT OR REPLACE INTO files
+                (id, name, mime_type, modified_time, size, web_view_link, md5_checksum)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                f['id'], f['name'], f['mimeType'], f.get('modifiedTime'),
+                f.get('size'), f.get('webViewLink'), f.get('md5Checksum'),
+            )
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO file_parents (file_id, parent_id, position) VALUES (?, ?, ?)",
+            [(f['id'], parent_id, i) for i, parent_id in enumerate(f.get('parents') or [])]
+        )
+
+    def _recount_folders(self, folder_ids: Iterable[str]) -> None:
+        for folder_id in folder_ids:
+            count = self._conn.execute(
+                """
+                SELECT COUNT(*) FROM file_parents p JOIN files f ON f.id = p.file_id
+                WHERE p.parent_id = ? AND f.mime_type != ?
+                """,
+                (folder_id, FOLDER_MIME_TYPE)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folder_stats (folder_id, file_count) VALUES (?, ?)",
+                (folder_id, count)
+            )
+
+    def _parent_ids(self, file_id: str) -> List[str]:
+        rows = self._conn.execute(
+            "SELECT parent_id FROM file_parents WHERE file_id = ?", (file_id,)
+        ).fetchall()
+        return [row["parent_id"] for row in rows]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def list_files(self, folder_id: Optional[str] = None) -> List[dict]:
+        """Return all non-folder files, optionally only those in one folder, sorted by name."""
+        with self._lock:
+            if folder_id:
+                rows = self._conn.execute(
+                    """
+                    SELECT f.* FROM file_parents p JOIN files f ON f.id = p.file_id
+                    WHERE p.parent_id = ? AND f.mime_type != ?
+                    ORDER BY f.name
+                    """,
+                    (folder_id, FOLDER_MIME_TYPE)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM files WHERE mime_type != ? ORDER BY name", (FOLDER_MIME_TYPE,)
+                ).fetchall()
+            return self._rows_to_files(rows)
+
+    def list_folders(self) -> List[dict]:
+        """Return all folders sorted by name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM files WHERE mime_type = ? ORDER BY name", (FOLDER_MIME_TYPE,)
+            ).fetchall()
+            return self._rows_to_files(rows)
+
+    def get_file(self, file_id: str) -> Optional[dict]:
+        """Return the metadata of one file or folder."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchall()
+            files = self._rows_to_files(rows)
+        return files[0] if files else None
+
+    def get_file_count(self, folder_id: str) -> int:
+        """Return the precomputed number of files directly inside a folder."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_count FROM folder_stats WHERE folder_id = ?", (folder_id,)
+            ).fetchone()
+        return row["file_count"] if row else 0
+
+    def _rows_to_files(self, rows: List[sqlite3.Row]) -> List[dict]:
+        """Convert rows back to the dict shape returned by the Drive API."""
+        parents: Dict[str, List[str]] = {}
+        ids = [row["id"] for row in rows]
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for p in self._conn.execute(
+                f"SELECT file_id, parent_id FROM file_parents WHERE file_id IN ({placeholders}) ORDER BY position",
+                batch
+            ):
+                parents.setdefault(p["file_id"], []).append(p["parent_id"])
+
+        files = []
+        for row in rows:
+            f = {
+                "id": row["id"],
+                "name": row["name"],
+                "mimeType": row["mime_type"],
+                "modifiedTime": row["modified_time"],
+                "size": row["size"],
+                "webViewLink": row["web_view_link"],
+                "md5Checksum": row["md5_checksum"],
+                "parents": parents.get(row["id"]),
+            }
+            files.append({k: v for k, v in f.items() if v is not None})
+        return files
+
+    def _get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM catalog_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_state(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO catalog_state (key, value) VALUES (?, ?)", (key, value)
+            )
+
+
+# Global instance
+drive_catalog = DriveCatalog()
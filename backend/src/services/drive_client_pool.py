@@ -0,0 +1,93 @@
+"""
+Drive Client Pool - Reusable Drive API service objects
+
+Building a Drive service parses the discovery document and opens a new
+connection every time. This pool parses the discovery document once and keeps
+one service object per worker thread (httplib2 is not thread-safe), so each
+thread reuses its keep-alive connection across calls. Credential refresh is
+done here, under a lock, instead of racing inside every AuthorizedHttp.
+"""
+
+from typing import Callable, Optional
+import json
+import threading
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+import google_auth_httplib2
+import httplib2
+
+
+class DriveClientPool:
+    """Hands out a per-thread Drive v3 service bound to the current credentials."""
+
+    def __init__(
+        self,
+        get_credentials: Callable[[], Optional[Credentials]],
+        on_refresh: Optional[Callable[[], None]] = None,
+        timeout: int = 60
+    ):
+        self._get_credentials = get_credentials
+        self._on_refresh = on_refresh
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._discovery_document: Optional[dict] = None
+        self._generation = 0
+
+    def get_service(self):
+        """Return this thread's Drive service, building it on first use."""
+        credentials = self._get_credentials()
+        if not credentials:
+            raise ValueError("Not authenticated")
+
+        self._ensure_fresh(credentials)
+
+        local = self._local
+        if (
+            getattr(local, "service", None) is None
+            or local.generation != self._generation
+            or local.credentials is not credentials
+        ):
+            authed_http = google_auth_httplib2.AuthorizedHttp(
+                credentials, http=httplib2.Http(timeout=self._timeout)
+            )
+            local.service = build_from_document(self._get_discovery_document(), http=authed_http)
+            local.generation = self._generation
+            local.credentials = credentials
+
+        return local.service
+
+    def reset(self) -> None:
+        """Drop all pooled services, e.g. after the user re-authenticates."""
+        with self._lock:
+            self._generation += 1
+
+    def _ensure_fresh(self, credentials: Credentials) -> None:
+        """Refresh expired credentials once for all threads."""
+        if credentials.valid or not credentials.refresh_token:
+            return
+
+        with self._lock:
+            if credentials.valid:
+                return
+            print("Drive credentials expired, refreshing...")
+            credentials.refresh(Request())
+            if self._on_refresh:
+                self._on_refresh()
+
+    def _get_discovery_document(self) -> dict:
+        """Load and parse the Drive v3 discovery document once."""
+        if self._discovery_document is None:
+            with self._lock:
+                if self._discovery_document is None:
+                    static_doc = get_static_doc('drive', 'v3')
+                    if static_doc:
+                        self._discovery_document = json.loads(static_doc)
+                    else:
+                        # Not bundled with this client version; fetch it once
+                        self._discovery_document = build(
+                            'drive', 'v3', http=httplib2.Http(timeout=self._timeout)
+                        )._rootDesc
+        return self._discovery_document
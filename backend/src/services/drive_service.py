@@ -2,16 +2,37 @@
 Google Drive Service - Handles authentication and file operations
 """
 
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import BinaryIO, List, Optional, Tuple
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
-import io
 import os
 from google.auth.transport.requests import Request
-import google_auth_httplib2
-import httplib2
+
+from .drive_client_pool import DriveClientPool
+from .folder_tree import FolderTree
+from ..utils.metrics import registry
+
+# Bytes fetched per request when streaming a download to a file
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_MB", "8")) * 1024 * 1024
+
+DRIVE_REQUEST_SECONDS = registry.histogram(
+    "drive_request_seconds", "Drive API call latency (whole download for media calls)", ["call"]
+)
+DRIVE_REQUEST_ERRORS = registry.counter("drive_request_errors_total", "Failed Drive API calls", ["call"])
+DRIVE_DOWNLOAD_BYTES = registry.counter("drive_download_bytes_total", "Bytes downloaded or exported from Drive", ["call"])
+
+
+@contextmanager
+def _drive_call(call: str):
+    """Time a Drive API call and count it if it fails."""
+    try:
+        with DRIVE_REQUEST_SECONDS.time(call=call):
+            yield
+    except Exception:
+        DRIVE_REQUEST_ERRORS.inc(call=call)
+        raise
 
 
 class DriveService:
@@ -19,12 +40,18 @@ class DriveService:
 
     SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
     TOKEN_FILE = 'token.json'
+    FILE_FIELDS = "id, name, mimeType, modifiedTime, size, webViewLink, parents, md5Checksum"
 
     def __init__(self):
         self.client_id = os.getenv('GOOGLE_CLIENT_ID')
         self.client_secret = os.getenv('GOOGLE_CLIENT_SECRET')
         self.redirect_uri = os.getenv('GOOGLE_REDIRECT_URI')
         self.credentials: Optional[Credentials] = None
+        self.folder_tree = FolderTree(fetch_folder=self._fetch_folder)
+        self._clients = DriveClientPool(
+            get_credentials=lambda: self.credentials,
+            on_refresh=self._save_credentials
+        )
         self._load_credentials()
 
     def _load_credentials(self):
@@ -99,17 +126,22 @@ class DriveService:
 
         flow.fetch_token(code=code)
         self.credentials = flow.credentials
+        self._clients.reset()
         self._save_credentials()
         return self.credentials
 
     def list_files(self, folder_id: Optional[str] = None, page_size: int = 100) -> List[dict]:
-        """List all files in Drive or in a specific folder"""
+        """
+        List all files in Drive or in a specific folder.
+
+        Errors are raised rather than returning the pages fetched so far:
+        callers treat files missing from the listing as deleted, so a partial
+        listing must never look like a complete one.
+        """
         if not self.credentials:
             raise ValueError("Not authenticated. Call handle_callback first.")
 
-        # Create an authorized http object with a timeout
-        authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=60))
-        service = build('drive', 'v3', http=authed_http)
+        service = self._clients.get_service()
 
         query = "trashed=false"
         if folder_id:
@@ -117,112 +149,134 @@ class DriveService:
 
         results = []
         page_token = None
-        previous_page_token = ""  # Sentinel value to detect duplicate tokens
 
         while True:
-            try:
-                print(f"Requesting files from Drive API... (Page token: {page_token})")
+            print(f"Requesting files from Drive API... (Page token: {page_token})")
+            with _drive_call("files.list"):
                 response = service.files().list(
                     q=query,
                     pageSize=page_size,
-                    fields="nextPageToken, files(id, name, mimeType, modifiedTime, size, webViewLink, parents)",
+                    fields=f"nextPageToken, files({self.FILE_FIELDS})",
                     pageToken=page_token
                 ).execute()
 
-                results.extend(response.get('files', []))
-                print(f"Fetched {len(results)} total files so far...")
-
-                previous_page_token = page_token
-                page_token = response.get('nextPageToken')
+            results.extend(response.get('files', []))
+            print(f"Fetched {len(results)} total files so far...")
 
-                if not page_token:
-                    print("No more pages from Drive API. Finished listing files.")
-                    break
-                
-                # Safety break to prevent infinite loops from the API
-                if page_token == previous_page_token:
-                    print("Received a duplicate page token from Drive API. Breaking loop.")
-                    break
+            previous_page_token = page_token
+            page_token = response.get('nextPageToken')
 
-            except Exception as e:
-                print(f"Error calling Drive API in list_files: {e}")
-                # Break the loop on error to prevent hanging
-                break
+            if not page_token:
+                print("No more pages from Drive API. Finished listing files.")
+                return results
 
-        return results
+            # A repeated token would loop forever; the listing can't be completed
+            if page_token == previous_page_token:
+                raise RuntimeError("Drive API returned a duplicate page token while listing files")
 
     def get_file_metadata(self, file_id: str) -> dict:
         """Get metadata for a specific file"""
         if not self.credentials:
             raise ValueError("Not authenticated")
 
-        authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=60))
-        service = build('drive', 'v3', http=authed_http)
-        return service.files().get(
-            fileId=file_id,
-            fields="id, name, mimeType, modifiedTime, size, webViewLink, parents"
-        ).execute()
+        service = self._clients.get_service()
+        with _drive_call("files.get"):
+            return service.files().get(
+                fileId=file_id,
+                fields=self.FILE_FIELDS
+            ).execute()
 
-    def download_file(self, file_id: str) -> bytes:
-        """Download file content"""
+    def get_start_page_token(self) -> str:
+        """Get a Changes API page token pointing at the current state of the Drive"""
         if not self.credentials:
             raise ValueError("Not authenticated")
 
-        authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=60))
-        service = build('drive', 'v3', http=authed_http)
-        request = service.files().get_media(fileId=file_id)
+        service = self._clients.get_service()
+        with _drive_call("changes.getStartPageToken"):
+            response = service.changes().getStartPageToken().execute()
+        return response['startPageToken']
 
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
+    def list_changes(self, page_token: str, page_size: int = 1000) -> Tuple[List[dict], str]:
+        """
+        List every change since page_token.
 
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+        Returns the changes and the new start page token to save for the next
+        call. Errors are raised so callers never advance past changes they did
+        not see.
+        """
+        if not self.credentials:
+            raise ValueError("Not authenticated")
 
-        return fh.getvalue()
+        service = self._clients.get_service()
+
+        changes = []
+        while True:
+            print(f"Requesting changes from Drive API... (Page token: {page_token})")
+            with _drive_call("changes.list"):
+                response = service.changes().list(
+                    pageToken=page_token,
+                    pageSize=page_size,
+                    includeRemoved=True,
+                    spaces='drive',
+                    fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({self.FILE_FIELDS}, trashed))"
+                ).execute()
 
-    def export_google_doc(self, file_id: str, mime_type: str = 'text/plain') -> bytes:
-        """Export Google Docs/Sheets/Slides to a downloadable format"""
+            changes.extend(response.get('changes', []))
+
+            if 'newStartPageToken' in response:
+                print(f"Fetched {len(changes)} changes from Drive API.")
+                return changes, response['newStartPageToken']
+
+            page_token = response['nextPageToken']
+
+    def download_file_to(self, file_id: str, fh: BinaryIO) -> int:
+        """Download file content into a writable file object, returning the byte count"""
         if not self.credentials:
             raise ValueError("Not authenticated")
 
-        authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=60))
-        service = build('drive', 'v3', http=authed_http)
-        request = service.files().export_media(fileId=file_id, mimeType=mime_type)
+        service = self._clients.get_service()
+        request = service.files().get_media(fileId=file_id)
+        return self._download_to(request, fh, "files.get_media")
 
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
+    def export_google_doc_to(self, file_id: str, fh: BinaryIO, mime_type: str = 'text/plain') -> int:
+        """Export a Google Doc/Sheet/Slides file into a writable file object, returning the byte count"""
+        if not self.credentials:
+            raise ValueError("Not authenticated")
 
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+        service = self._clients.get_service()
+        request = service.files().export_media(fileId=file_id, mimeType=mime_type)
+        return self._download_to(request, fh, "files.export_media")
 
-        return fh.getvalue()
+    @staticmethod
+    def _download_to(request, fh: BinaryIO, call: str) -> int:
+        # MediaIoBaseDownload writes one chunk (100 MB by default) at a time;
+        # smaller chunks keep memory flat when fh is backed by disk
+        start = fh.tell()
+        downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
 
-    def build_file_path(self, file_id: str, file_name: str, parents: Optional[List[str]] = None) -> str:
-        """Build the full path of a file by traversing parent folders"""
-        if not parents or not self.credentials:
-            return f"/{file_name}"
+        done = False
+        with _drive_call(call):
+            while not done:
+                status, done = downloader.next_chunk()
 
-        authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=60))
-        service = build('drive', 'v3', http=authed_http)
-        path_parts = [file_name]
+        DRIVE_DOWNLOAD_BYTES.inc(fh.tell() - start, call=call)
+        return fh.tell() - start
 
-        current_parent = parents[0] if parents else None
+    def _fetch_folder(self, folder_id: str) -> Optional[dict]:
+        """Fallback used by the folder tree for folders missing from listings"""
+        if not self.credentials:
+            return None
 
-        while current_parent:
-            try:
-                parent_metadata = service.files().get(
-                    fileId=current_parent,
+        service = self._clients.get_service()
+        try:
+            with _drive_call("files.get"):
+                return service.files().get(
+                    fileId=folder_id,
                     fields="id, name, parents"
                 ).execute()
-
-                path_parts.insert(0, parent_metadata['name'])
-                current_parent = parent_metadata.get('parents', [None])[0]
-            except:
-                break
-
-        return "/" + "/".join(path_parts)
+        except Exception as e:
+            print(f"Error fetching folder {folder_id}: {e}")
+            return None
 
     def is_authenticated(self) -> bool:
         """Check if user is authenticated with valid credentials"""
@@ -0,0 +1,266 @@
+"""
+Embedding Batcher - Packs embedding requests from many files into full batches
+
+Callers submit texts from anywhere in ingestion (many files, many windows at
+once) and await their vectors. A single background loop packs the pending
+texts into requests up to the provider's item and token limits, waiting at
+most max_wait_seconds for a batch to fill, and keeps up to max_in_flight
+requests running at once. Small files therefore share requests instead of
+each paying for a nearly empty one.
+
+Rate-limit and server errors are retried with jittered exponential backoff
+(honouring Retry-After when the API sends it). A batch rejected outright
+(e.g. one text over the model's input limit) is split in halves and resent,
+so only the offending texts fail rather than every file packed with them.
+Texts that still fail raise EmbeddingFailed to their callers; nothing is
+ever filled in with placeholder vectors.
+"""
+
+from typing import List, Optional
+import asyncio
+import os
+import random
+
+from dotenv import load_dotenv
+
+from .embedding_provider import EmbeddingProvider, embedding_provider
+from ..utils.chunking import count_tokens
+from ..utils.metrics import SIZE_BUCKETS, registry
+
+# Load environment variables
+load_dotenv()
+
+EMBEDDING_REQUEST_SECONDS = registry.histogram(
+    "embedding_request_seconds", "Embedding API request latency, per attempt", ["outcome"]
+)
+EMBEDDING_BATCH_TEXTS = registry.histogram(
+    "embedding_batch_texts", "Texts per embedding request", buckets=SIZE_BUCKETS
+)
+EMBEDDING_BATCH_TOKENS = registry.histogram(
+    "embedding_batch_tokens", "Tokens per embedding request",
+    buckets=(100, 500, 1000, 5000, 10000, 25000, 50000, 100000, 300000)
+)
+EMBEDDING_RETRIES = registry.counter("embedding_retries_total", "Embedding requests retried after an error")
+EMBEDDING_BATCH_SPLITS = registry.counter(
+    "embedding_batch_splits_total", "Rejected embedding batches split in halves to isolate failing texts"
+)
+EMBEDDING_FAILED_TEXTS = registry.counter("embedding_failed_texts_total", "Texts that could not be embedded")
+
+
+class EmbeddingFailed(Exception):
+    """Raised when texts could not be embedded, even after retries."""
+
+
+class _PendingText:
+    __slots__ = ("text", "tokens", "future")
+
+    def __init__(self, text: str, tokens: int, future: asyncio.Future):
+        self.text = text
+        self.tokens = tokens
+        self.future = future
+
+
+class EmbeddingBatcher:
+    """Process-wide embedding request packer with retries."""
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        max_tokens: Optional[int] = None,
+        max_in_flight: int = 4,
+        max_wait_seconds: float = 0.05,
+        max_retries: int = 5,
+        base_delay_seconds: float = 0.5,
+        max_delay_seconds: float = 30.0
+    ):
+        self.provider = provider
+        self.max_items = provider.max_batch_size
+        self.max_tokens = min(max_tokens or provider.max_batch_tokens, provider.max_batch_tokens)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+        self.requests = 0
+        self.texts = 0
+        self.tokens = 0
+        # Requests count each batch once; retried attempts are counted in retries
+        self.retries = 0
+        self.splits = 0
+        self.failed_texts = 0
+
+        # Bound to the event loop that first uses the batcher; recreated if the loop changes
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._requests_in_flight = set()
+        registry.gauge(
+            "embedding_batcher_queued_texts", "Texts waiting to be packed into an embedding request",
+            callback=lambda: {(): self._queue.qsize() if self._queue else 0}
+        )
+        registry.gauge(
+            "embedding_requests_in_flight", "Embedding requests currently running",
+            callback=lambda: {(): len(self._requests_in_flight)}
+        )
+
+    async def embed(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[List[float]]:
+        """
+        Embed texts, sharing requests with any other concurrent callers.
+
+        token_counts, if known (e.g. from the chunker), saves recounting.
+        Raises EmbeddingFailed if any text could not be embedded.
+        """
+        if not texts:
+            return []
+        self._ensure_worker()
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for i, text in enumerate(texts):
+            tokens = token_counts[i] if token_counts else count_tokens(text)
+            future = loop.create_future()
+            futures.append(future)
+            self._queue.put_nowait(_PendingText(text, tokens, future))
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise EmbeddingFailed(f"{len(errors)} of {len(texts)} texts failed to embed: {errors[0]}")
+        return results
+
+    def stats(self) -> dict:
+        """Return request packing and retry counters."""
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "avg_texts_per_request": round(self.texts / self.requests, 1) if self.requests else 0.0,
+            "avg_tokens_per_request": round(self.tokens / self.requests) if self.requests else 0,
+            "retries": self.retries,
+            "splits": self.splits,
+            "failed_texts": self.failed_texts,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        carry: Optional[_PendingText] = None
+        while True:
+            first = carry or await self._queue.get()
+            carry = None
+            batch = [first]
+            tokens = first.tokens
+            deadline = loop.time() + self.max_wait_seconds
+
+            # Fill the batch until a limit is hit or nothing more arrives in time
+            while len(batch) < self.max_items:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if tokens + item.tokens > self.max_tokens:
+                    carry = item
+                    break
+                batch.append(item)
+                tokens += item.tokens
+
+            await self._in_flight.acquire()
+            task = loop.create_task(self._send(batch))
+            self._requests_in_flight.add(task)
+            task.add_done_callback(self._request_done)
+
+    def _request_done(self, task: asyncio.Task) -> None:
+        self._requests_in_flight.discard(task)
+        self._in_flight.release()
+
+    async def _send(self, batch: List[_PendingText]) -> None:
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        tokens = sum(item.tokens for item in batch)
+        try:
+            embeddings = await self._request([item.text for item in batch], tokens)
+        except Exception as e:
+            if len(batch) > 1 and not self.provider.is_retryable(e):
+                # Rejected outright, most likely because of one text; resend
+                # the halves so the rest of the batch still gets embedded
+                self.splits += 1
+                EMBEDDING_BATCH_SPLITS.inc()
+                middle = len(batch) // 2
+                await self._send(batch[:middle])
+                await self._send(batch[middle:])
+                return
+            self.failed_texts += len(batch)
+            EMBEDDING_FAILED_TEXTS.inc(len(batch))
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(EmbeddingFailed(str(e)))
+            return
+
+        self.texts += len(batch)
+        self.tokens += tokens
+        for item, embedding in zip(batch, embeddings):
+            if not item.future.done():
+                item.future.set_result(embedding)
+
+    async def _request(self, texts: List[str], tokens: int) -> List[List[float]]:
+        """Send one embedding request, retrying retryable errors; raises the last error."""
+        self.requests += 1
+        EMBEDDING_BATCH_TEXTS.observe(len(texts))
+        EMBEDDING_BATCH_TOKENS.observe(tokens)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            started = loop.time()
+            try:
+                embeddings = await self.provider.aembed(texts)
+                EMBEDDING_REQUEST_SECONDS.observe(loop.time() - started, outcome="success")
+                return embeddings
+            except Exception as e:
+                EMBEDDING_REQUEST_SECONDS.observe(loop.time() - started, outcome="error")
+                if attempt < self.max_retries and self.provider.is_retryable(e):
+                    self.retries += 1
+                    EMBEDDING_RETRIES.inc()
+                    delay = self._retry_delay(e, attempt)
+                    print(f"Embedding request failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        # Respect the server's Retry-After when given, else use full-jitter backoff
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_delay_seconds)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** attempt))
+
+
+# Global instance
+embedding_batcher = EmbeddingBatcher(
+    embedding_provider,
+    max_tokens=int(os.getenv("EMBED_BATCH_MAX_TOKENS")) if os.getenv("EMBED_BATCH_MAX_TOKENS") else None,
+    max_in_flight=int(os.getenv("EMBED_MAX_IN_FLIGHT", "4")),
+    max_wait_seconds=float(os.getenv("EMBED_BATCH_WAIT_MS", "50")) / 1000,
+    max_retries=int(os.getenv("EMBED_MAX_RETRIES", "5"))
+)
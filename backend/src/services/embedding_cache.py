@@ -0,0 +1,165 @@
+"""
+Embedding Cache - Content-addressed, persistent store of computed embeddings
+
+Embeddings are keyed by (model, dimensions, hash of the normalized text), so
+unchanged chunks, chunks repeated across copies of a document and repeated
+search queries are only ever embedded once. The cache lives in SQLite, is
+bounded in size (least recently used entries are evicted first) and counts its
+hits and misses.
+"""
+
+from array import array
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from ..utils import sanitize_text
+
+
+class EmbeddingCache:
+    """SQLite-backed cache of embedding vectors."""
+
+    def __init__(self, path: Optional[str] = None, max_mb: Optional[float] = None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+        max_mb = max_mb if max_mb is not None else float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+            )
+            self._total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings"
+            ).fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: int) -> str:
+        """Build the cache key for a text embedded with a given model and size."""
+        digest = hashlib.sha256(sanitize_text(text).encode("utf-8")).hexdigest()
+        return f"{model}:{dimensions}:{digest}"
+
+    def get_many(self, texts: Sequence[str], model: str, dimensions: int) -> List[Optional[List[float]]]:
+        """Look up many texts at once; misses come back as None."""
+        keys = [self.make_key(text, model, dimensions) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        model: str,
+        dimensions: int
+    ) -> None:
+        """Store embeddings for the given texts, evicting old entries if over budget."""
+        now = time.time()
+        rows = {
+            self.make_key(text, model, dimensions): array("f", embedding).tobytes()
+            for text, embedding in zip(texts, embeddings)
+        }
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            # Entries being overwritten must not be counted twice
+            keys = list(rows)
+            replaced = 0
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in rows.items()]
+            )
+            self._total_bytes += sum(len(blob) for blob in rows.values()) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is at 90% of its budget."""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings"
+        ).fetchone()
+        target = int(self.max_bytes * 0.9)
+        if not count or total <= target:
+            self._total_bytes = total
+            return
+
+        average_size = total / count
+        to_delete = int((total - target) / average_size) + 1
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_used LIMIT ?
+            )
+            """,
+            (to_delete,)
+        )
+        self.evictions += to_delete
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
+
+
+# Global instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,195 @@
+"""
+Embedding Providers - One interface for every embedding backend
+
+Ingestion and search both embed text through the provider returned by
+get_embedding_provider(), so the model, its dimensions and batching rules are
+defined in one place. The provider's version string is stored on the vector
+collection so vectors from different models are never mixed.
+
+Backends:
+- "openai": OpenAI embeddings API (default)
+- "local": CPU-only feature-hashing embeddings; needs no network or API key,
+  which makes offline ingestion runs and benchmarks possible
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import asyncio
+import os
+import zlib
+
+import numpy as np
+from dotenv import load_dotenv
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from .lexical_index import tokenize
+
+# Load environment variables
+load_dotenv()
+
+
+class EmbeddingProvider(ABC):
+    """Base class for embedding backends."""
+
+    name: str
+    model: str
+    dimensions: int
+    max_batch_size: int = 100
+    # Upper bound on the total tokens of one request
+    max_batch_tokens: int = 100_000
+
+    @property
+    def version(self) -> str:
+        """Identifies the vector space; vectors are only comparable within one version."""
+        return f"{self.name}/{self.model}@{self.dimensions}"
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed up to max_batch_size texts in one call."""
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed; runs embed in a thread unless overridden."""
+        return await asyncio.to_thread(self.embed, texts)
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed embed call is worth retrying (rate limits, server errors)."""
+        return False
+
+    def embed_batched(self, texts: List[str]) -> List[List[float]]:
+        """Embed any number of texts, split into batches of max_batch_size."""
+        embeddings = []
+        for i in range(0, len(texts), self.max_batch_size):
+            embeddings.extend(self.embed(texts[i:i + self.max_batch_size]))
+        return embeddings
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API."""
+
+    name = "openai"
+    # API limits: 2048 inputs and 300k tokens per request
+    max_batch_size = 2048
+    max_batch_tokens = 300_000
+
+    # Native output size of each supported model
+    NATIVE_DIMENSIONS = {
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+        "text-embedding-ada-002": 1536,
+    }
+
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: Optional[int] = None, timeout: float = 30):
+        native = self.NATIVE_DIMENSIONS.get(model)
+        if dimensions and dimensions != native and not self._supports_dimensions(model):
+            raise ValueError(
+                f"EMBEDDING_DIMENSIONS={dimensions} is not supported by {model}: only the "
+                f"text-embedding-3 models accept a custom output size. Unset EMBEDDING_DIMENSIONS"
+                + (f" or set it to {native}." if native else ".")
+            )
+        self.model = model
+        self.dimensions = dimensions or native or 1536
+        self._timeout = timeout
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> OpenAI:
+        # Created lazily so that importing this module never requires an API key
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=self._timeout)
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=self._timeout)
+        return self._async_client
+
+    @staticmethod
+    def _supports_dimensions(model: str) -> bool:
+        # Only the text-embedding-3 models accept a shortened output size;
+        # older models reject the dimensions parameter outright
+        return model.startswith("text-embedding-3")
+
+    def _request_options(self) -> dict:
+        if self._supports_dimensions(self.model) and self.dimensions != self.NATIVE_DIMENSIONS.get(self.model):
+            return {"dimensions": self.dimensions}
+        return {}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts, **self._request_options())
+        return [item.embedding for item in response.data]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        response = await self.async_client.embeddings.create(model=self.model, input=texts, **self._request_options())
+        return [item.embedding for item in response.data]
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline embeddings using signed feature hashing of words and character trigrams.
+
+    Much weaker semantically than a learned model, but deterministic, fast and
+    dependency-free, which is what offline runs and benchmarks need.
+    """
+
+    name = "local"
+    model = "feature-hashing-v1"
+    max_batch_size = 256
+    max_batch_tokens = 1_000_000
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dimensions] += sign * weight
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    @staticmethod
+    def _features(text: str):
+        for word in tokenize(text):
+            yield f"w:{word}", 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield f"c:{padded[i:i + 3]}", 0.5
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        # A single query is cheap enough to run inline; batches from
+        # ingestion (up to max_batch_size texts) would block the event loop
+        if len(texts) <= 1:
+            return self.embed(texts)
+        return await asyncio.to_thread(self.embed, texts)
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Build the provider selected by EMBEDDING_PROVIDER / EMBEDDING_MODEL / EMBEDDING_DIMENSIONS."""
+    backend = os.getenv("EMBEDDING_PROVIDER", "openai")
+    dimensions = int(os.getenv("EMBEDDING_DIMENSIONS")) if os.getenv("EMBEDDING_DIMENSIONS") else None
+
+    if backend == "openai":
+        return OpenAIEmbeddingProvider(
+            model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+            dimensions=dimensions,
+            timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+        )
+    if backend == "local":
+        return LocalEmbeddingProvider(dimensions=dimensions or 384)
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER '{backend}'. Expected 'openai' or 'local'.")
+
+
+# Global instance
+embedding_provider = get_embedding_provider()
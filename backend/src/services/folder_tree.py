@@ -0,0 +1,193 @@
+"""
+Folder Tree - In-memory index of Drive folders for resolving file paths
+
+Built from a files listing (which already contains every folder with its
+parents), so paths for a whole listing resolve without any API calls. Folders
+missing from the listing, such as the "My Drive" root, are fetched once
+through a fallback and memoized.
+
+The tree also gives each file's ancestry (the IDs of every folder above it),
+which ingestion stores on chunks as one metadata key per depth:
+folder_l0 is the top folder of the path, folder_l1 the next one down, and so
+on. A folder at depth d contains exactly the chunks whose folder_l{d} is its
+ID, so a whole subtree is selected by a single equality filter.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional
+import threading
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Chunk metadata key holding the ancestor folder at a depth
+FOLDER_DEPTH_KEY_PREFIX = "folder_l"
+
+
+def folder_depth_key(depth: int) -> str:
+    return f"{FOLDER_DEPTH_KEY_PREFIX}{depth}"
+
+
+def is_folder_depth_key(key: str) -> bool:
+    return key.startswith(FOLDER_DEPTH_KEY_PREFIX) and key[len(FOLDER_DEPTH_KEY_PREFIX):].isdigit()
+
+
+def ancestry_metadata(ancestors: List[str], previous_depth: int = 0) -> Dict[str, str]:
+    """
+    Depth keys for a file's ancestors, top folder first.
+
+    Vector store updates merge metadata, so keys of a deeper previous
+    location (up to previous_depth) are blanked rather than left behind.
+    """
+    metadata = {folder_depth_key(depth): folder_id for depth, folder_id in enumerate(ancestors)}
+    for depth in range(len(ancestors), previous_depth):
+        metadata[folder_depth_key(depth)] = ""
+    return metadata
+
+
+def ancestors_from_metadata(metadata: dict) -> List[str]:
+    """The ancestry stored in a chunk's depth keys, top folder first."""
+    keyed = sorted(
+        (int(key[len(FOLDER_DEPTH_KEY_PREFIX):]), value)
+        for key, value in metadata.items()
+        if is_folder_depth_key(key) and value
+    )
+    return [folder_id for _, folder_id in keyed]
+
+
+class FolderTree:
+    """Maps folder IDs to names and parents, with memoized path resolution."""
+
+    def __init__(self, fetch_folder: Optional[Callable[[str], Optional[dict]]] = None):
+        # fetch_folder(folder_id) returns {"id", "name", "parents"} or None
+        self._fetch_folder = fetch_folder
+        self._folders: Dict[str, Optional[dict]] = {}
+        self._paths: Dict[str, str] = {}
+        self._ancestors: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def add_folders(self, files: Iterable[dict]) -> None:
+        """Add (or update) every folder found in a files listing."""
+        with self._lock:
+            changed = False
+            for f in files:
+                if f.get('mimeType') != FOLDER_MIME_TYPE:
+                    continue
+                folder = {
+                    "name": f['name'],
+                    "parent": (f.get('parents') or [None])[0],
+                }
+                if self._folders.get(f['id']) != folder:
+                    self._folders[f['id']] = folder
+                    changed = True
+            if changed:
+                # Renamed or moved folders change the paths of everything beneath them
+                self._paths.clear()
+                self._ancestors.clear()
+
+    def get_folder(self, folder_id: str) -> Optional[dict]:
+        """Return {"name", "parent"} for a folder, fetching it if it isn't known yet."""
+        with self._lock:
+            if folder_id in self._folders:
+                return self._folders[folder_id]
+
+        folder = None
+        if self._fetch_folder:
+            metadata = self._fetch_folder(folder_id)
+            if metadata:
+                folder = {
+                    "name": metadata['name'],
+                    "parent": (metadata.get('parents') or [None])[0],
+                }
+
+        with self._lock:
+            # Failed lookups are memoized too, so a missing ancestor costs one call
+            self._folders.setdefault(folder_id, folder)
+            return self._folders[folder_id]
+
+    def folder_path(self, folder_id: str) -> str:
+        """Return the full path of a folder, including its own name."""
+        with self._lock:
+            if folder_id in self._paths:
+                return self._paths[folder_id]
+
+        # Walk up until we reach a folder whose path is already known
+        chain: List[tuple] = []
+        seen = set()
+        prefix = ""
+        current = folder_id
+        while current and current not in seen:
+            with self._lock:
+                known = self._paths.get(current)
+            if known is not None:
+                prefix = known
+                break
+            seen.add(current)
+            folder = self.get_folder(current)
+            if not folder:
+                break
+            chain.append((current, folder["name"]))
+            current = folder["parent"]
+
+        path = prefix
+        resolved = {}
+        for ancestor_id, name in reversed(chain):
+            path = f"{path}/{name}"
+            resolved[ancestor_id] = path
+
+        with self._lock:
+            self._paths.update(resolved)
+        return resolved.get(folder_id, prefix)
+
+    def ancestors(self, folder_id: Optional[str]) -> List[str]:
+        """
+        Return the IDs of a folder and every folder above it, top first.
+
+        A folder whose metadata can't be found still counts as an ancestor;
+        the walk just can't go higher than it.
+        """
+        if not folder_id:
+            return []
+        with self._lock:
+            if folder_id in self._ancestors:
+                return list(self._ancestors[folder_id])
+
+        # Walk up until we reach a folder whose ancestry is already known
+        chain: List[str] = []
+        seen = set()
+        prefix: tuple = ()
+        current = folder_id
+        while current and current not in seen:
+            with self._lock:
+                known = self._ancestors.get(current)
+            if known is not None:
+                prefix = known
+                break
+            seen.add(current)
+            chain.append(current)
+            folder = self.get_folder(current)
+            if not folder:
+                break
+            current = folder["parent"]
+
+        ancestry = prefix
+        resolved = {}
+        for ancestor_id in reversed(chain):
+            ancestry = ancestry + (ancestor_id,)
+            resolved[ancestor_id] = ancestry
+
+        with self._lock:
+            self._ancestors.update(resolved)
+        return list(resolved.get(folder_id, prefix))
+
+    def file_path(self, file_name: str, parents: Optional[List[str]] = None) -> str:
+        """Return the full path of a file from its name and parents."""
+        if not parents:
+            return f"/{file_name}"
+        return f"{self.folder_path(parents[0])}/{file_name}"
+
+    def resolve_paths(self, files: Iterable[dict]) -> Dict[str, str]:
+        """Resolve the paths of many files at once, keyed by file ID."""
+        return {f['id']: self.file_path(f['name'], f.get('parents')) for f in files}
+
+    def resolve_ancestors(self, files: Iterable[dict]) -> Dict[str, List[str]]:
+        """Resolve the ancestry of many files at once, keyed by file ID."""
+        return {f['id']: self.ancestors((f.get('parents') or [None])[0]) for f in files}
@@ -0,0 +1,148 @@
+"""
+Index Garbage Collector - Removes orphaned chunks from the vector and lexical indexes
+
+Chunk IDs are "{file_id}_chunk_{n}" and ingestion upserts, so two kinds of
+dead chunks can pile up:
+- chunks of files that are no longer in the index state file table (deleted,
+  trashed, or left behind by a failed removal)
+- chunks numbered at or past the file's recorded chunk count, left over from
+  an older, longer version of the file
+
+The collector reconciles both indexes against the file table, deletes the
+orphans in bulk and reports index size, the dead-vector ratio and vector
+query latency before and after.
+
+Chunks of files that are being ingested aren't recorded yet and would look
+orphaned, so GC takes the index lock shared with ingestion and refuses to
+run while ingestion holds it.
+"""
+
+from typing import Dict, List, Optional
+import statistics
+import time
+
+from .index_lock import index_lock
+from .index_state import index_state
+from .lexical_index import lexical_index
+from .quantized_index import get_int8_index
+from .vector_store import get_collection, get_quantization
+
+
+class IndexGarbageCollector:
+    """Finds and deletes chunks that no indexed file accounts for."""
+
+    def __init__(self, collection, page_size: int = 5000, latency_samples: int = 20):
+        self.collection = collection
+        self.page_size = page_size
+        self.latency_samples = latency_samples
+        self.is_running = False
+        self.last_report: Optional[dict] = None
+
+    def collect(self, dry_run: bool = False) -> dict:
+        """Delete orphaned chunks (or only count them, if dry_run) and return a report."""
+        if not index_lock.acquire("index_gc"):
+            if index_lock.holder == "index_gc":
+                raise ValueError("Index garbage collection is already running.")
+            raise ValueError("Ingestion in progress; run GC once it has finished.")
+
+        self.is_running = True
+        try:
+            started = time.perf_counter()
+            chunk_counts = index_state.get_chunk_counts()
+
+            vector_orphans: List[str] = []
+            reasons = {"deleted_file": 0, "stale_chunk": 0}
+            total_vectors = 0
+            live_sample: List[str] = []
+            for ids, metadatas in self._scan_collection():
+                total_vectors += len(ids)
+                for chunk_id, metadata in zip(ids, metadatas):
+                    reason = self._orphan_reason(metadata or {}, chunk_counts)
+                    if reason:
+                        vector_orphans.append(chunk_id)
+                        reasons[reason] += 1
+                    elif len(live_sample) < self.latency_samples:
+                        live_sample.append(chunk_id)
+
+            lexical_orphans = [
+                chunk_id
+                for chunk_id, file_id, chunk_number in lexical_index.get_chunk_refs()
+                if self._orphan_reason({"file_id": file_id, "chunk_number": chunk_number}, chunk_counts)
+            ]
+
+            latency_before = self._query_latency_ms(live_sample)
+            latency_after = None
+            if not dry_run:
+                latency_after = latency_before
+                for start in range(0, len(vector_orphans), self.page_size):
+                    self.collection.delete(ids=vector_orphans[start:start + self.page_size])
+                if vector_orphans and get_quantization(self.collection) == "int8":
+                    get_int8_index().remove_chunks(vector_orphans)
+                if lexical_orphans:
+                    lexical_index.remove_chunks(lexical_orphans)
+                    lexical_index.vacuum()
+                if vector_orphans:
+                    latency_after = self._query_latency_ms(live_sample)
+
+            report = {
+                "dry_run": dry_run,
+                "files": len(chunk_counts),
+                "total_vectors": total_vectors,
+                "live_vectors": total_vectors - len(vector_orphans),
+                "orphaned_vectors": len(vector_orphans),
+                "orphaned_by_reason": reasons,
+                "dead_vector_ratio": round(len(vector_orphans) / total_vectors, 4) if total_vectors else 0.0,
+                "orphaned_lexical_chunks": len(lexical_orphans),
+                "query_latency_before_ms": latency_before,
+                "query_latency_after_ms": latency_after,
+                "query_latency_reclaimed_ms": (
+                    round(latency_before - latency_after, 2)
+                    if latency_before is not None and latency_after is not None else None
+                ),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            self.last_report = report
+            print(
+                f"Index GC{' (dry run)' if dry_run else ''}: {len(vector_orphans)}/{total_vectors} "
+                f"vectors and {len(lexical_orphans)} lexical chunks orphaned"
+            )
+            return report
+        finally:
+            self.is_running = False
+            index_lock.release()
+
+    def _scan_collection(self):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page["ids"], page["metadatas"]
+            offset += len(page["ids"])
+
+    @staticmethod
+    def _orphan_reason(metadata: dict, chunk_counts: Dict[str, Optional[int]]) -> Optional[str]:
+        file_id = metadata.get("file_id")
+        if file_id not in chunk_counts:
+            return "deleted_file"
+        chunk_count = chunk_counts[file_id]
+        # Files recorded before chunk counts were kept can't be judged
+        if chunk_count is not None and (metadata.get("chunk_number") or 0) >= chunk_count:
+            return "stale_chunk"
+        return None
+
+    def _query_latency_ms(self, sample_ids: List[str]) -> Optional[float]:
+        """Median latency of top-10 vector queries, using live chunks' own vectors as queries."""
+        if not sample_ids:
+            return None
+        embeddings = self.collection.get(ids=sample_ids, include=["embeddings"])["embeddings"]
+        timings = []
+        for embedding in embeddings:
+            started = time.perf_counter()
+            self.collection.query(query_embeddings=[embedding], n_results=10, include=[])
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 2)
+
+
+# Global instance
+index_gc = IndexGarbageCollector(get_collection())
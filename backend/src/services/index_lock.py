@@ -0,0 +1,35 @@
+"""
+Index Lock - Keeps ingestion and index garbage collection from overlapping
+
+GC treats chunks that no indexed file accounts for as orphans, and the chunks
+of a file being ingested aren't recorded until the file is stored, so a GC
+pass during ingestion would delete fresh chunks. Both take this lock for
+their whole run. Neither waits for the other: whoever can't take it is
+turned away and can try again later.
+"""
+
+from typing import Optional
+import threading
+
+
+class IndexLock:
+    """A non-blocking lock that remembers which job holds it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.holder: Optional[str] = None
+
+    def acquire(self, holder: str) -> bool:
+        """Take the lock for holder; returns False if another job has it."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        self.holder = holder
+        return True
+
+    def release(self) -> None:
+        self.holder = None
+        self._lock.release()
+
+
+# Global instance
+index_lock = IndexLock()
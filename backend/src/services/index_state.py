@@ -0,0 +1,439 @@
+"""
+Index State Store - Persists what has already been ingested
+
+Keeps the Drive Changes API page token from the last successful run and the
+Drive version (modifiedTime / md5Checksum / parents / name) of every file that
+is currently in the vector database, so later ingestion runs only have to
+process files that were added, modified, moved or removed. Files that were
+deliberately not indexed (too large, timed out, ...) are kept with the reason.
+
+indexed_files is also the file table for search: file-level metadata (name,
+path, link, ...) lives here once per file rather than on every chunk, and is
+joined into search results by file_id.
+
+file_ancestors is the folder-subtree index: every folder above each indexed
+file, with its depth. Folder-scoped search uses it to find the depth key to
+filter on, and ingestion to find the files beneath a moved folder.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+
+class IndexStateStore:
+    """SQLite-backed record of the ingestion sync state."""
+
+    PAGE_TOKEN_KEY = "changes_page_token"
+
+    # File-level metadata columns, added to databases created before they existed
+    FILE_COLUMNS = {
+        "path": "TEXT",
+        "mime_type": "TEXT",
+        "size": "TEXT",
+        "web_view_link": "TEXT",
+        "folder_id": "TEXT",
+        "chunk_count": "INTEGER",
+    }
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("INDEX_STATE_PATH", "./index_state.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS indexed_files (
+                    file_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    parents TEXT,
+                    modified_time TEXT,
+                    md5_checksum TEXT,
+                    indexed_at TEXT
+                )
+                """
+            )
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(indexed_files)")}
+            for column, column_type in self.FILE_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE indexed_files ADD COLUMN {column} {column_type}")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_ancestors (
+                    file_id TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    folder_id TEXT NOT NULL,
+                    PRIMARY KEY (file_id, depth)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_file_ancestors_folder ON file_ancestors (folder_id, file_id)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS retry_queue (
+                    file_id TEXT PRIMARY KEY,
+                    file_metadata TEXT,
+                    reason TEXT,
+                    attempts INTEGER,
+                    queued_at TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS skipped_files (
+                    file_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    reason TEXT,
+                    skipped_at TEXT
+                )
+                """
+            )
+
+    # ------------------------------------------------------------------
+    # Changes API page token
+    # ------------------------------------------------------------------
+
+    def get_page_token(self) -> Optional[str]:
+        """Return the saved Changes API page token, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = ?", (self.PAGE_TOKEN_KEY,)
+            ).fetchone()
+        return row["value"] if row else None
+
+    def set_page_token(self, token: str) -> None:
+        """Save the page token to resume from on the next run."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                (self.PAGE_TOKEN_KEY, token)
+            )
+
+    # ------------------------------------------------------------------
+    # Per-file versions
+    # ------------------------------------------------------------------
+
+    def get_file(self, file_id: str) -> Optional[dict]:
+        """Return the recorded version of a file, or None if it isn't indexed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM indexed_files WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_file_ids(self) -> List[str]:
+        """Return the IDs of all indexed files."""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_id FROM indexed_files").fetchall()
+        return [row["file_id"] for row in rows]
+
+    def get_files(self, file_ids: List[str]) -> Dict[str, dict]:
+        """Return the records of the given files, keyed by file ID."""
+        records = {}
+        unique_ids = list(dict.fromkeys(file_ids))
+        with self._lock:
+            for start in range(0, len(unique_ids), 500):
+                batch = unique_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for row in self._conn.execute(
+                    f"SELECT * FROM indexed_files WHERE file_id IN ({placeholders})", batch
+                ):
+                    records[row["file_id"]] = dict(row)
+        return records
+
+    def get_chunk_counts(self) -> Dict[str, Optional[int]]:
+        """Return the chunk count of every indexed file (None if it wasn't recorded)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_id, chunk_count FROM indexed_files").fetchall()
+        return {row["file_id"]: row["chunk_count"] for row in rows}
+
+    def is_unchanged(self, file_metadata: dict) -> bool:
+        """Check whether a Drive file matches the version that was last indexed."""
+        record = self.get_file(file_metadata['id'])
+        if not record:
+            return False
+        return (
+            record["modified_time"] == file_metadata.get('modifiedTime')
+            and record["md5_checksum"] == file_metadata.get('md5Checksum')
+            and record["name"] == file_metadata.get('name')
+            and record["parents"] == self._join_parents(file_metadata.get('parents'))
+        )
+
+    def is_content_unchanged(self, file_metadata: dict) -> bool:
+        """
+        Check whether only a file's metadata (name, location) changed since it was indexed.
+
+        Uses the md5 checksum where Drive provides one (binary files), since
+        renames bump modifiedTime; Google Docs and Sheets have no checksum, so
+        for them modifiedTime must match.
+        """
+        record = self.get_file(file_metadata['id'])
+        return bool(record) and self._same_content(record, file_metadata)
+
+    def record_file(
+        self,
+        file_metadata: dict,
+        path: Optional[str] = None,
+        chunk_count: Optional[int] = None,
+        ancestors: Optional[List[str]] = None
+    ) -> None:
+        """Record that a file version has been indexed, along with its file-level metadata."""
+        with self._lock, self._conn:
+            if ancestors is not None:
+                self._set_ancestors(file_metadata['id'], ancestors)
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO indexed_files
+                    (file_id, name, parents, modified_time, md5_checksum, indexed_at,
+                     path, mime_type, size, web_view_link, folder_id, chunk_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    file_metadata['id'],
+                    file_metadata.get('name'),
+                    self._join_parents(file_metadata.get('parents')),
+                    file_metadata.get('modifiedTime'),
+                    file_metadata.get('md5Checksum'),
+                    datetime.now(timezone.utc).isoformat(),
+                    path,
+                    file_metadata.get('mimeType'),
+                    file_metadata.get('size'),
+                    file_metadata.get('webViewLink'),
+                    self._folder_id(file_metadata),
+                    chunk_count,
+                )
+            )
+
+    def update_file_metadata(self, file_metadata: dict, path: Optional[str] = None) -> Optional[str]:
+        """
+        Update the metadata of an indexed file after a rename or move.
+
+        Returns the file's previous folder ID.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT folder_id FROM indexed_files WHERE file_id = ?", (file_metadata['id'],)
+            ).fetchone()
+            self._conn.execute(
+                """
+                UPDATE indexed_files
+                SET name = ?, parents = ?, modified_time = ?, path = ?, web_view_link = ?, folder_id = ?
+                WHERE file_id = ?
+                """,
+                (
+                    file_metadata.get('name'),
+                    self._join_parents(file_metadata.get('parents')),
+                    file_metadata.get('modifiedTime'),
+                    path,
+                    file_metadata.get('webViewLink'),
+                    self._folder_id(file_metadata),
+                    file_metadata['id'],
+                )
+            )
+        return row["folder_id"] if row else None
+
+    def remove_file(self, file_id: str) -> None:
+        """Forget a file that has been removed from the index."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM indexed_files WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM file_ancestors WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM skipped_files WHERE file_id = ?", (file_id,))
+            self._conn.execute("DELETE FROM retry_queue WHERE file_id = ?", (file_id,))
+
+    # ------------------------------------------------------------------
+    # Folder-subtree index
+    # ------------------------------------------------------------------
+
+    def set_file_ancestors(self, file_id: str, ancestors: List[str]) -> None:
+        """Replace the recorded ancestry of a file (top folder first)."""
+        with self._lock, self._conn:
+            self._set_ancestors(file_id, ancestors)
+
+    def get_file_ancestors(self, file_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT folder_id FROM file_ancestors WHERE file_id = ? ORDER BY depth", (file_id,)
+            ).fetchall()
+        return [row["folder_id"] for row in rows]
+
+    def get_folder_depth(self, folder_id: str) -> Optional[int]:
+        """Depth of a folder in the tree, or None if no indexed file lies beneath it."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT depth FROM file_ancestors WHERE folder_id = ? LIMIT 1", (folder_id,)
+            ).fetchone()
+        return row["depth"] if row else None
+
+    def get_subtree_file_ids(self, folder_id: str) -> List[str]:
+        """Every indexed file in a folder or any of its subfolders."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT file_id FROM file_ancestors WHERE folder_id = ?
+                UNION
+                SELECT file_id FROM indexed_files WHERE folder_id = ?
+                """,
+                (folder_id, folder_id)
+            ).fetchall()
+        return [row["file_id"] for row in rows]
+
+    def get_file_ancestry(self, folder_ids: Optional[List[str]] = None) -> Dict[str, Tuple[Optional[str], List[str]]]:
+        """
+        (folder ID, recorded ancestors) by file ID, for checking ancestry against the folder tree.
+
+        Covers every indexed file, or with folder_ids the files beneath those
+        folders plus any file whose ancestry was never recorded.
+        """
+        with self._lock:
+            if folder_ids is None:
+                files = self._conn.execute("SELECT file_id, folder_id FROM indexed_files").fetchall()
+            else:
+                files = []
+                for start in range(0, len(folder_ids), 500):
+                    batch = folder_ids[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    files += self._conn.execute(
+                        f"""
+                        SELECT file_id, folder_id FROM indexed_files
+                        WHERE file_id IN (SELECT file_id FROM file_ancestors WHERE folder_id IN ({placeholders}))
+                        """,
+                        batch
+                    ).fetchall()
+                files += self._conn.execute(
+                    """
+                    SELECT file_id, folder_id FROM indexed_files f
+                    WHERE folder_id IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM file_ancestors a WHERE a.file_id = f.file_id)
+                    """
+                ).fetchall()
+            ancestry: Dict[str, List[str]] = {}
+            if folder_ids is None:
+                rows = self._conn.execute("SELECT file_id, folder_id FROM file_ancestors ORDER BY file_id, depth").fetchall()
+            else:
+                file_ids = [row["file_id"] for row in files]
+                rows = []
+                for start in range(0, len(file_ids), 500):
+                    batch = file_ids[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows += self._conn.execute(
+                        f"SELECT file_id, folder_id FROM file_ancestors WHERE file_id IN ({placeholders}) ORDER BY file_id, depth",
+                        batch
+                    ).fetchall()
+            for row in rows:
+                ancestry.setdefault(row["file_id"], []).append(row["folder_id"])
+        return {row["file_id"]: (row["folder_id"], ancestry.get(row["file_id"], [])) for row in files}
+
+    def _set_ancestors(self, file_id: str, ancestors: List[str]) -> None:
+        self._conn.execute("DELETE FROM file_ancestors WHERE file_id = ?", (file_id,))
+        self._conn.executemany(
+            "INSERT INTO file_ancestors (file_id, depth, folder_id) VALUES (?, ?, ?)",
+            [(file_id, depth, folder_id) for depth, folder_id in enumerate(ancestors)]
+        )
+
+    # ------------------------------------------------------------------
+    # Retry queue. Files that failed to ingest are queued here, because the
+    # Changes API page token moves past them and would never return them again.
+    # ------------------------------------------------------------------
+
+    def queue_retry(self, file_metadata: dict, reason: str) -> None:
+        """Queue a file that failed to ingest for the next run."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO retry_queue (file_id, file_metadata, reason, attempts, queued_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (file_id) DO UPDATE SET
+                    file_metadata = excluded.file_metadata,
+                    reason = excluded.reason,
+                    attempts = retry_queue.attempts + 1,
+                    queued_at = excluded.queued_at
+                """,
+                (
+                    file_metadata['id'],
+                    json.dumps(file_metadata),
+                    reason,
+                    datetime.now(timezone.utc).isoformat(),
+                )
+            )
+
+    def get_retry_files(self) -> List[dict]:
+        """Return the Drive metadata of every queued file."""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_metadata FROM retry_queue ORDER BY queued_at").fetchall()
+        return [json.loads(row["file_metadata"]) for row in rows]
+
+    def get_retry_count(self) -> int:
+        """Return the number of queued files."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM retry_queue").fetchone()[0]
+
+    def clear_retry(self, file_id: str) -> None:
+        """Drop a file from the retry queue once it has been handled."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM retry_queue WHERE file_id = ?", (file_id,))
+
+    # ------------------------------------------------------------------
+    # Skipped files
+    # ------------------------------------------------------------------
+
+    def record_skip(self, file_metadata: dict, reason: str) -> None:
+        """
+        Record that a file version was skipped on purpose.
+
+        The version is recorded as handled too, so the file is not retried
+        until it changes.
+        """
+        self.record_file(file_metadata)
+        self.clear_retry(file_metadata['id'])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO skipped_files (file_id, name, reason, skipped_at) VALUES (?, ?, ?, ?)",
+                (
+                    file_metadata['id'],
+                    file_metadata.get('name'),
+                    reason,
+                    datetime.now(timezone.utc).isoformat(),
+                )
+            )
+
+    def clear_skip(self, file_id: str) -> None:
+        """Forget a skip once the file has been indexed."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM skipped_files WHERE file_id = ?", (file_id,))
+
+    def get_skipped_files(self) -> List[dict]:
+        """Return every skipped file with its reason, most recent first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, name, reason, skipped_at FROM skipped_files ORDER BY skipped_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _same_content(record: dict, file_metadata: dict) -> bool:
+        if file_metadata.get('md5Checksum'):
+            return record["md5_checksum"] == file_metadata['md5Checksum']
+        return record["modified_time"] == file_metadata.get('modifiedTime')
+
+    @staticmethod
+    def _join_parents(parents: Optional[List[str]]) -> str:
+        return ",".join(parents or [])
+
+    @staticmethod
+    def _folder_id(file_metadata: dict) -> Optional[str]:
+        parents = file_metadata.get('parents')
+        return parents[0] if parents else None
+
+
+# Global instance
+index_state = IndexStateStore()
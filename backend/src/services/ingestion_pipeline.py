@@ -0,0 +1,112 @@
+"""
+Ingestion Pipeline - Runs work items through concurrent stages
+
+Each stage has its own pool of workers and hands its output to the next stage
+through a bounded queue, so slow network calls in one stage overlap with work
+in the others while memory stays bounded by the queue sizes. A failing item is
+reported through on_error and dropped without affecting the rest of the run.
+
+A stage may also fan an item out into several items by using an async
+generator as its handler. Each yielded item is queued for the next stage as
+soon as it is produced, so a full queue pauses the generator.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import asyncio
+import inspect
+
+
+class PipelineStage:
+    """
+    A single pipeline stage.
+
+    The handler receives an item and returns the item to pass on to the next
+    stage, or None to stop processing that item. An async generator handler
+    passes on every item it yields instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Union[Awaitable[Optional[Any]], AsyncIterator[Any]]],
+        concurrency: int = 1
+    ):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+
+
+class StagedPipeline:
+    """Feeds items through a sequence of stages with bounded queues in between."""
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        queue_size: int = 16,
+        on_error: Optional[Callable[[Any, str, Exception], None]] = None
+    ):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+        self._queues: List[asyncio.Queue] = []
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Items waiting in front of each stage of a running pipeline."""
+        return {stage.name: queue.qsize() for stage, queue in zip(self.stages, self._queues)}
+
+    async def run(self, items: Iterable[Any]) -> None:
+        """Process all items and return once every stage has drained."""
+        queues = self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers: List[List[asyncio.Task]] = []
+
+        for index, stage in enumerate(self.stages):
+            next_queue = queues[index + 1] if index + 1 < len(queues) else None
+            workers.append([
+                asyncio.create_task(self._worker(stage, queues[index], next_queue))
+                for _ in range(stage.concurrency)
+            ])
+
+        try:
+            for item in items:
+                await queues[0].put(item)
+
+            # Once a stage's queue is fully processed, everything it produced has
+            # been handed to the next queue, so draining in order is sufficient.
+            for queue, stage_workers in zip(queues, workers):
+                await queue.join()
+                for task in stage_workers:
+                    task.cancel()
+        finally:
+            all_workers = [task for stage_workers in workers for task in stage_workers]
+            for task in all_workers:
+                task.cancel()
+            await asyncio.gather(*all_workers, return_exceptions=True)
+            self._queues = []
+
+    async def _worker(
+        self,
+        stage: PipelineStage,
+        queue: asyncio.Queue,
+        next_queue: Optional[asyncio.Queue]
+    ) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                if inspect.isasyncgenfunction(stage.handler):
+                    async for result in stage.handler(item):
+                        if next_queue is not None:
+                            await next_queue.put(result)
+                else:
+                    result = await stage.handler(item)
+                    if result is not None and next_queue is not None:
+                        await next_queue.put(result)
+            except Exception as e:
+                if self.on_error:
+                    # A failing callback must not kill the worker: once every
+                    # worker of a stage is gone, queue.join() never returns
+                    try:
+                        self.on_error(item, stage.name, e)
+                    except Exception as callback_error:
+                        print(f"Error handling a failed {stage.name} item: {callback_error}")
+            finally:
+                queue.task_done()
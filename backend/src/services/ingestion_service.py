@@ -9,25 +9,63 @@ This service:
 5. Stores chunks and embeddings in ChromaDB
 """
 
-from typing import List, Dict, Optional
+from typing import AsyncIterator, BinaryIO, List, Dict, Optional, Tuple
+import codecs
 import os
+import tempfile
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
-import chromadb
 from .drive_service import drive_service
-from ..types import IngestionStatus, MimeType
-import PyPDF2
-import io
+from .answer_cache import answer_cache
+from .embedding_batcher import embedding_batcher
+from .embedding_cache import embedding_cache
+from .embedding_provider import embedding_provider
+from .folder_tree import FOLDER_MIME_TYPE, ancestry_metadata, is_folder_depth_key
+from .index_lock import index_lock
+from .index_state import index_state
+from .lexical_index import lexical_index
+from .quantized_index import get_int8_index
+from .vector_store import VECTOR_DB_SECONDS, get_collection, get_quantization
+from .ingestion_pipeline import PipelineStage, StagedPipeline
+from .pdf_extractor import PdfSkipped, pdf_extractor
+from ..types import IngestionStatus, MimeType, SkippedFile
+from ..utils.chunking import CsvChunker, TextChunker, count_tokens
+from ..utils.memory import MemoryHighWaterMark
+from ..utils.metrics import SIZE_BUCKETS, registry
 import asyncio
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# Initialize ChromaDB client (persistent)
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+# Per-stage concurrency of the ingestion pipeline
+DOWNLOAD_CONCURRENCY = int(os.getenv("INGEST_DOWNLOAD_CONCURRENCY", "8"))
+EXTRACT_CONCURRENCY = int(os.getenv("INGEST_EXTRACT_CONCURRENCY", str(os.cpu_count() or 2)))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "8"))
+STORE_CONCURRENCY = int(os.getenv("INGEST_STORE_CONCURRENCY", "1"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+
+# Streaming limits: chunks embedded and stored together, exports kept in memory
+# before spilling to disk, and bytes decoded at a time
+WINDOW_CHUNKS = int(os.getenv("INGEST_WINDOW_CHUNKS", "64"))
+SPOOL_MAX_BYTES = int(os.getenv("INGEST_SPOOL_MAX_MB", "8")) * 1024 * 1024
+READ_BLOCK_BYTES = 256 * 1024
+
+# Metadata stored on each chunk, plus the folder depth keys (folder_l0, ...);
+# file-level fields are joined in at search time
+CHUNK_METADATA_KEYS = ("file_id", "folder_id", "chunk_number")
+
+EXTRACTION_SECONDS = registry.histogram(
+    "ingest_extraction_seconds", "Time spent extracting the text of a file", ["mime_type"]
+)
+CHUNKING_SECONDS = registry.histogram("ingest_chunking_seconds", "Time spent chunking the text of a file", ["mime_type"])
+FILE_CHUNKS = registry.histogram("ingest_file_chunks", "Chunks created per file", ["mime_type"], buckets=SIZE_BUCKETS)
+INGESTED_FILES = registry.counter("ingest_files_total", "Files finished by ingestion, by outcome", ["outcome"])
+
+SUPPORTED_MIME_TYPES = [
+    'application/vnd.google-apps.document',     # Google Docs
+    'application/vnd.google-apps.spreadsheet',  # Google Sheets
+    'application/pdf'                           # PDFs
+]
 
 
 class IngestionService:
@@ -37,13 +75,9 @@ class IngestionService:
 
     def __init__(self):
         # Initialize vector database collection
-        try:
-            self.collection = chroma_client.get_collection(name="drive_documents")
-        except:
-            self.collection = chroma_client.create_collection(
-                name="drive_documents",
-                metadata={"hnsw:space": "cosine"}
-            )
+        self.collection = get_collection()
+        # int8 storage keeps a quantized copy of every vector alongside Chroma
+        self.int8_index = get_int8_index() if get_quantization(self.collection) == "int8" else None
 
         # Status tracking
         self.is_ingesting = False
@@ -51,10 +85,47 @@ class IngestionService:
         self.processed_files = 0
         self.current_file = None
         self.error = None
+        self.peak_memory_mb = None
+        self._memory = MemoryHighWaterMark()
+        self._pipeline: Optional[StagedPipeline] = None
+        registry.gauge(
+            "ingest_pipeline_queue_depth", "Items waiting in front of each ingestion stage", ["stage"],
+            callback=self._queue_depths
+        )
         
-    async def start_ingestion(self) -> Dict[str, str]:
-        if self.is_ingesting:
-            raise ValueError("Ingestion is already in progress.")
+    def _queue_depths(self) -> Dict[Tuple[str], int]:
+        pipeline = self._pipeline
+        if pipeline is None:
+            return {}
+        return {(stage,): depth for stage, depth in pipeline.queue_depths().items()}
+
+    def reserve(self) -> None:
+        """
+        Claim the index for an ingestion run, before it is started in the background.
+
+        Takes the index lock shared with index GC, so a run scheduled by a
+        request can't be overtaken by a GC pass before it starts. Raises
+        ValueError if ingestion or index GC is already running.
+        """
+        if not index_lock.acquire("ingestion"):
+            if index_lock.holder == "ingestion":
+                raise ValueError("Ingestion is already in progress.")
+            raise ValueError("Index garbage collection is in progress.")
+        self.is_ingesting = True
+
+    async def start_ingestion(self, full_sync: bool = False, reserved: bool = False) -> Dict[str, str]:
+        """
+        Ingest new and changed Drive files into the vector database.
+
+        The first run (or a run with full_sync=True) crawls the whole Drive.
+        Later runs replay the Drive Changes API from the page token saved by
+        the previous run and only process files that were added, modified,
+        moved or removed since then.
+
+        Pass reserved=True if reserve() was already called for this run.
+        """
+        if not reserved:
+            self.reserve()
 
         try:
             print("==================================================")
@@ -64,103 +135,421 @@ class IngestionService:
             self.total_files = 0
             self.current_file = "Fetching files from Drive..."
             self.error = None
+            self.peak_memory_mb = None
+            self._memory.start()
             
             if not drive_service.is_authenticated():
                 raise ValueError("Drive service is not authenticated. Please connect to Google Drive first.")
 
-            print("Fetching files from Google Drive...")
-            all_files = await asyncio.to_thread(drive_service.list_files)
-            
-            # =================================================================
-            # FOR DEVELOPMENT: Filter for a specific folder to speed up testing
-            # To use, set a folder name. To disable, set to None.
-            # =================================================================
-            target_folder_name = None # <-- SET YOUR FOLDER NAME HERE
-            # =================================================================
-
-            files_to_process = []
-            if target_folder_name:
-                print(f"DEV MODE: Filtering for folder named '{target_folder_name}'")
-                folders = [f for f in all_files if f['mimeType'] == 'application/vnd.google-apps.folder' and f['name'] == target_folder_name]
-                if not folders:
-                    print(f"WARNING: Could not find a folder named '{target_folder_name}'. Ingesting all files instead.")
-                    files_to_process = all_files
-                else:
-                    target_folder_id = folders[0]['id']
-                    print(f"Found folder '{target_folder_name}' with ID: {target_folder_id}")
-                    files_to_process = [f for f in all_files if target_folder_id in f.get('parents', [])]
+            if self.int8_index and self.int8_index.count() != self.collection.count():
+                print("Rebuilding the int8 vector index from the vector database...")
+                rebuilt = await asyncio.to_thread(self.int8_index.rebuild, self.collection)
+                print(f"Rebuilt the int8 vector index with {rebuilt} vectors")
+
+            page_token = None if full_sync else index_state.get_page_token()
+            if page_token:
+                print("Fetching changes since the last ingestion run...")
+                changes, new_page_token = await asyncio.to_thread(drive_service.list_changes, page_token)
+                files_to_process, removed_file_ids, metadata_only = self._plan_delta_sync(changes)
+                changed_folders = list({
+                    c['fileId'] for c in changes if (c.get('file') or {}).get('mimeType') == FOLDER_MIME_TYPE
+                })
             else:
-                files_to_process = all_files
-            
-            print(f"Successfully fetched {len(files_to_process)} total files to process from Drive")
-
-            # --- THIS IS THE CORRECTED PART ---
-            supported_mime_types = [
-                'application/vnd.google-apps.document',  # Google Docs
-                'application/vnd.google-apps.spreadsheet', # Google Sheets
-                'application/pdf'                        # PDFs
-            ]
-            # ------------------------------------
-
-            supported_files = [
-                f for f in files_to_process
-                if f.get('mimeType') in supported_mime_types
-            ]
-            
-            self.total_files = len(supported_files)
-            if self.total_files == 0:
-                print("No supported files found to ingest in the target folder.")
-                self.is_ingesting = False
-                return {"message": "No supported files found to ingest."}
+                # Take the start token before listing so that changes made during the
+                # crawl are replayed on the next run instead of being lost.
+                new_page_token = await asyncio.to_thread(drive_service.get_start_page_token)
+                files_to_process, removed_file_ids, metadata_only = await self._plan_full_sync(force=full_sync)
+                # The crawl rebuilt the whole folder tree, so every file's ancestry is checked
+                changed_folders = None
 
-            print(f"Found {self.total_files} supported files to process")
+            files_to_process = self._add_queued_retries(files_to_process, removed_file_ids, metadata_only)
 
-            for i, file in enumerate(supported_files):
-                self.current_file = file['name']
-                self.processed_files = i + 1
-                print(f"Processing: {self.current_file} ({self.processed_files}/{self.total_files})")
-                
-                text = await asyncio.to_thread(self._extract_text_from_file, file)
+            if removed_file_ids:
+                print(f"Removing {len(removed_file_ids)} deleted or trashed files from the index")
+                await asyncio.to_thread(self._remove_files, removed_file_ids)
 
-                if not text:
-                    print(f"  Skipping '{self.current_file}' due to empty content.")
-                    continue
+            if metadata_only:
+                print(f"Updating metadata of {len(metadata_only)} renamed or moved files")
+                await asyncio.to_thread(self._update_file_metadata, metadata_only)
 
-                try:
-                    file_path = await asyncio.to_thread(
-                        drive_service.build_file_path,
-                        file['id'],
-                        file['name'],
-                        file.get('parents')
-                    )
-                    
-                    chunks = self._chunk_text(text, file, file_path)
-                    if not chunks:
-                        print(f"  No chunks created for '{self.current_file}'.")
-                        continue
-                    
-                    print(f"  Created {len(chunks)} chunks")
-                    
-                    embeddings = await asyncio.to_thread(self._generate_embeddings, chunks)
-                    print(f"  Generated embeddings")
-                    
-                    await asyncio.to_thread(self._store_in_vector_db, chunks, embeddings)
-                    print(f"  Stored in vector database")
-
-                except Exception as e:
-                    print(f"  Error processing file {self.current_file}: {e}")
+            # Files beneath moved folders, and files indexed before their ancestry was recorded
+            await asyncio.to_thread(self._refresh_ancestry, changed_folders)
 
+            self.total_files = len(files_to_process)
+            if self.total_files == 0:
+                print("No new or changed files to ingest.")
+            else:
+                print(f"Found {self.total_files} new or changed files to process")
+
+            pipeline = self._pipeline = StagedPipeline(
+                stages=[
+                    PipelineStage("download", self._download_stage, DOWNLOAD_CONCURRENCY),
+                    PipelineStage("extract", self._extract_stage, EXTRACT_CONCURRENCY),
+                    PipelineStage("embed", self._embed_stage, EMBED_CONCURRENCY),
+                    PipelineStage("store", self._store_stage, STORE_CONCURRENCY),
+                ],
+                queue_size=PIPELINE_QUEUE_SIZE,
+                on_error=self._on_pipeline_error
+            )
+            # Resolve every path and ancestry in one pass over the folder tree
+            paths = await asyncio.to_thread(drive_service.folder_tree.resolve_paths, files_to_process)
+            ancestries = await asyncio.to_thread(self._resolve_ancestries, files_to_process)
+            await pipeline.run(
+                {"file": file, "path": paths[file['id']], **ancestries[file['id']]} for file in files_to_process
+            )
+
+            index_state.set_page_token(new_page_token)
             print(f"Ingestion completed! Processed {self.processed_files}/{self.total_files} files")
             
         except Exception as e:
             self.error = str(e)
             print(f"Ingestion error: {self.error}")
         finally:
+            self._memory.stop()
+            self._pipeline = None
+            self.peak_memory_mb = self._memory.peak_mb
+            print(f"Peak memory during ingestion: {self.peak_memory_mb} MB")
             self.is_ingesting = False
             self.current_file = None
+            index_lock.release()
 
         return {"message": "Ingestion completed successfully"}
 
+    async def _plan_full_sync(self, force: bool = False) -> Tuple[List[dict], List[str], List[dict]]:
+        """
+        Crawl the whole Drive and work out which files need (re-)ingesting.
+
+        Files that are unchanged since they were last indexed are skipped unless
+        force is set, and files that were only renamed or moved are returned
+        separately for a metadata update. Indexed files that no longer appear
+        in the listing are returned for removal.
+        """
+        print("Fetching files from Google Drive...")
+        all_files = await asyncio.to_thread(drive_service.list_files)
+        drive_service.folder_tree.add_folders(all_files)
+        
+        # =================================================================
+        # FOR DEVELOPMENT: Filter for a specific folder to speed up testing
+        # To use, set a folder name. To disable, set to None.
+        # =================================================================
+        target_folder_name = None # <-- SET YOUR FOLDER NAME HERE
+        # =================================================================
+
+        files_to_process = []
+        if target_folder_name:
+            print(f"DEV MODE: Filtering for folder named '{target_folder_name}'")
+            folders = [f for f in all_files if f['mimeType'] == 'application/vnd.google-apps.folder' and f['name'] == target_folder_name]
+            if not folders:
+                print(f"WARNING: Could not find a folder named '{target_folder_name}'. Ingesting all files instead.")
+                files_to_process = all_files
+            else:
+                target_folder_id = folders[0]['id']
+                print(f"Found folder '{target_folder_name}' with ID: {target_folder_id}")
+                files_to_process = [f for f in all_files if target_folder_id in f.get('parents', [])]
+        else:
+            files_to_process = all_files
+        
+        print(f"Successfully fetched {len(files_to_process)} total files to process from Drive")
+
+        supported_files = [
+            f for f in files_to_process
+            if f.get('mimeType') in SUPPORTED_MIME_TYPES
+        ]
+
+        # Anything we indexed that is gone from the listing was deleted or trashed
+        listed_ids = {f['id'] for f in all_files}
+        removed_file_ids = [fid for fid in index_state.get_file_ids() if fid not in listed_ids]
+
+        if force:
+            return supported_files, removed_file_ids, []
+
+        changed_files = [f for f in supported_files if not index_state.is_unchanged(f)]
+        print(f"Skipping {len(supported_files) - len(changed_files)} unchanged files")
+        files_to_process, metadata_only = self._split_metadata_only(changed_files)
+        return files_to_process, removed_file_ids, metadata_only
+
+    def _plan_delta_sync(self, changes: List[dict]) -> Tuple[List[dict], List[str], List[dict]]:
+        """
+        Turn a list of Drive changes into files to ingest and files to remove.
+
+        Only the latest change per file is considered. Removed and trashed files
+        are dropped from the index; added and modified files are re-ingested;
+        renamed and moved files only get their metadata updated.
+        """
+        latest_changes = {}
+        for change in changes:
+            latest_changes[change['fileId']] = change
+
+        # Keep the folder tree current with renamed and moved folders
+        drive_service.folder_tree.add_folders(
+            c['file'] for c in latest_changes.values()
+            if c.get('file') and not c['file'].get('trashed')
+        )
+
+        files_to_process = []
+        removed_file_ids = []
+        for file_id, change in latest_changes.items():
+            file = change.get('file')
+            if change.get('removed') or not file or file.get('trashed'):
+                if index_state.get_file(file_id):
+                    removed_file_ids.append(file_id)
+                continue
+
+            if file.get('mimeType') not in SUPPORTED_MIME_TYPES:
+                continue
+
+            if not index_state.is_unchanged(file):
+                files_to_process.append(file)
+
+        files_to_process, metadata_only = self._split_metadata_only(files_to_process)
+        return files_to_process, removed_file_ids, metadata_only
+
+    def _add_queued_retries(
+        self,
+        files_to_process: List[dict],
+        removed_file_ids: List[str],
+        metadata_only: List[dict]
+    ) -> List[dict]:
+        """Add files that failed in earlier runs, unless this run already handles them."""
+        planned = {f['id'] for f in files_to_process} | set(removed_file_ids) | {f['id'] for f in metadata_only}
+        retries = [f for f in index_state.get_retry_files() if f['id'] not in planned]
+        if retries:
+            print(f"Retrying {len(retries)} files that failed in earlier runs")
+        return files_to_process + retries
+
+    def _split_metadata_only(self, changed_files: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """Separate files whose content changed from files that were only renamed or moved."""
+        files_to_process = []
+        metadata_only = []
+        for file in changed_files:
+            if index_state.is_content_unchanged(file):
+                metadata_only.append(file)
+            else:
+                files_to_process.append(file)
+        return files_to_process, metadata_only
+
+    def _remove_files(self, file_ids: List[str]) -> None:
+        """Delete all chunks of the given files and forget their indexed versions."""
+        for file_id in file_ids:
+            try:
+                self.collection.delete(where={"file_id": file_id})
+                lexical_index.remove_file(file_id)
+                if self.int8_index:
+                    self.int8_index.remove_file(file_id)
+                index_state.remove_file(file_id)
+                answer_cache.invalidate_files([file_id])
+            except Exception as e:
+                print(f"Error removing file {file_id} from vector DB: {e}")
+
+    def _update_file_metadata(self, files: List[dict]) -> None:
+        """
+        Apply renames and moves without re-embedding.
+
+        File-level metadata lives in the index state file table, so a rename
+        is a single row update. A move also rewrites the folder_id and folder
+        depth filter keys on the file's chunks, leaving their vectors untouched.
+        """
+        paths = drive_service.folder_tree.resolve_paths(files)
+        for file in files:
+            try:
+                previous_folder_id = index_state.update_file_metadata(file, paths[file['id']])
+                folder_id = (file.get('parents') or [None])[0]
+                if folder_id:
+                    recorded = index_state.get_file_ancestors(file['id'])
+                    ancestors = drive_service.folder_tree.ancestors(folder_id)
+                    if folder_id != previous_folder_id or ancestors != recorded:
+                        self._move_file_chunks(file['id'], folder_id, ancestors, recorded)
+                answer_cache.invalidate_files([file['id']])
+            except Exception as e:
+                print(f"Error updating metadata of file {file['id']}: {e}")
+
+    def _refresh_ancestry(self, folder_ids: Optional[List[str]]) -> None:
+        """
+        Re-key indexed files whose folder ancestry no longer matches the folder tree.
+
+        Checks the files beneath folder_ids (every file if None) and files
+        without recorded ancestry. Moving a folder changes the ancestry of its
+        whole subtree without any change to the files themselves.
+        """
+        moved = 0
+        for file_id, (folder_id, recorded) in index_state.get_file_ancestry(folder_ids).items():
+            if not folder_id:
+                continue
+            try:
+                ancestors = drive_service.folder_tree.ancestors(folder_id)
+                if ancestors != recorded:
+                    self._move_file_chunks(file_id, folder_id, ancestors, recorded)
+                    answer_cache.invalidate_files([file_id])
+                    moved += 1
+            except Exception as e:
+                print(f"Error updating folder ancestry of file {file_id}: {e}")
+        if moved:
+            print(f"Updated the folder ancestry of {moved} files")
+
+    def _move_file_chunks(self, file_id: str, folder_id: str, ancestors: List[str], previous_ancestors: List[str]) -> None:
+        """Point a file's chunks at a new folder and ancestry in every index."""
+        chunk_ids = self.collection.get(where={"file_id": file_id}, include=[])['ids']
+        if chunk_ids:
+            metadata = dict(ancestry_metadata(ancestors, len(previous_ancestors)), folder_id=folder_id)
+            self.collection.update(ids=chunk_ids, metadatas=[metadata] * len(chunk_ids))
+        lexical_index.update_folder(file_id, folder_id, ancestors)
+        if self.int8_index:
+            self.int8_index.update_folder(file_id, folder_id)
+        index_state.set_file_ancestors(file_id, ancestors)
+
+    def _resolve_ancestries(self, files: List[dict]) -> Dict[str, dict]:
+        """The ancestry of each file and the chunk metadata keys that store it, by file ID."""
+        ancestries = {}
+        for file_id, ancestors in drive_service.folder_tree.resolve_ancestors(files).items():
+            # Re-ingested chunks are upserted, so keys of a deeper old location must be blanked
+            previous_depth = len(index_state.get_file_ancestors(file_id))
+            ancestries[file_id] = {
+                "ancestors": ancestors,
+                "ancestry_metadata": ancestry_metadata(ancestors, previous_depth),
+            }
+        return ancestries
+
+    # ------------------------------------------------------------------
+    # Pipeline stages. A job dict for one file is downloaded to a spool file,
+    # then the extract stage streams its chunks downstream in windows of
+    # WINDOW_CHUNKS, so memory depends on the window and queue sizes, not on
+    # the size of the file. The file is finished once its last window is stored.
+    # ------------------------------------------------------------------
+
+    async def _download_stage(self, job: dict) -> Optional[dict]:
+        file = job["file"]
+        self.current_file = file['name']
+        print(f"Processing: {file['name']}")
+        job.update(windows=0, stored=0, chunk_count=0, extracted=False, failed=False, skip_reason=None, finished=False)
+        job["content"] = await asyncio.to_thread(self._download_file_content, file)
+        if job["content"] is None:
+            self._finish_file(file, indexed=True)
+            return None
+        return job
+
+    async def _extract_stage(self, job: dict) -> AsyncIterator[dict]:
+        file = job["file"]
+        content = job.pop("content")
+        chunk_count = 0
+        try:
+            window = []
+            async for chunk in self._iter_chunks(self._iter_text(file, content), file, job["ancestry_metadata"]):
+                window.append(chunk)
+                chunk_count += 1
+                if len(window) == WINDOW_CHUNKS:
+                    job["windows"] += 1
+                    yield {"job": job, "chunks": window}
+                    window = []
+                    self._memory.sample()
+            if window:
+                job["windows"] += 1
+                yield {"job": job, "chunks": window}
+        except PdfSkipped as e:
+            job["skip_reason"] = str(e)
+        finally:
+            content.close()
+            job["extracted"] = True
+
+        job["chunk_count"] = chunk_count
+        if chunk_count:
+            print(f"  Created {chunk_count} chunks for '{file['name']}'")
+        elif not job["skip_reason"]:
+            print(f"  Skipping '{file['name']}' due to empty content.")
+        self._complete_job(job)
+
+    async def _embed_stage(self, window: dict) -> dict:
+        window["embeddings"] = await self._generate_embeddings(window["chunks"])
+        return window
+
+    async def _store_stage(self, window: dict) -> None:
+        await asyncio.to_thread(self._store_in_vector_db, window["chunks"], window.pop("embeddings"))
+        job = window["job"]
+        job["stored"] += 1
+        self._complete_job(job)
+
+    def _on_pipeline_error(self, item: dict, stage: str, error: Exception) -> None:
+        # Leave the file unrecorded and queue it so the next run retries it
+        job = item.get("job", item)
+        print(f"  Error processing file {job['file']['name']} during {stage}: {error}")
+        job["failed"] = True
+        job["error"] = f"{stage}: {error}"
+        if "chunks" in item:
+            job["stored"] += 1
+        else:
+            job["extracted"] = True
+        self._complete_job(job)
+
+    def _complete_job(self, job: dict) -> None:
+        """Finish a file once it is fully extracted and every window has been handled."""
+        if job["finished"] or not job["extracted"] or job["stored"] < job["windows"]:
+            return
+        job["finished"] = True
+        file = job["file"]
+        if job["failed"]:
+            INGESTED_FILES.inc(outcome="failed")
+            index_state.queue_retry(file, job["error"])
+            self._finish_file(file, indexed=False)
+        elif job["skip_reason"]:
+            INGESTED_FILES.inc(outcome="skipped")
+            self._skip_file(file, job["skip_reason"])
+        else:
+            INGESTED_FILES.inc(outcome="indexed")
+            self._drop_stale_chunks(file['id'], job["chunk_count"])
+            if job["windows"]:
+                print(f"  Stored '{file['name']}' in vector database")
+                answer_cache.invalidate_files([file['id']])
+            self._finish_file(
+                file, indexed=True, path=job["path"], chunk_count=job["chunk_count"], ancestors=job["ancestors"]
+            )
+
+    def _drop_stale_chunks(self, file_id: str, chunk_count: int) -> None:
+        """
+        Delete a file's chunks numbered chunk_count and up.
+
+        Upserts overwrite chunks by number, so when a new version of a file
+        is shorter, the old version's tail would stay searchable. Index GC
+        catches anything left if this fails.
+        """
+        try:
+            stale = self.collection.get(
+                where={"$and": [{"file_id": file_id}, {"chunk_number": {"$gte": chunk_count}}]},
+                include=[]
+            )["ids"]
+            if stale:
+                self.collection.delete(ids=stale)
+                if self.int8_index:
+                    self.int8_index.remove_chunks(stale)
+            removed = lexical_index.remove_chunks_from(file_id, chunk_count)
+            if stale or removed:
+                print(f"  Removed {max(len(stale), removed)} chunks left from a longer previous version")
+        except Exception as e:
+            print(f"  Error removing stale chunks of {file_id}: {e}")
+
+    def _finish_file(
+        self,
+        file_metadata: dict,
+        indexed: bool,
+        path: Optional[str] = None,
+        chunk_count: Optional[int] = None,
+        ancestors: Optional[List[str]] = None
+    ) -> None:
+        if indexed:
+            index_state.record_file(file_metadata, path=path, chunk_count=chunk_count, ancestors=ancestors)
+            index_state.clear_skip(file_metadata['id'])
+            index_state.clear_retry(file_metadata['id'])
+        self.processed_files += 1
+
+    def _skip_file(self, file_metadata: dict, reason: str) -> None:
+        """Record a file that won't be indexed and drop any chunks of an older version."""
+        print(f"  Skipping '{file_metadata['name']}': {reason}")
+        self.collection.delete(where={"file_id": file_metadata['id']})
+        lexical_index.remove_file(file_metadata['id'])
+        if self.int8_index:
+            self.int8_index.remove_file(file_metadata['id'])
+        answer_cache.invalidate_files([file_metadata['id']])
+        index_state.record_skip(file_metadata, reason)
+        self.processed_files += 1
+
     def get_status(self) -> IngestionStatus:
         """Get the current ingestion status."""
         return IngestionStatus(
@@ -168,130 +557,201 @@ class IngestionService:
             total_files=self.total_files,
             processed_files=self.processed_files,
             current_file=self.current_file,
-            error=self.error
+            error=self.error,
+            peak_memory_mb=self.peak_memory_mb,
+            queued_retries=index_state.get_retry_count(),
+            skipped_files=[SkippedFile(**row) for row in index_state.get_skipped_files()]
         )
 
-    def _extract_text_from_file(self, file_metadata: dict) -> str:
+    def _download_file_content(self, file_metadata: dict) -> Optional[BinaryIO]:
         """
-        Extract text content from a file based on its MIME type.
-        
+        Download or export the raw content of a file based on its MIME type.
+
         Supports:
         - Google Docs (exported as plain text)
-        - PDFs (using PyPDF2)
+        - PDFs (downloaded as-is)
         - Google Sheets (exported as CSV)
+
+        Content is written to a temporary file rather than held in memory:
+        PDFs go to a named file on disk that the PDF workers can open, other
+        exports to a spool file that moves to disk once it outgrows
+        SPOOL_MAX_BYTES. Returns None for unsupported MIME types.
         """
         mime_type = file_metadata.get('mimeType')
         file_id = file_metadata['id']
-        
+
+        if mime_type == MimeType.PDF:
+            fh = tempfile.NamedTemporaryFile(suffix=".pdf")
+        elif mime_type in (MimeType.DOCUMENT, MimeType.SPREADSHEET):
+            fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        else:
+            print(f"Unsupported MIME type: {mime_type}")
+            return None
+
         try:
             if mime_type == MimeType.DOCUMENT:
                 # Google Doc - export as plain text
-                content_bytes = drive_service.export_google_doc(file_id, 'text/plain')
-                return content_bytes.decode('utf-8', errors='ignore')
-            
+                drive_service.export_google_doc_to(file_id, fh, 'text/plain')
             elif mime_type == MimeType.SPREADSHEET:
                 # Google Sheet - export as CSV
-                content_bytes = drive_service.export_google_doc(file_id, 'text/csv')
-                return content_bytes.decode('utf-8', errors='ignore')
-            
-            elif mime_type == MimeType.PDF:
-                # PDF - use PyPDF2
-                content_bytes = drive_service.download_file(file_id)
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(content_bytes))
-                
-                text_parts = []
-                for page in pdf_reader.pages:
-                    text_parts.append(page.extract_text())
-                
-                return '\n\n'.join(text_parts)
-            
+                drive_service.export_google_doc_to(file_id, fh, 'text/csv')
             else:
-                print(f"Unsupported MIME type: {mime_type}")
-                return ""
-                
-        except Exception as e:
-            print(f"Error extracting text: {str(e)}")
-            return ""
+                drive_service.download_file_to(file_id, fh)
+            fh.flush()
+        except Exception:
+            fh.close()
+            raise
+        return fh
 
-    def _chunk_text(self, text: str, file_metadata: dict, file_path: str) -> List[Dict[str, any]]:
+    async def _iter_text(self, file_metadata: dict, content: BinaryIO) -> AsyncIterator[str]:
         """
-        Chunk text into smaller pieces for embedding.
+        Yield the text of content returned by _download_file_content piece by piece.
+
+        PDFs are parsed page by page in the PDF worker pool, which raises
+        PdfSkipped for files it won't extract. Other files are decoded in
+        blocks of READ_BLOCK_BYTES.
         """
-        chunk_size = 800
-        chunk_overlap = 200
-        
-        final_chunks = []
-        if not text or len(text.strip()) < 10:
-            return final_chunks
-
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk_text = text[start:end]
-
-            chunk_data = {
-                "text": chunk_text.strip(),
-                "file_id": file_metadata['id'],
-                "file_name": file_metadata['name'],
-                "chunk_number": len(final_chunks),
-                "path": file_path,
-                "mime_type": file_metadata.get('mimeType'),
-                "modified_time": file_metadata.get('modifiedTime'),
-                "size": file_metadata.get('size'),
-                "web_view_link": file_metadata.get('webViewLink'),
-            }
-            if 'parents' in file_metadata and file_metadata['parents']:
-                chunk_data['folder_id'] = file_metadata['parents'][0]
+        if file_metadata.get('mimeType') == MimeType.PDF:
+            first = True
+            async for page in pdf_extractor.iter_pages(file_metadata['name'], content.name):
+                yield page if first else '\n\n' + page
+                first = False
+            return
+
+        content.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        while True:
+            block = content.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            yield decoder.decode(block)
+        yield decoder.decode(b'', final=True)
+
+    async def _iter_chunks(
+        self,
+        segments: AsyncIterator[str],
+        file_metadata: dict,
+        ancestry: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict[str, any]]:
+        """
+        Chunk streamed text into token-budgeted pieces for embedding.
 
-            final_chunks.append(chunk_data)
-            start += chunk_size - chunk_overlap
-            
-        return final_chunks
+        Sheets are chunked as groups of CSV rows under a repeated header row;
+        everything else along paragraph, heading and sentence boundaries.
+        """
+        if file_metadata.get('mimeType') == MimeType.SPREADSHEET:
+            chunker = CsvChunker()
+        else:
+            chunker = TextChunker()
+        
+        # File-level metadata is kept in the index state file table, not on chunks
+        base = {"file_id": file_metadata['id']}
+        if 'parents' in file_metadata and file_metadata['parents']:
+            base['folder_id'] = file_metadata['parents'][0]
+        # Folder depth keys, so folder filters cover whole subtrees
+        base.update(ancestry or {})
+
+        chunk_number = 0
+        seen_text = ""
+
+        def make_chunks(texts: List[str]) -> List[Dict[str, any]]:
+            nonlocal chunk_number
+            chunks = []
+            for text in texts:
+                chunks.append(dict(base, text=text, chunk_number=chunk_number, token_count=chunker.count(text)))
+                chunk_number += 1
+            return chunks
+
+        # Extraction and chunking are timed separately; time spent downstream
+        # while this generator is suspended counts towards neither
+        mime_type = file_metadata.get('mimeType', 'unknown')
+        extraction_seconds = chunking_seconds = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    segment = await segments.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    extraction_seconds += time.perf_counter() - started
+
+                if len(seen_text) < 10:
+                    seen_text = (seen_text + segment.strip())[:10]
+                started = time.perf_counter()
+                chunks = make_chunks(chunker.feed(segment))
+                chunking_seconds += time.perf_counter() - started
+                for chunk in chunks:
+                    yield chunk
+
+            # Too little text to be worth indexing
+            if len(seen_text) < 10:
+                return
+            started = time.perf_counter()
+            chunks = make_chunks(chunker.flush())
+            chunking_seconds += time.perf_counter() - started
+            for chunk in chunks:
+                yield chunk
+        finally:
+            EXTRACTION_SECONDS.observe(extraction_seconds, mime_type=mime_type)
+            CHUNKING_SECONDS.observe(chunking_seconds, mime_type=mime_type)
+            FILE_CHUNKS.observe(chunk_number, mime_type=mime_type)
 
-    def _generate_embeddings(self, chunks: List[Dict[str, any]]) -> List[List[float]]:
+    async def _generate_embeddings(self, chunks: List[Dict[str, any]]) -> List[List[float]]:
         """
-        Generate embeddings for text chunks using OpenAI.
+        Generate embeddings for text chunks with the configured embedding provider.
+
+        Chunks whose text was embedded before are served from the embedding
+        cache. The misses go through the shared embedding batcher, which packs
+        them into requests together with other files' chunks and raises
+        EmbeddingFailed if they can't be embedded.
         """
-        embeddings = []
-        batch_size = 100
-        
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            texts = [chunk['text'] for chunk in batch]
-            
-            try:
-                response = openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=texts
-                )
-                batch_embeddings = [item.embedding for item in response.data]
-                embeddings.extend(batch_embeddings)
-            except Exception as e:
-                print(f"Error generating embeddings: {e}")
-                embeddings.extend([[0.0] * 1536] * len(batch))
+        provider = embedding_provider
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings = await asyncio.to_thread(embedding_cache.get_many, texts, provider.model, provider.dimensions)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+
+        missing_texts = [texts[i] for i in missing]
+        new_embeddings = await embedding_batcher.embed(
+            missing_texts,
+            token_counts=[chunks[i].get('token_count') or count_tokens(texts[i]) for i in missing]
+        )
+        await asyncio.to_thread(
+            embedding_cache.put_many, missing_texts, new_embeddings, provider.model, provider.dimensions
+        )
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
         
         return embeddings
 
     def _store_in_vector_db(self, chunks: List[Dict[str, any]], embeddings: List[List[float]]) -> None:
         """
-        Store chunks and embeddings in ChromaDB.
+        Store chunks and embeddings in ChromaDB and the lexical index.
         """
         try:
             ids = [f"{chunk['file_id']}_chunk_{chunk['chunk_number']}" for chunk in chunks]
             documents = [chunk['text'] for chunk in chunks]
             
-            # Prepare metadata, ensuring all values are of a supported type
+            # Chunks only carry the keys that search filters on
             metadatas = []
             for chunk in chunks:
-                meta = {k: v for k, v in chunk.items() if k != 'text' and v is not None}
+                meta = {k: chunk[k] for k in CHUNK_METADATA_KEYS if chunk.get(k) is not None}
+                meta.update((k, v) for k, v in chunk.items() if is_folder_depth_key(k))
                 metadatas.append(meta)
 
-            self.collection.upsert(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
-            )
+            with VECTOR_DB_SECONDS.time(operation="upsert"):
+                self.collection.upsert(
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas
+                )
+            with VECTOR_DB_SECONDS.time(operation="lexical_upsert"):
+                lexical_index.add_chunks(ids, documents, metadatas)
+            if self.int8_index:
+                self.int8_index.add(ids, embeddings, metadatas)
         except Exception as e:
             print(f"Error storing in vector DB: {e}")
             raise
@@ -0,0 +1,341 @@
+"""
+Lexical Index - Persistent BM25 inverted index over ingested chunks
+
+Maintained alongside the vector database at ingestion time. It catches exact
+terms that dense embeddings miss (invoice numbers, names, SKUs) and can answer
+queries without any network call when the embedding API is slow or down.
+
+Folder filters cover whole subtrees: file_ancestors records every folder
+above each file, taken from the chunks' folder depth keys.
+
+Queries never scan the whole index: the chunk count, total length and each
+term's document frequency are running counters kept up to date on every
+write, stopwords and terms found in most chunks are dropped from queries,
+and BM25 is summed and ranked in SQL over the remaining terms' postings.
+Searches read through a per-thread connection, so they don't wait for writes.
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+from .folder_tree import ancestors_from_metadata, is_folder_depth_key
+
+# Words, numbers and identifiers such as "inv-2024-0042" or "v1.2"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+# Query terms that carry no ranking signal; dropped before scoring
+STOPWORDS = frozenset(
+    "a about above after again all am an and any are as at be because been before being below between "
+    "both but by can could did do does doing down during each few for from further had has have having "
+    "he her here hers him his how i if in into is it its itself just me more most my no nor not now of "
+    "off on once only or other our ours out over own same she should so some such than that the their "
+    "theirs them then there these they this those through to too under until up very was we were what "
+    "when where which while who whom why will with would you your yours".split()
+)
+# Query terms found in more than this share of all chunks are dropped too:
+# their postings are the longest to read and their idf is close to zero
+LEXICAL_MAX_DF_RATIO = float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.5"))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms.
+
+    Compound identifiers are kept whole and also split into their parts, so
+    "INV-2024-0042" matches both the full number and "0042".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part)
+    return terms
+
+
+class LexicalIndex:
+    """SQLite-backed BM25 index keyed by chunk ID."""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path or os.getenv("LEXICAL_INDEX_PATH", "./lexical_index.db")
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = LEXICAL_MAX_DF_RATIO
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    folder_id TEXT,
+                    length INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (file_id);
+                CREATE INDEX IF NOT EXISTS idx_chunks_folder ON chunks (folder_id);
+
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, chunk_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id);
+
+                CREATE TABLE IF NOT EXISTS file_ancestors (
+                    folder_id TEXT NOT NULL,
+                    file_id TEXT NOT NULL,
+                    PRIMARY KEY (folder_id, file_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_file_ancestors_file ON file_ancestors (file_id);
+
+                CREATE TABLE IF NOT EXISTS term_stats (
+                    term TEXT PRIMARY KEY,
+                    df INTEGER NOT NULL
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS index_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_chunks INTEGER NOT NULL,
+                    total_length INTEGER NOT NULL
+                );
+                """
+            )
+            if self._conn.execute("SELECT 1 FROM index_stats").fetchone() is None:
+                # Indexes written before the counters existed: count once
+                self._conn.execute(
+                    "INSERT INTO index_stats SELECT 1, COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+                )
+                self._conn.execute("DELETE FROM term_stats")
+                self._conn.execute("INSERT INTO term_stats SELECT term, COUNT(*) FROM postings GROUP BY term")
+
+    def add_chunks(self, ids: List[str], documents: List[str], metadatas: List[dict]) -> None:
+        """Insert or replace chunks, mirroring a vector database upsert."""
+        with self._lock, self._conn:
+            self._delete_chunks(ids)
+            ancestry: Dict[str, List[str]] = {}
+            document_frequency: Counter = Counter()
+            total_length = 0
+            for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                ancestry.setdefault(metadata['file_id'], ancestors_from_metadata(metadata))
+                # Depth keys live in file_ancestors, not in every chunk's metadata
+                metadata = {key: value for key, value in metadata.items() if not is_folder_depth_key(key)}
+                terms = Counter(tokenize(text))
+                document_frequency.update(terms.keys())
+                total_length += sum(terms.values())
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, file_id, folder_id, length, text, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        chunk_id,
+                        metadata['file_id'],
+                        metadata.get('folder_id'),
+                        sum(terms.values()),
+                        text,
+                        json.dumps(metadata),
+                    )
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in terms.items()]
+                )
+            self._conn.executemany(
+                "INSERT INTO term_stats (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                document_frequency.items()
+            )
+            self._conn.execute(
+                "UPDATE index_stats SET total_chunks = total_chunks + ?, total_length = total_length + ?",
+                (len(ids), total_length)
+            )
+            for file_id, ancestors in ancestry.items():
+                self._set_ancestors(file_id, ancestors)
+
+    def remove_file(self, file_id: str) -> None:
+        """Remove every chunk of a file."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT chunk_id FROM chunks WHERE file_id = ?", (file_id,)).fetchall()
+            self._delete_chunks([row[0] for row in rows])
+            self._conn.execute("DELETE FROM file_ancestors WHERE file_id = ?", (file_id,))
+
+    def remove_chunks_from(self, file_id: str, chunk_number: int) -> int:
+        """Remove a file's chunks numbered chunk_number and up; returns how many."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE file_id = ? AND json_extract(metadata, '$.chunk_number') >= ?",
+                (file_id, chunk_number)
+            ).fetchall()
+            self._delete_chunks([row[0] for row in rows])
+        return len(rows)
+
+    def remove_chunks(self, ids: List[str]) -> None:
+        """Remove chunks by ID."""
+        with self._lock, self._conn:
+            self._delete_chunks(ids)
+
+    def get_chunk_refs(self) -> List[tuple]:
+        """Return (chunk_id, file_id, chunk_number) for every chunk."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT chunk_id, file_id, json_extract(metadata, '$.chunk_number') FROM chunks"
+            ).fetchall()
+
+    def vacuum(self) -> None:
+        """Rebuild the database file to give space freed by deletions back to the OS."""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def update_folder(self, file_id: str, folder_id: str, ancestors: Optional[List[str]] = None) -> None:
+        """Move every chunk of a file to another folder, and its ancestry with it."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE chunks SET folder_id = ?, metadata = json_set(metadata, '$.folder_id', ?) WHERE file_id = ?",
+                (folder_id, folder_id, file_id)
+            )
+            if ancestors is not None:
+                self._set_ancestors(file_id, ancestors)
+
+    def search(self, query: str, limit: int = 10, where: Optional[Dict[str, str]] = None) -> List[dict]:
+        """
+        Rank chunks against query with BM25.
+
+        where filters on file_id and/or folder_id, like the vector database
+        filter; folder_id matches the folder and all its subfolders. Returns
+        dicts with id, score, text and metadata, best first.
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term not in STOPWORDS]
+        if not terms:
+            return []
+
+        filters = ""
+        filter_params: List[str] = []
+        if where and where.get("file_id"):
+            filters += " AND c.file_id = ?"
+            filter_params.append(where["file_id"])
+        if where and where.get("folder_id"):
+            filters += " AND (c.folder_id = ? OR c.file_id IN (SELECT file_id FROM file_ancestors WHERE folder_id = ?))"
+            filter_params += [where["folder_id"], where["folder_id"]]
+
+        conn = self._reader()
+        # One read transaction, so counters and postings come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT total_chunks, total_length FROM index_stats").fetchone()
+            total_chunks, total_length = row or (0, 0)
+            if not total_chunks:
+                return []
+            average_length = total_length / total_chunks or 1.0
+
+            placeholders = ",".join("?" * len(terms))
+            document_frequency = dict(conn.execute(
+                f"SELECT term, df FROM term_stats WHERE term IN ({placeholders})", terms
+            ).fetchall())
+            if not document_frequency:
+                return []
+            weights = self._term_weights(document_frequency, total_chunks)
+
+            # BM25 summed per chunk and ranked by SQLite; only the top rows come back
+            values = ",".join("(?, ?)" for _ in weights)
+            rows = conn.execute(
+                f"""
+                WITH weights (term, idf) AS (VALUES {values})
+                SELECT p.chunk_id,
+                       SUM(w.idf * p.tf * ? / (p.tf + ? * (1 - ? + ? * c.length / ?))) AS score
+                FROM postings p
+                JOIN weights w ON w.term = p.term
+                JOIN chunks c ON c.chunk_id = p.chunk_id
+                WHERE p.term IN ({",".join("?" * len(weights))}){filters}
+                GROUP BY p.chunk_id
+                ORDER BY score DESC
+                LIMIT ?
+                """,
+                [value for item in weights.items() for value in item]
+                + [self.k1 + 1, self.k1, self.b, self.b, average_length]
+                + list(weights) + filter_params + [limit]
+            ).fetchall()
+            if not rows:
+                return []
+
+            top_ids = [chunk_id for chunk_id, _ in rows]
+            id_placeholders = ",".join("?" * len(top_ids))
+            documents = {
+                row[0]: (row[1], json.loads(row[2]))
+                for row in conn.execute(
+                    f"SELECT chunk_id, text, metadata FROM chunks WHERE chunk_id IN ({id_placeholders})",
+                    top_ids
+                )
+            }
+        finally:
+            conn.execute("COMMIT")
+
+        return [
+            {
+                "id": chunk_id,
+                "score": score,
+                "text": documents[chunk_id][0],
+                "metadata": documents[chunk_id][1],
+            }
+            for chunk_id, score in rows
+        ]
+
+    def _term_weights(self, document_frequency: Dict[str, int], total_chunks: int) -> Dict[str, float]:
+        """idf of each query term worth scoring; terms in too many chunks are left out."""
+        max_df = self.max_df_ratio * total_chunks
+        kept = {term: df for term, df in document_frequency.items() if df <= max_df}
+        if not kept:
+            # Every term is common: rank by the rarest one alone
+            term = min(document_frequency, key=document_frequency.get)
+            kept = {term: document_frequency[term]}
+        return {
+            term: math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+            for term, df in kept.items()
+        }
+
+    def _reader(self) -> sqlite3.Connection:
+        # WAL lets each search thread read its own snapshot while ingestion writes
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            self._readers.conn = conn
+        return conn
+
+    def _set_ancestors(self, file_id: str, ancestors: List[str]) -> None:
+        self._conn.execute("DELETE FROM file_ancestors WHERE file_id = ?", (file_id,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO file_ancestors (folder_id, file_id) VALUES (?, ?)",
+            [(folder_id, file_id) for folder_id in ancestors]
+        )
+
+    def _delete_chunks(self, ids: List[str]) -> None:
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            # Take the deleted chunks out of the running counters first
+            removed = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE chunk_id IN ({placeholders}) GROUP BY term", batch
+            ).fetchall()
+            if removed:
+                self._conn.executemany("UPDATE term_stats SET df = df - ? WHERE term = ?", [(n, term) for term, n in removed])
+                self._conn.executemany("DELETE FROM term_stats WHERE term = ? AND df <= 0", [(term,) for term, _ in removed])
+            chunks, length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ).fetchone()
+            if chunks:
+                self._conn.execute(
+                    "UPDATE index_stats SET total_chunks = total_chunks - ?, total_length = total_length - ?",
+                    (chunks, length)
+                )
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+
+# Global instance
+lexical_index = LexicalIndex()
@@ -0,0 +1,279 @@
+"""
+PDF Extractor - Parses PDFs in a pool of worker processes
+
+PyPDF2 text extraction is pure-Python and CPU-bound, so running it in threads
+serializes on the GIL, and a single pathological PDF can hang ingestion. Here
+workers read each PDF from a file on disk and extract its pages in parallel
+page ranges, streamed back in order.
+
+Every file gets a hard timeout, counted only while a worker is running its
+tasks, not while they wait for a free worker behind other files. When it
+expires and the worker is confirmed to still be running the task, the pool
+is torn down (the only way to stop a stuck worker) and a fresh one is
+started; other files' tasks lost with it are resubmitted. Files over the
+size cap, encrypted files and files that time out raise PdfSkipped, with the
+reason, so the caller can record them instead of retrying them on every run.
+
+This module only imports what the workers need, because spawned worker
+processes import it on start-up.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty
+from typing import AsyncIterator, List, Optional, Tuple
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import PyPDF2
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "120"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_MB", "200")) * 1024 * 1024
+# Pages handled by one worker task; larger PDFs are split across workers
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+
+class PdfSkipped(Exception):
+    """Raised when a PDF is deliberately not extracted; str(error) is the reason."""
+
+
+# ----------------------------------------------------------------------
+# Worker-side functions. They run in the pool processes and must stay at
+# module level so they can be pickled by name.
+# ----------------------------------------------------------------------
+
+def _report_pid(pids) -> None:
+    """Pool initializer: tell the parent this worker's PID, so a hung pool can be killed."""
+    pids.put(os.getpid())
+
+
+def _open_pdf(path: str) -> PyPDF2.PdfReader:
+    reader = PyPDF2.PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise PdfSkipped("encrypted PDF")
+    return reader
+
+
+def _count_pages(path: str) -> int:
+    return len(_open_pdf(path).pages)
+
+
+def _extract_pages(path: str, start: int, end: int) -> List[str]:
+    reader = _open_pdf(path)
+    texts = []
+    for number in range(start, end):
+        try:
+            texts.append(reader.pages[number].extract_text() or "")
+        except Exception as e:
+            # One malformed page should not cost the rest of the document
+            print(f"  Could not extract page {number + 1} of {path}: {e}")
+            texts.append("")
+    return texts
+
+
+class _Job:
+    """One task submitted to the pool, with the moment a worker took it."""
+
+    __slots__ = ("started", "started_at", "future", "task")
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.started_at: Optional[float] = None
+        # The pool's future, once submitted; tells whether a worker is running it
+        self.future: Optional[Future] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class PdfExtractor:
+    """Extracts PDF text in worker processes with per-file timeouts and caps."""
+
+    def __init__(
+        self,
+        workers: int = PDF_WORKERS,
+        timeout_seconds: float = PDF_TIMEOUT_SECONDS,
+        max_pages: int = PDF_MAX_PAGES,
+        max_bytes: int = PDF_MAX_BYTES,
+        pages_per_task: int = PDF_PAGES_PER_TASK
+    ):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.pages_per_task = pages_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Worker PIDs of the current pool, reported by each worker as it starts
+        self._worker_pids = None
+        self._lock = threading.Lock()
+        # One slot per worker, so a submitted task is picked up right away;
+        # bound to the event loop that first uses it
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def iter_pages(self, file_name: str, path: str) -> AsyncIterator[str]:
+        """
+        Yield the text of each page of the PDF at path, in order.
+
+        Up to one page range per worker is extracted ahead of the consumer, so
+        memory stays bounded however long the document is. Only the first
+        max_pages pages are extracted.
+
+        Raises PdfSkipped if the file is over the size cap, encrypted, or the
+        workers spend longer than the timeout on it in total. Time its tasks
+        spend waiting for a free worker is not counted.
+        """
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            raise PdfSkipped(
+                f"file is {size / 1024 / 1024:.1f} MB, over the "
+                f"{self.max_bytes / 1024 / 1024:.0f} MB limit"
+            )
+
+        remaining = self.timeout_seconds
+
+        async def timed(job: _Job):
+            nonlocal remaining
+            await job.started.wait()
+            started = max(time.monotonic(), job.started_at or 0)
+            try:
+                return await asyncio.wait_for(asyncio.shield(job.task), max(remaining, 0))
+            except asyncio.TimeoutError:
+                future = job.future
+                if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+                    # Finished right at the deadline
+                    return future.result()
+                job.task.cancel()
+                # Stuck workers cannot be cancelled, only killed with their pool;
+                # only do that if the worker really is still on this task
+                if future is not None and future.running():
+                    self._restart_pool()
+                raise PdfSkipped(f"extraction did not finish within {self.timeout_seconds:.0f}s")
+            finally:
+                remaining -= time.monotonic() - started
+
+        page_count = await timed(self._start(_count_pages, path))
+        if page_count > self.max_pages:
+            print(f"  '{file_name}' has {page_count} pages; extracting only the first {self.max_pages}")
+            page_count = self.max_pages
+
+        ranges = iter(self._page_ranges(page_count))
+        pending = deque()
+
+        def fill():
+            for start, end in itertools.islice(ranges, self.workers - len(pending)):
+                pending.append(self._start(_extract_pages, path, start, end))
+
+        try:
+            fill()
+            while pending:
+                pages = await timed(pending.popleft())
+                fill()
+                for text in pages:
+                    yield text
+        finally:
+            for job in pending:
+                job.task.cancel()
+
+    def _page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        return [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+    def _start(self, func, *args) -> _Job:
+        job = _Job()
+        job.task = asyncio.ensure_future(self._run(job, func, *args))
+        return job
+
+    async def _run(self, job: _Job, func, *args):
+        try:
+            async with self._get_slots():
+                job.started_at = time.monotonic()
+                job.started.set()
+                return await self._submit(job, func, *args)
+        finally:
+            job.started.set()
+
+    async def _submit(self, job: _Job, func, *args):
+        # A pool restarted because of another file's timeout breaks in-flight
+        # work; resubmit once to the fresh pool before giving up
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                job.future = executor.submit(func, *args)
+                return await asyncio.wrap_future(job.future)
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                self._discard_pool(executor)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+        return self._slots
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned (not forked) workers don't inherit the parent's threads and locks
+                context = multiprocessing.get_context("spawn")
+                self._worker_pids = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_report_pid,
+                    initargs=(self._worker_pids,)
+                )
+            return self._executor
+
+    def _discard_pool(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor, self._worker_pids = None, None
+
+    def _restart_pool(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            worker_pids, self._worker_pids = self._worker_pids, None
+        if executor is None:
+            return
+        # shutdown() alone would wait for the hung task; kill the workers first.
+        # Workers not started yet have no PID to report and nothing to kill
+        while True:
+            try:
+                pid = worker_pids.get_nowait()
+            except Empty:
+                break
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                # Already gone
+                pass
+        worker_pids.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            worker_pids, self._worker_pids = self._worker_pids, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            worker_pids.close()
+
+
+# Global instance
+pdf_extractor = PdfExtractor()
@@ -0,0 +1,260 @@
+"""
+Quantized Index - int8 copy of the chunk vectors for candidate generation
+
+Used when the collection was created with VECTOR_QUANTIZATION=int8. Each
+vector is stored as int8 codes with one float scale (symmetric, per vector),
+a quarter of the float32 size. Queries scan the int8 matrix for a candidate
+pool several times larger than the requested results; search_tool then
+re-scores the candidates with their float vectors from Chroma, which recovers
+nearly all of the recall lost to quantization.
+
+Persisted in SQLite like the lexical index and loaded into memory on first use.
+The shared index is opened by get_int8_index() on first call, so importing
+this module (e.g. for quantize) touches no files.
+"""
+
+from typing import Collection, Dict, List, Optional, Union
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+# Rows scored per block, bounding the float scratch space a query needs
+SCAN_BLOCK_ROWS = 8192
+
+
+def quantize(vectors: np.ndarray):
+    """Return (int8 codes, per-row scales) for a float matrix."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class Int8VectorIndex:
+    """SQLite-backed int8 vector index with an in-memory scan matrix."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("QUANTIZED_INDEX_PATH", "./quantized_index.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS vectors (
+                    chunk_id TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    folder_id TEXT,
+                    scale REAL NOT NULL,
+                    codes BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_vectors_file ON vectors (file_id);
+                """
+            )
+        self._loaded = False
+        # In-memory copy: rows are appended into buffers that grow by doubling;
+        # deleted rows are masked out and compacted away once they pile up.
+        # File and folder IDs are held as integer codes per row, so filters
+        # are vectorized comparisons rather than Python loops over the rows
+        self._codes: Optional[np.ndarray] = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._file_codes = np.zeros(0, dtype=np.int32)
+        self._folder_codes = np.zeros(0, dtype=np.int32)
+        self._chunk_ids: List[Optional[str]] = []
+        self._id_codes: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[dict]) -> None:
+        """Insert or replace vectors, mirroring a vector database upsert."""
+        if not ids:
+            return
+        codes, scales = quantize(np.asarray(embeddings, dtype=np.float32))
+        rows = [
+            (chunk_id, metadata['file_id'], metadata.get('folder_id'), float(scale), code.tobytes())
+            for chunk_id, metadata, scale, code in zip(ids, metadatas, scales, codes)
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?, ?)", rows)
+            if self._loaded:
+                self._append(rows)
+                self._maybe_compact()
+
+    def remove_chunks(self, ids: List[str]) -> None:
+        """Remove vectors by chunk ID."""
+        with self._lock:
+            with self._conn:
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    self._conn.execute(f"DELETE FROM vectors WHERE chunk_id IN ({placeholders})", batch)
+            if self._loaded:
+                self._drop(ids)
+                self._maybe_compact()
+
+    def remove_file(self, file_id: str) -> None:
+        """Remove every vector of a file."""
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute("SELECT chunk_id FROM vectors WHERE file_id = ?", (file_id,))]
+        self.remove_chunks(ids)
+
+    def update_folder(self, file_id: str, folder_id: str) -> None:
+        """Move every vector of a file to another folder."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE vectors SET folder_id = ? WHERE file_id = ?", (folder_id, file_id))
+            if self._loaded and file_id in self._id_codes:
+                rows = self._file_codes[:self._size] == self._id_codes[file_id]
+                self._folder_codes[:self._size][rows] = self._code(folder_id)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the in-memory codes and scales."""
+        with self._lock:
+            if not self._loaded or self._codes is None:
+                return 0
+            return int(self._codes[:self._size].nbytes + self._scales[:self._size].nbytes)
+
+    def search(self, query: List[float], n_results: int, where: Optional[Dict[str, Union[str, Collection[str]]]] = None) -> List[str]:
+        """
+        Return the chunk IDs with the highest approximate cosine similarity.
+
+        where filters on file_id and/or folder_id, like the vector database
+        filter. A value is either one ID or a collection of allowed IDs
+        (e.g. every file in a folder subtree).
+        """
+        # Asymmetric scoring: the query stays float, only the stored vectors are quantized
+        query_vector = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            self._ensure_loaded()
+            if not self._size:
+                return []
+            mask = self._alive[:self._size].copy()
+            for key, codes in (("file_id", self._file_codes), ("folder_id", self._folder_codes)):
+                wanted = where.get(key) if where else None
+                if wanted is None:
+                    continue
+                # IDs never seen have no code and match no row
+                wanted = [wanted] if isinstance(wanted, str) else wanted
+                allowed = np.fromiter(
+                    (self._id_codes[value] for value in wanted if value in self._id_codes), dtype=np.int32
+                )
+                mask &= np.isin(codes[:self._size], allowed)
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return []
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+                block = rows[start:start + SCAN_BLOCK_ROWS]
+                block_scores = self._codes[block].astype(np.float32) @ query_vector
+                scores[start:start + len(block)] = block_scores * self._scales[block]
+            top = min(n_results, len(rows))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [self._chunk_ids[rows[i]] for i in best]
+
+    def rebuild(self, collection, page_size: int = 5000) -> int:
+        """Re-create the index from the float vectors in a Chroma collection; returns the count."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM vectors")
+            self._loaded = False
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.add(page["ids"], page["embeddings"], page["metadatas"])
+            offset += len(page["ids"])
+        return offset
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._reset_memory()
+        rows = self._conn.execute("SELECT chunk_id, file_id, folder_id, scale, codes FROM vectors").fetchall()
+        self._append(rows)
+        self._loaded = True
+
+    def _reset_memory(self) -> None:
+        self._codes = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._file_codes = np.zeros(0, dtype=np.int32)
+        self._folder_codes = np.zeros(0, dtype=np.int32)
+        self._chunk_ids = []
+        self._id_codes = {}
+        self._rows = {}
+        self._size = 0
+
+    def _append(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        self._drop([row[0] for row in rows])
+        dimensions = len(rows[0][4])
+        needed = self._size + len(rows)
+        if self._codes is None or needed > len(self._codes):
+            capacity = max(needed, 2 * (len(self._codes) if self._codes is not None else 0), 1024)
+            codes = np.zeros((capacity, dimensions), dtype=np.int8)
+            scales = np.zeros(capacity, dtype=np.float32)
+            alive = np.zeros(capacity, dtype=bool)
+            file_codes = np.full(capacity, -1, dtype=np.int32)
+            folder_codes = np.full(capacity, -1, dtype=np.int32)
+            if self._codes is not None:
+                codes[:self._size] = self._codes[:self._size]
+                scales[:self._size] = self._scales[:self._size]
+                alive[:self._size] = self._alive[:self._size]
+                file_codes[:self._size] = self._file_codes[:self._size]
+                folder_codes[:self._size] = self._folder_codes[:self._size]
+            self._codes, self._scales, self._alive = codes, scales, alive
+            self._file_codes, self._folder_codes = file_codes, folder_codes
+
+        for chunk_id, file_id, folder_id, scale, code in rows:
+            row = self._size
+            self._codes[row] = np.frombuffer(code, dtype=np.int8)
+            self._scales[row] = scale
+            self._alive[row] = True
+            self._file_codes[row] = self._code(file_id)
+            self._folder_codes[row] = self._code(folder_id)
+            self._chunk_ids.append(chunk_id)
+            self._rows[chunk_id] = row
+            self._size += 1
+
+    def _drop(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._chunk_ids[row] = None
+                self._file_codes[row] = self._folder_codes[row] = -1
+
+    def _code(self, value: Optional[str]) -> int:
+        # File and folder IDs share one code space; -1 stands for no ID
+        if value is None:
+            return -1
+        return self._id_codes.setdefault(value, len(self._id_codes))
+
+    def _maybe_compact(self) -> None:
+        # Reload compactly once a quarter of the rows are dead
+        if self._size and len(self._rows) < 0.75 * self._size:
+            self._loaded = False
+            self._ensure_loaded()
+
+
+_int8_index: Optional[Int8VectorIndex] = None
+_int8_index_lock = threading.Lock()
+
+
+def get_int8_index() -> Int8VectorIndex:
+    """The shared int8 index, opened on first use."""
+    global _int8_index
+    with _int8_index_lock:
+        if _int8_index is None:
+            _int8_index = Int8VectorIndex()
+        return _int8_index
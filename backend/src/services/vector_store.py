@@ -0,0 +1,98 @@
+"""
+Vector Store - Shared ChromaDB client and the drive_documents collection
+
+Ingestion and search both use the collection returned by get_collection().
+The embedding provider's version is stored in the collection metadata when it
+is created, and checked on every start so that vectors from different models
+or dimensions are never mixed in one index.
+
+The storage profile is chosen when the collection is created: the vector size
+comes from EMBEDDING_DIMENSIONS (256/512/1536 for text-embedding-3 models) and
+VECTOR_QUANTIZATION=int8 additionally keeps an int8 copy of every vector for
+candidate search (see quantized_index). The profile is recorded in the
+collection metadata, which stays authoritative for the life of the collection.
+
+The HNSW graph parameters (HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF) are
+likewise applied when the collection is created; Chroma reads them from the
+collection metadata. benchmarks/hnsw_benchmark.py measures their effect on
+recall, latency and build time.
+"""
+
+import os
+import chromadb
+
+from .embedding_provider import EmbeddingProvider, embedding_provider
+from ..utils.metrics import registry
+
+COLLECTION_NAME = "drive_documents"
+
+QUANTIZATION_MODES = ("none", "int8")
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+
+# HNSW graph parameters; the defaults are Chroma's own
+HNSW_PARAMS = {
+    "hnsw:M": int(os.getenv("HNSW_M", "16")),
+    "hnsw:construction_ef": int(os.getenv("HNSW_CONSTRUCTION_EF", "100")),
+    "hnsw:search_ef": int(os.getenv("HNSW_SEARCH_EF", "10")),
+}
+
+# Timed by callers around upserts, queries and deletes, labelled by operation
+VECTOR_DB_SECONDS = registry.histogram("vector_db_seconds", "Vector database call latency", ["operation"])
+
+# Version assumed for collections created before versions were recorded
+LEGACY_EMBEDDING_VERSION = "openai/text-embedding-3-small@1536"
+
+# Initialize ChromaDB client (persistent)
+chroma_client = chromadb.PersistentClient(path=os.getenv("CHROMA_DB_PATH", "./chroma_db"))
+
+
+def get_collection(provider: EmbeddingProvider = embedding_provider):
+    """Get or create the documents collection, checking it matches the embedding provider."""
+    try:
+        collection = chroma_client.get_collection(name=COLLECTION_NAME)
+    except Exception:
+        if VECTOR_QUANTIZATION not in QUANTIZATION_MODES:
+            raise ValueError(f"VECTOR_QUANTIZATION must be one of {', '.join(QUANTIZATION_MODES)}")
+        return chroma_client.create_collection(
+            name=COLLECTION_NAME,
+            metadata={
+                "hnsw:space": "cosine",
+                **HNSW_PARAMS,
+                "embedding_version": provider.version,
+                "embedding_dimensions": provider.dimensions,
+                "vector_quantization": VECTOR_QUANTIZATION,
+            }
+        )
+
+    stored_version = (collection.metadata or {}).get("embedding_version", LEGACY_EMBEDDING_VERSION)
+    if stored_version != provider.version:
+        raise ValueError(
+            f"Collection '{COLLECTION_NAME}' holds {stored_version} embeddings but the configured "
+            f"provider is {provider.version}. Re-ingest into a fresh CHROMA_DB_PATH or change "
+            f"EMBEDDING_PROVIDER/EMBEDDING_MODEL/EMBEDDING_DIMENSIONS back."
+        )
+    quantization = get_quantization(collection)
+    if quantization != VECTOR_QUANTIZATION:
+        print(
+            f"Collection '{COLLECTION_NAME}' was created with VECTOR_QUANTIZATION={quantization}; "
+            f"ignoring VECTOR_QUANTIZATION={VECTOR_QUANTIZATION} until it is re-created"
+        )
+    stored_params = get_hnsw_params(collection)
+    if stored_params != HNSW_PARAMS:
+        print(
+            f"Collection '{COLLECTION_NAME}' was created with HNSW parameters {stored_params}; "
+            f"the configured {HNSW_PARAMS} only apply once it is re-created"
+        )
+    return collection
+
+
+def get_hnsw_params(collection) -> dict:
+    """Return the HNSW parameters a collection was built with, filling in Chroma's defaults."""
+    metadata = collection.metadata or {}
+    defaults = {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+    return {key: int(metadata.get(key, default)) for key, default in defaults.items()}
+
+
+def get_quantization(collection) -> str:
+    """Return the quantization mode a collection was created with."""
+    return (collection.metadata or {}).get("vector_quantization", "none")
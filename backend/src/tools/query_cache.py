@@ -0,0 +1,110 @@
+"""
+Query Embedding Cache - In-process LRU/TTL cache for search query embeddings
+
+Repeated questions (or the UI re-sending one) skip the embeddings round trip.
+Queries are normalized for case and whitespace before lookup, entries expire
+after a TTL, the cache is bounded in size, and concurrent misses for the same
+query share a single computation instead of each calling the API.
+"""
+
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+import asyncio
+import os
+import time
+
+
+class QueryEmbeddingCache:
+    """LRU cache with TTL expiry and single-flight misses, used from the event loop."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize case and whitespace so trivially different queries share an entry."""
+        return " ".join(query.lower().split())
+
+    async def get_or_compute(
+        self,
+        query: str,
+        compute: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        """
+        Return the cached embedding for query, computing it on a miss.
+
+        compute is awaited with the normalized query. If another request is
+        already computing the same query, this call awaits its result instead.
+        Cancelling a caller never cancels the computation itself.
+        """
+        key = self.normalize(query)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, embedding = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            del self._entries[key]
+            self.expirations += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The computation runs as its own task, so a caller that times out
+            # or is cancelled (the first one included) only stops waiting; the
+            # others still get the result
+            task = asyncio.ensure_future(self._compute(key, compute))
+            task.add_done_callback(_retrieve_exception)
+            self._inflight[key] = task
+
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[str], Awaitable[List[float]]]) -> List[float]:
+        try:
+            embedding = await compute(key)
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return embedding
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for sizing the cache."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # Mark a failure retrieved in case every caller stopped waiting
+    if not task.cancelled():
+        task.exception()
+
+
+# Global instance
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=int(os.getenv("QUERY_CACHE_MAX_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+)
@@ -4,109 +4,471 @@ Search Tool - Document search implementation
 This tool handles the core search functionality:
 - Query embedding generation
 - Vector database search
+- Lexical (BM25) search and hybrid rank fusion
+- Maximal-marginal-relevance diversification
 - Metadata filtering
 - Result formatting
 """
 
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import asyncio
+import functools
 import os
+import time
+import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
-import chromadb
+from ..services.embedding_cache import embedding_cache
+from ..services.embedding_provider import embedding_provider
+from ..services.folder_tree import folder_depth_key, is_folder_depth_key
+from ..services.index_state import index_state
+from ..services.lexical_index import lexical_index
+from ..services.quantized_index import get_int8_index
+from ..services.vector_store import VECTOR_DB_SECONDS, get_collection, get_quantization
 from ..types import SearchRequest, SearchResult, DriveFile
+from ..utils.metrics import executor_queue_depth, registry
+from ..utils.tracing import RequestTrace
+from .query_cache import query_embedding_cache
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# "vector", "lexical" or "hybrid"; see search_documents. Vector search is the
+# default so existing callers keep its ranking and cosine scores; lexical and
+# hybrid are opt-in here or per request
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# Candidates fetched from each ranking before fusing and truncating to the limit:
+# CANDIDATE_POOL_FACTOR per requested result, within [CANDIDATE_POOL_MIN, CANDIDATE_POOL_MAX]
+CANDIDATE_POOL_FACTOR = int(os.getenv("CANDIDATE_POOL_FACTOR", "4"))
+CANDIDATE_POOL_MIN = int(os.getenv("CANDIDATE_POOL_MIN", "20"))
+CANDIDATE_POOL_MAX = int(os.getenv("CANDIDATE_POOL_MAX", "200"))
 
-# Initialize ChromaDB client (persistent)
-chroma_client = chromadb.PersistentClient(path="./chroma_db")
+# Trade-off between relevance (1.0) and diversity (0.0) when picking results
+# from the candidate pool; 1.0 turns MMR off and keeps the plain score order
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
 
-# Get or create collection
-try:
-    collection = chroma_client.get_collection(name="drive_documents")
-except:
-    collection = chroma_client.create_collection(
-        name="drive_documents",
-        metadata={"hnsw:space": "cosine"}
-    )
+# Result metadata keys joined in from the index state file table, by column
+FILE_METADATA_COLUMNS = {
+    "file_name": "name",
+    "path": "path",
+    "mime_type": "mime_type",
+    "modified_time": "modified_time",
+    "size": "size",
+    "web_view_link": "web_view_link",
+}
+
+# Concurrency limits and timeouts for the search path
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "16"))
+VECTOR_QUERY_WORKERS = int(os.getenv("VECTOR_QUERY_WORKERS", "4"))
+VECTOR_QUERY_TIMEOUT_SECONDS = float(os.getenv("VECTOR_QUERY_TIMEOUT_SECONDS", "10"))
+# Kept short so hybrid search falls back to lexical results quickly when embeddings are slow
+QUERY_EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("QUERY_EMBEDDING_TIMEOUT_SECONDS", "5"))
+
+# With int8 storage, candidates from the quantized index per requested result;
+# they are re-scored with their float vectors before truncating
+INT8_OVERSAMPLE = int(os.getenv("INT8_OVERSAMPLE", "4"))
+
+collection = get_collection()
+
+# Chroma and SQLite calls block, so they run here instead of on the event loop.
+# A dedicated pool keeps them from queueing behind unrelated to_thread work.
+vector_db_executor = ThreadPoolExecutor(
+    max_workers=VECTOR_QUERY_WORKERS,
+    thread_name_prefix="vector-query"
+)
+
+_embedding_semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
 
+SEARCH_SECONDS = registry.histogram("search_seconds", "End-to-end search latency", ["mode"])
+QUERY_EMBEDDING_SECONDS = registry.histogram(
+    "query_embedding_seconds", "Query embedding latency after the in-process cache", ["source"]
+)
+HIGHLIGHT_SECONDS = registry.histogram(
+    "highlight_seconds", "Time spent extracting highlights for the returned results", ["mode"]
+)
+registry.gauge(
+    "threadpool_queue_depth", "Tasks waiting for a thread in a pool", ["pool"],
+    callback=lambda: {("vector-query",): executor_queue_depth(vector_db_executor)}
+)
 
-def generate_query_embedding(query: str) -> List[float]:
-    """Generate embedding for a search query using OpenAI."""
-    response = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=query
+
+async def run_in_vector_db_executor(func, *args, **kwargs):
+    """Run a blocking vector database call on the dedicated executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(vector_db_executor, functools.partial(func, *args, **kwargs))
+
+
+async def generate_query_embedding(query: str) -> List[float]:
+    """
+    Generate embedding for a search query with the configured embedding provider.
+
+    Served from the in-process query cache when possible, then from the
+    persistent embedding cache, and only then from the API.
+    """
+    return await query_embedding_cache.get_or_compute(query, _embed_query)
+
+
+async def _embed_query(query: str) -> List[float]:
+    provider = embedding_provider
+    with QUERY_EMBEDDING_SECONDS.time(source="embedding_cache"):
+        cached = (await run_in_vector_db_executor(
+            embedding_cache.get_many, [query], provider.model, provider.dimensions
+        ))[0]
+    if cached is not None:
+        return cached
+
+    async with _embedding_semaphore:
+        with QUERY_EMBEDDING_SECONDS.time(source="api"):
+            embedding = (await provider.aembed([query]))[0]
+    await run_in_vector_db_executor(
+        embedding_cache.put_many, [query], [embedding], provider.model, provider.dimensions
     )
-    return response.data[0].embedding
+    return embedding
 
 
 async def search_documents(
     query: str,
     folder_id: Optional[str] = None,
     file_id: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    mode: Optional[str] = None,
+    trace: Optional[RequestTrace] = None
 ) -> List[SearchResult]:
     """
-    Search for documents using semantic search.
+    Search for documents using semantic, lexical or hybrid search.
 
     Args:
         query: Search query text
-        folder_id: Optional folder to restrict search
+        folder_id: Optional folder to restrict search to, including its subfolders
         file_id: Optional specific file to search within
         limit: Maximum number of results to return
+        mode: "vector" (embeddings only), "lexical" (BM25 only, no network
+            calls) or "hybrid" (both, fused with reciprocal-rank fusion).
+            Defaults to SEARCH_MODE.
+        trace: Request trace to record stage timings into. The caller owns a
+            trace it passes in and finishes it; without one, the search
+            keeps its own so slow searches still reach the slow-query log.
 
     Returns:
         List of SearchResult with relevance scores and snippets
     """
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Expected one of: {', '.join(SEARCH_MODES)}")
+
+    owns_trace = trace is None
+    if owns_trace:
+        trace = RequestTrace("search", query, {"folder_id": folder_id, "file_id": file_id, "mode": mode, "limit": limit})
+
+    pool_size = candidate_pool_size(limit)
+    started = time.perf_counter()
     try:
-        # Step 1: Generate embedding for the query
-        query_embedding = generate_query_embedding(query)
-        
-        # Step 2: Build metadata filter if needed. Prioritize file_id if both are present.
+        # Step 1: Build metadata filter if needed. Prioritize file_id if both are present.
         where_filter = {}
         if file_id:
             where_filter["file_id"] = file_id
         elif folder_id:
             where_filter["folder_id"] = folder_id
-        
-        # Step 3: Query the vector database
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=50,  # Increase n_results to get a larger pool for filtering
-            where=where_filter if where_filter else None
-        )
-        
-        # Step 4: Format results
-        search_results = []
-        
-        if results and results['ids'] and len(results['ids'][0]) > 0:
-            ids = results['ids'][0]
-            documents = results['documents'][0]
-            metadatas = results['metadatas'][0]
-            distances = results['distances'][0]
-
-            for i in range(len(ids)):
-                # Highlights are now optional but good to have
-                highlights = extract_highlights(documents[i], query)
-                
-                search_results.append(SearchResult(
-                    id=ids[i],
-                    score=1 - distances[i],  # Convert distance to similarity score
-                    text=documents[i],
-                    metadata=metadatas[i],
-                    highlights=highlights
-                ))
-        
-        print(f"Found {len(search_results)} relevant sources")
-        # Sort results by score in descending order and take the top 'limit'
-        return sorted(search_results, key=lambda r: r.score, reverse=True)[:limit]
+
+        if mode == "lexical":
+            # Lexical-only fast path: answered locally without any network call
+            candidates = await _lexical_search(query, where_filter, pool_size, trace)
+        else:
+            # Step 2: Start the lexical search alongside the vector search
+            lexical_task = None
+            if mode == "hybrid":
+                lexical_task = asyncio.create_task(_lexical_search(query, where_filter, pool_size, trace))
+
+            # Step 3: Query the vector database
+            try:
+                vector_candidates = await _vector_search(query, where_filter, pool_size, trace)
+            except Exception as e:
+                if lexical_task is None:
+                    raise
+                # The lexical ranking can still answer when embeddings are slow or down
+                print(f"Vector search unavailable, using lexical results only: {e}")
+                vector_candidates = []
+
+            # Step 4: Fuse rankings
+            if lexical_task is not None:
+                lexical_candidates = await lexical_task
+                with trace.span("fusion"):
+                    candidates = _reciprocal_rank_fusion([vector_candidates, lexical_candidates])
+            else:
+                candidates = vector_candidates
+
+        print(f"Found {len(candidates)} relevant sources")
+        # Step 5: Pick the results, then build highlights and metadata for those only
+        selected = await _select_candidates(candidates, limit, trace)
+        return await _attach_file_metadata(_build_results(selected, query, mode, trace), trace)
     
     except Exception as e:
         print(f"Error querying ChromaDB: {e}")
         return []
+    finally:
+        SEARCH_SECONDS.observe(time.perf_counter() - started, mode=mode)
+        if owns_trace:
+            trace.finish()
+
+
+def candidate_pool_size(limit: int) -> int:
+    """Candidates to fetch from each ranking for a request of limit results."""
+    return max(CANDIDATE_POOL_MIN, min(CANDIDATE_POOL_MAX, limit * CANDIDATE_POOL_FACTOR))
+
+
+async def _vector_search(query: str, where_filter: dict, n_results: int, trace: RequestTrace) -> List[dict]:
+    """Embed the query and rank chunks by cosine similarity."""
+    with trace.span("query_embedding"):
+        query_embedding = await asyncio.wait_for(
+            generate_query_embedding(query),
+            timeout=QUERY_EMBEDDING_TIMEOUT_SECONDS
+        )
+
+    query_vector = _query_int8 if get_quantization(collection) == "int8" else _query_collection
+    with trace.span("vector_query"):
+        ids, documents, metadatas, scores, embeddings = await asyncio.wait_for(
+            run_in_vector_db_executor(query_vector, query_embedding, n_results, where_filter or None),
+            timeout=VECTOR_QUERY_TIMEOUT_SECONDS
+        )
+    trace.count("vector_candidates", len(ids))
+
+    return [
+        {
+            "id": ids[i],
+            "score": scores[i],
+            "text": documents[i],
+            "metadata": metadatas[i],
+            "embedding": embeddings[i] if embeddings is not None else None,
+        }
+        for i in range(len(ids))
+    ]
+
+
+def _query_collection(query_embedding: List[float], n_results: int, where: Optional[dict]):
+    """
+    Nearest chunks from the Chroma HNSW index, as (ids, documents, metadatas,
+    scores, embeddings). Embeddings are only fetched when MMR needs them.
+    """
+    include = ["documents", "metadatas", "distances"] + (["embeddings"] if MMR_LAMBDA < 1 else [])
+    with VECTOR_DB_SECONDS.time(operation="query"):
+        results = collection.query(
+            query_embeddings=[query_embedding], n_results=n_results, where=_subtree_filter(where), include=include
+        )
+    if not results or not results['ids'] or not results['ids'][0]:
+        return [], [], [], [], None
+    # Convert distance to similarity score
+    scores = [1 - distance for distance in results['distances'][0]]
+    embeddings = results['embeddings'][0] if results.get('embeddings') is not None else None
+    return results['ids'][0], results['documents'][0], results['metadatas'][0], scores, embeddings
+
+
+def _query_int8(query_embedding: List[float], n_results: int, where: Optional[dict]):
+    """
+    Nearest chunks using the int8 index for candidates and float vectors for the final order.
+
+    Falls back to the Chroma index while the int8 index is empty (e.g. before
+    the first ingestion run has rebuilt it).
+    """
+    with VECTOR_DB_SECONDS.time(operation="int8_query"):
+        candidate_ids = get_int8_index().search(query_embedding, n_results * INT8_OVERSAMPLE, _subtree_file_filter(where))
+    if not candidate_ids:
+        return _query_collection(query_embedding, n_results, where)
+
+    with VECTOR_DB_SECONDS.time(operation="get"):
+        candidates = collection.get(ids=candidate_ids, include=["embeddings", "documents", "metadatas"])
+    if not candidates['ids']:
+        return [], [], [], [], None
+    vectors = np.asarray(candidates['embeddings'], dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+    scores = vectors @ query / np.where(norms == 0, 1.0, norms)
+    order = np.argsort(-scores)[:n_results]
+    return (
+        [candidates['ids'][i] for i in order],
+        [candidates['documents'][i] for i in order],
+        [candidates['metadatas'][i] for i in order],
+        [float(scores[i]) for i in order],
+        vectors[order],
+    )
+
+
+def _subtree_filter(where: Optional[dict]) -> Optional[dict]:
+    """
+    The vector database filter for a search filter, with a folder widened to its subtree.
+
+    Chunks carry their ancestor at each depth (folder_l0, folder_l1, ...), so
+    the subtree of a folder at depth d is the single equality folder_l{d} = id,
+    which the vector store applies before the nearest-neighbour search. The
+    folder_id clause keeps files indexed before depth keys existed matching.
+    """
+    folder_id = where.get("folder_id") if where else None
+    if not folder_id:
+        return where
+    depth = index_state.get_folder_depth(folder_id)
+    if depth is None:
+        return where
+    return {"$or": [{"folder_id": folder_id}, {folder_depth_key(depth): folder_id}]}
+
+
+def _subtree_file_filter(where: Optional[dict]) -> Optional[dict]:
+    """The int8 index filter for a search filter: a folder becomes the files in its subtree."""
+    folder_id = where.get("folder_id") if where else None
+    if not folder_id:
+        return where
+    return {"file_id": index_state.get_subtree_file_ids(folder_id)}
+
+
+async def _lexical_search(query: str, where_filter: dict, n_results: int, trace: RequestTrace) -> List[dict]:
+    """Rank chunks with the BM25 index; scores are scaled so the best hit is 1.0."""
+    with trace.span("lexical_query"):
+        hits = await run_in_vector_db_executor(_timed_lexical_search, query, n_results, where_filter)
+    trace.count("lexical_candidates", len(hits))
+    if not hits:
+        return []
+
+    top_score = hits[0]["score"]
+    return [dict(hit, score=hit["score"] / top_score) for hit in hits]
+
+
+def _timed_lexical_search(query: str, n_results: int, where_filter: dict) -> List[dict]:
+    with VECTOR_DB_SECONDS.time(operation="lexical_query"):
+        return lexical_index.search(query, n_results, where_filter)
+
+
+async def _attach_file_metadata(results: List[SearchResult], trace: RequestTrace) -> List[SearchResult]:
+    """Join file-level metadata (name, path, link, ...) from the file table into each result."""
+    trace.count("results", len(results))
+    if not results:
+        return results
+
+    with trace.span("result_formatting"):
+        files = await run_in_vector_db_executor(
+            index_state.get_files, [result.metadata.get("file_id") for result in results]
+        )
+        for result in results:
+            record = files.get(result.metadata.get("file_id"))
+            if record:
+                result.metadata.update({
+                    key: record[column]
+                    for key, column in FILE_METADATA_COLUMNS.items()
+                    if record[column] is not None
+                })
+    return results
+
+
+async def _select_candidates(candidates: List[dict], limit: int, trace: RequestTrace) -> List[dict]:
+    """
+    The limit candidates to return, best first.
+
+    The top of the candidate pool is re-ranked with maximal marginal
+    relevance, using the chunk embeddings from the vector query (or fetched
+    for lexical-only hits), so overlapping neighbours of one chunk don't fill
+    every slot.
+    """
+    ranked = sorted(candidates, key=lambda c: c["score"], reverse=True)[:candidate_pool_size(limit)]
+    if MMR_LAMBDA >= 1 or len(ranked) <= limit:
+        return ranked[:limit]
+
+    missing = [c["id"] for c in ranked if c.get("embedding") is None]
+    if missing:
+        with trace.span("embedding_fetch"):
+            fetched = await run_in_vector_db_executor(_get_embeddings, missing)
+        ranked = [c if c.get("embedding") is not None else dict(c, embedding=fetched.get(c["id"])) for c in ranked]
+
+    known = [c["embedding"] for c in ranked if c["embedding"] is not None]
+    if not known:
+        return ranked[:limit]
+    # Chunks without a vector (e.g. not yet in the vector store) count as dissimilar to everything
+    dimensions = len(known[0])
+    vectors = np.stack([
+        np.asarray(c["embedding"], dtype=np.float32) if c["embedding"] is not None else np.zeros(dimensions, dtype=np.float32)
+        for c in ranked
+    ])
+    relevance = np.array([c["score"] for c in ranked], dtype=np.float32)
+
+    trace.count("mmr_pool", len(ranked))
+    with trace.span("mmr"):
+        order = maximal_marginal_relevance(relevance, vectors, limit, MMR_LAMBDA)
+    return [ranked[i] for i in order]
+
+
+def maximal_marginal_relevance(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float) -> List[int]:
+    """
+    Indexes of k items chosen greedily by maximal marginal relevance.
+
+    Each step picks the item maximising
+    lambda_mult * relevance - (1 - lambda_mult) * (max cosine similarity to
+    the items already picked). The pairwise similarities are one matrix
+    product and the running maximum is updated in place, so each step is a
+    single vectorized pass over the pool.
+    """
+    count = len(relevance)
+    if count == 0 or k <= 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1.0, norms)
+    similarity = unit @ unit.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(count, dtype=bool)
+    available[first] = False
+    max_similarity = similarity[first].copy()
+    weighted_relevance = lambda_mult * relevance
+    while len(selected) < min(k, count):
+        scores = weighted_relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def _get_embeddings(ids: List[str]) -> Dict[str, np.ndarray]:
+    with VECTOR_DB_SECONDS.time(operation="get"):
+        found = collection.get(ids=ids, include=["embeddings"])
+    return {chunk_id: np.asarray(vector, dtype=np.float32) for chunk_id, vector in zip(found['ids'], found['embeddings'])}
+
+
+def _build_results(candidates: List[dict], query: str, mode: str, trace: RequestTrace) -> List[SearchResult]:
+    """SearchResults with highlights, built only for the candidates being returned."""
+    with HIGHLIGHT_SECONDS.time(mode=mode), trace.span("highlights"):
+        return [
+            SearchResult(
+                id=candidate["id"],
+                score=candidate["score"],
+                text=candidate["text"],
+                # Depth keys are for filtering only
+                metadata={key: value for key, value in candidate["metadata"].items() if not is_folder_depth_key(key)},
+                highlights=extract_highlights(candidate["text"], query)
+            )
+            for candidate in candidates
+        ]
+
+
+def _reciprocal_rank_fusion(rankings: List[List[dict]], k: int = 60) -> List[dict]:
+    """
+    Merge several rankings with reciprocal-rank fusion.
+
+    Each candidate scores sum(1 / (k + rank)) over the rankings it appears in,
+    scaled so a candidate ranked first everywhere scores 1.0.
+    """
+    fused = {}
+    scores = {}
+    for ranking in rankings:
+        ordered = sorted(ranking, key=lambda c: c["score"], reverse=True)
+        for rank, candidate in enumerate(ordered, start=1):
+            # The first ranking's entry is kept, so a vector hit keeps its embedding
+            fused.setdefault(candidate["id"], candidate)
+            scores[candidate["id"]] = scores.get(candidate["id"], 0.0) + 1 / (k + rank)
+
+    best_possible = len(rankings) / (k + 1)
+    return [
+        dict(candidate, score=scores[candidate_id] / best_possible)
+        for candidate_id, candidate in fused.items()
+    ]
 
 
 def extract_highlights(text: str, query: str, max_highlights: int = 3) -> List[str]:
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -62,6 +62,17 @@ class ChatMessage(BaseModel):
     timestamp: datetime
 
 
+class SkippedFile(BaseModel):
+    """A file that ingestion deliberately did not index"""
+    file_id: str
+    name: Optional[str] = None
+    reason: str
+    skipped_at: str
+
+    class Config:
+        populate_by_name = True
+
+
 class IngestionStatus(BaseModel):
     """Represents the status of Drive ingestion"""
     is_ingesting: bool
@@ -69,6 +80,9 @@ class IngestionStatus(BaseModel):
     processed_files: int
     current_file: Optional[str] = None
     error: Optional[str] = None
+    skipped_files: List[SkippedFile] = []
+    peak_memory_mb: Optional[float] = None  # RSS high-water mark of the current or last run
+    queued_retries: int = 0  # Files that failed and will be retried on the next run
 
     class Config:
         populate_by_name = True
@@ -80,17 +94,29 @@ class SearchRequest(BaseModel):
     folder_id: Optional[str] = Field(None, alias="folderId")
     file_id: Optional[str] = Field(None, alias="fileId")
     limit: Optional[int] = 10
+    mode: Optional[Literal["vector", "lexical", "hybrid"]] = None
+    # Return the stage timing breakdown with the results and in a Server-Timing header
+    debug: bool = False
 
     class Config:
         populate_by_name = True
 
 
+class SearchResponse(BaseModel):
+    """Response model for document search"""
+    results: List[SearchResult]
+    # Stage timings and candidate counts, when the request asked for them
+    debug: Optional[Dict[str, Any]] = None
+
+
 class ChatRequest(BaseModel):
     """Request model for chat"""
     message: str
     conversation_history: Optional[List[ChatMessage]] = Field(None, alias="conversationHistory")
     folder_id: Optional[str] = Field(None, alias="folderId")
     file_id: Optional[str] = Field(None, alias="fileId")
+    # Return the stage timing breakdown and token counts with the answer
+    debug: bool = False
 
     class Config:
         populate_by_name = True
@@ -100,3 +126,5 @@ class ChatResponse(BaseModel):
     """Response model for chat"""
     message: str
     sources: List[SearchResult]
+    # Stage timings and token counts, when the request asked for them
+    debug: Optional[Dict[str, Any]] = None
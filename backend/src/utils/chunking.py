@@ -0,0 +1,322 @@
+"""
+Chunking - Token-budgeted, structure-aware text chunkers
+
+Chunks are packed up to a token budget along natural boundaries instead of
+being cut every N characters:
+- TextChunker packs whole lines (paragraphs, in Google Docs exports, are
+  single lines), starts a new chunk at each heading, and only falls back to
+  sentence (then word) splits for lines that don't fit.
+  Consecutive chunks overlap by whole trailing sentences, up to overlap_tokens.
+- CsvChunker groups spreadsheet rows and repeats the header row at the top of
+  every chunk, so each chunk can be understood on its own.
+
+Both are incremental: feed() takes text as it arrives and returns the chunks
+completed so far, and flush() returns the rest, so a file never has to be held
+in memory as a whole. Text without line breaks is cut once it exceeds a few
+chunk budgets, so the buffer stays bounded whatever the input looks like.
+iter_chunks() wraps that as a generator.
+
+Tokens are counted with tiktoken when it is installed and fall back to an
+estimate of four characters per token otherwise.
+"""
+
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import csv
+import io
+import os
+import re
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+LINE_BREAK = re.compile(r"\r\n|\n|\r")
+# Buffered text without a line break is cut once it exceeds this many chunk
+# budgets, at roughly four characters per token
+PENDING_MAX_CHUNKS = 4
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+HEADING = re.compile(
+    r"^(#{1,6}\s+\S.*"                              # Markdown heading
+    r"|(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+[A-Z]\S.*"     # Numbered heading: "2.1 Scope", "IV. Terms"
+    r"|[A-Z][A-Z0-9 ,&/:'-]{2,}"                    # ALL CAPS line
+    r")$"
+)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the cl100k_base encoding, or estimate them if tiktoken is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Not installed, or the encoding file can't be downloaded
+            _encoding = None
+
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def is_heading(paragraph: str) -> bool:
+    """Whether a paragraph looks like a section heading."""
+    line = paragraph.strip()
+    return "\n" not in line and len(line) <= 100 and bool(HEADING.match(line))
+
+
+def split_to_budget(text: str, max_tokens: int, count: Callable[[str], int] = count_tokens) -> List[str]:
+    """Split text that is over budget into sentences, then words, each within max_tokens."""
+    pieces = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if count(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        # A running total of per-word counts; recounting the joined piece for
+        # every word would be quadratic in the length of the sentence
+        current: List[str] = []
+        current_tokens = 0
+        for word in sentence.split():
+            # Count the word with its leading space, as it appears in the piece
+            word_tokens = count(" " + word if current else word)
+            if current and current_tokens + word_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+                word_tokens = count(word)
+                current_tokens = 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(" ".join(current))
+    return [piece for piece in pieces if piece]
+
+
+class TextChunker:
+    """Packs lines into chunks of at most max_tokens, breaking at headings."""
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        count: Callable[[str], int] = count_tokens
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.count = count
+        self.max_pending_chars = PENDING_MAX_CHUNKS * max_tokens * 4
+        # Text after the last line break, waiting for the rest of its line
+        self._pending = ""
+        # Whether a blank line precedes the next line, and whether the next
+        # text continues a line that was cut because it grew too long
+        self._blank_line = False
+        self._continues_line = False
+        # Units of the chunk being built: (separator, text, tokens)
+        self._units: List[Tuple[str, str, int]] = []
+        self._tokens = 0
+        # Whether the current chunk holds anything besides overlap from the previous one
+        self._has_new = False
+        # Whether the current chunk holds only a heading so far
+        self._heading_only = False
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the chunks it completed."""
+        text = self._pending + text
+        # Hold back a trailing "\r": it may be the first half of a "\r\n"
+        held = "\r" if text.endswith("\r") else ""
+        lines = LINE_BREAK.split(text[:len(text) - len(held)])
+        # The last part may be a line that continues in the next feed
+        self._pending = lines.pop() + held
+        chunks: List[str] = []
+        for line in lines:
+            chunks.extend(self._add_line(line))
+        while len(self._pending) > self.max_pending_chars:
+            chunks.extend(self._cut_pending())
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return the remaining chunks once all text has been fed."""
+        chunks = self._add_line(self._pending)
+        self._pending = ""
+        self._blank_line = self._continues_line = False
+        if self._has_new:
+            chunks.append(self._render())
+        self._reset()
+        return chunks
+
+    def _add_line(self, line: str) -> List[str]:
+        if not line.strip():
+            # An empty tail of a cut line ends that line; it is not a blank line
+            self._blank_line = self._blank_line or not self._continues_line
+            self._continues_line = False
+            return []
+        separator = " " if self._continues_line else "\n\n" if self._blank_line else "\n"
+        self._blank_line = self._continues_line = False
+        return self._add_paragraph(line, separator)
+
+    def _cut_pending(self) -> List[str]:
+        # A very long line: emit its head at the last space within the limit
+        cut = self._pending.rfind(" ", 0, self.max_pending_chars)
+        if cut <= 0:
+            cut = self.max_pending_chars
+        head, self._pending = self._pending[:cut], self._pending[cut:]
+        chunks = self._add_line(head)
+        self._continues_line = True
+        return chunks
+
+    def _add_paragraph(self, paragraph: str, separator: str = "\n\n") -> List[str]:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            return []
+
+        chunks: List[str] = []
+        heading = is_heading(paragraph)
+        if heading:
+            # A heading starts a new section; don't carry overlap across it
+            if self._has_new and not self._heading_only:
+                chunks.append(self._render())
+                self._reset()
+            elif not self._has_new:
+                self._reset()
+
+        tokens = self.count(paragraph)
+        if tokens <= self.max_tokens:
+            units = [(separator, paragraph, tokens)]
+        else:
+            units = [
+                (separator if i == 0 else " ", piece, self.count(piece))
+                for i, piece in enumerate(split_to_budget(paragraph, self.max_tokens, self.count))
+            ]
+
+        for unit in units:
+            # A heading is kept with the text that follows it, even if that overflows a little
+            if self._has_new and not self._heading_only and self._tokens + unit[2] > self.max_tokens:
+                chunks.append(self._render())
+                self._start_with_overlap()
+            self._heading_only = heading and (self._heading_only or not self._has_new)
+            self._units.append(unit)
+            self._tokens += unit[2]
+            self._has_new = True
+        return chunks
+
+    def _render(self) -> str:
+        return "".join(sep + text for sep, text, _ in self._units).strip()
+
+    def _reset(self) -> None:
+        self._units = []
+        self._tokens = 0
+        self._has_new = False
+        self._heading_only = False
+
+    def _start_with_overlap(self) -> None:
+        # Carry whole trailing sentences of the emitted chunk, up to overlap_tokens
+        tail: List[Tuple[str, str, int]] = []
+        tokens = 0
+        sentences = [
+            sentence
+            for _, text, _ in self._units
+            for sentence in SENTENCE_END.split(text)
+        ]
+        for sentence in reversed(sentences):
+            sentence_tokens = self.count(sentence)
+            if tokens + sentence_tokens > self.overlap_tokens:
+                break
+            tail.insert(0, (" ", sentence, sentence_tokens))
+            tokens += sentence_tokens
+
+        self._units = tail
+        self._tokens = tokens
+        self._has_new = False
+        self._heading_only = False
+
+
+class CsvChunker:
+    """Groups CSV rows into chunks of at most max_tokens, each starting with the header row."""
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, count: Callable[[str], int] = count_tokens):
+        self.max_tokens = max_tokens
+        self.count = count
+        self._pending = ""
+        self._header: Optional[str] = None
+        self._header_tokens = 0
+        self._rows: List[str] = []
+        self._tokens = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Add CSV text and return the chunks it completed."""
+        self._pending += text
+        chunks: List[str] = []
+        for row in self._take_rows(final=False):
+            chunks.extend(self._add_row(row))
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return the remaining chunks once all text has been fed."""
+        chunks: List[str] = []
+        for row in self._take_rows(final=True):
+            chunks.extend(self._add_row(row))
+        if self._rows:
+            chunks.append(self._render())
+        self._rows = []
+        self._tokens = 0
+        return chunks
+
+    def _take_rows(self, final: bool) -> Iterator[str]:
+        # Quoted fields may contain newlines, so a row only ends at a newline
+        # outside quotes; every complete row has an even number of quote characters
+        lines = self._pending.split("\n")
+        self._pending = "" if final else lines.pop()
+        row = None
+        for line in lines:
+            row = line if row is None else row + "\n" + line
+            if row.count('"') % 2 == 0:
+                yield row.rstrip("\r")
+                row = None
+        if row is not None:
+            if final:
+                yield row.rstrip("\r")
+            else:
+                self._pending = row + "\n" + self._pending
+
+    def _add_row(self, row: str) -> List[str]:
+        if not row.strip() or not any(field.strip() for field in next(csv.reader(io.StringIO(row)), [])):
+            return []
+        if self._header is None:
+            self._header = row
+            self._header_tokens = self.count(row)
+            return []
+
+        chunks: List[str] = []
+        budget = max(self.max_tokens - self._header_tokens, 1)
+        tokens = self.count(row)
+        if self._rows and self._tokens + tokens > budget:
+            chunks.append(self._render())
+            self._rows = []
+            self._tokens = 0
+
+        if tokens > budget:
+            # A single huge row is split so it still fits the budget
+            for piece in split_to_budget(row, budget, self.count):
+                chunks.append(f"{self._header}\n{piece}")
+            return chunks
+
+        self._rows.append(row)
+        self._tokens += tokens
+        return chunks
+
+    def _render(self) -> str:
+        return "\n".join([self._header or ""] + self._rows).strip()
+
+
+def iter_chunks(segments: Iterable[str], chunker) -> Iterator[str]:
+    """Stream text segments through a chunker, yielding chunks as they complete."""
+    for segment in segments:
+        yield from chunker.feed(segment)
+    yield from chunker.flush()
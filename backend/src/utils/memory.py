@@ -0,0 +1,65 @@
+"""
+Memory tracking helpers
+
+Used by ingestion to report the resident-set high-water mark of a run.
+"""
+
+from typing import Optional
+import os
+import resource
+import sys
+import threading
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No /proc: fall back to the lifetime peak, reported in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryHighWaterMark:
+    """
+    Samples RSS on a background thread and keeps the peak.
+
+    Unlike ru_maxrss this can be reset, so each ingestion run reports its own
+    peak rather than the process lifetime's.
+    """
+
+    def __init__(self, interval_seconds: float = 0.25):
+        self.interval_seconds = interval_seconds
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.peak_bytes = current_rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-high-water-mark", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        """Stop sampling and return the peak in bytes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+        return self.peak_bytes
+
+    def sample(self) -> int:
+        rss = current_rss_bytes()
+        self.peak_bytes = max(self.peak_bytes, rss)
+        return rss
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / 1024 / 1024, 1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
@@ -0,0 +1,134 @@
+"""
+Tracing - Per-request stage timings and the slow-query log
+
+A RequestTrace is created for each search or chat request and passed down
+the call chain. Each stage (query embedding, vector query, highlights, LLM
+call, ...) is timed with trace.span(name), and sizes such as candidate and
+token counts are recorded with trace.count(name, n). Spans of the same name
+add up, and stages that run concurrently (the vector and lexical queries of a
+hybrid search) overlap, so stage times need not sum to the total.
+
+finish() closes the trace and appends it to the slow-query log when the
+request took longer than the threshold for its kind. The log is a rotating
+file of JSON lines holding the query, filters, stage timings and counts.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterator, Optional
+import json
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Requests slower than these are written to the slow-query log
+SLOW_SEARCH_THRESHOLD_MS = float(os.getenv("SLOW_SEARCH_THRESHOLD_MS", "1000"))
+SLOW_CHAT_THRESHOLD_MS = float(os.getenv("SLOW_CHAT_THRESHOLD_MS", "8000"))
+
+
+class RequestTrace:
+    """Stage timings and counts of one search or chat request."""
+
+    def __init__(self, kind: str, query: str, filters: Optional[Dict[str, Any]] = None):
+        self.kind = kind
+        self.query = query
+        self.filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        self.started_at = datetime.now(timezone.utc)
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.total_ms: Optional[float] = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Add the duration of the block to the named stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def count(self, name: str, value: int) -> None:
+        """Record a size, e.g. the number of candidates or tokens."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def finish(self) -> "RequestTrace":
+        """Stop the clock and log the request if it was slow. Safe to call more than once."""
+        if self.total_ms is None:
+            self.total_ms = (time.perf_counter() - self._started) * 1000
+            slow_query_log.record(self)
+        return self
+
+    def elapsed_ms(self) -> float:
+        return self.total_ms if self.total_ms is not None else (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "query": self.query,
+            "filters": self.filters,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round(self.elapsed_ms(), 2),
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            "counts": dict(self.counts),
+        }
+
+    def server_timing(self) -> str:
+        """The stage timings as a Server-Timing header value."""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+
+class SlowQueryLog:
+    """Appends slow requests as JSON lines to a size-rotated log file."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        backups: Optional[int] = None,
+        thresholds_ms: Optional[Dict[str, float]] = None
+    ):
+        self.path = path or os.getenv("SLOW_QUERY_LOG_PATH", "./slow_queries.log")
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("SLOW_QUERY_LOG_MAX_MB", "10")) * 1024 * 1024)
+        self.backups = backups if backups is not None else int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+        self.thresholds_ms = thresholds_ms or {"search": SLOW_SEARCH_THRESHOLD_MS, "chat": SLOW_CHAT_THRESHOLD_MS}
+        self.logged = 0
+        # The file is only opened once something is slow
+        self._logger: Optional[logging.Logger] = None
+
+    def record(self, trace: RequestTrace) -> bool:
+        """Log the trace if it exceeded its threshold; returns whether it was logged."""
+        threshold = self.thresholds_ms.get(trace.kind)
+        if threshold is None or trace.elapsed_ms() < threshold:
+            return False
+        try:
+            self._get_logger().info(json.dumps(dict(trace.to_dict(), threshold_ms=threshold), default=str))
+            self.logged += 1
+        except Exception as e:
+            print(f"Error writing slow-query log: {e}")
+            return False
+        print(f"Slow {trace.kind} ({trace.elapsed_ms():.0f} ms): {trace.query[:80]}")
+        return True
+
+    def _get_logger(self) -> logging.Logger:
+        if self._logger is None:
+            logger = logging.getLogger(f"slow_queries.{id(self)}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+
+# Global instance
+slow_query_log = SlowQueryLog()
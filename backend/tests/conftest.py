@@ -0,0 +1,36 @@
+"""
+Shared test setup.
+
+Every index, cache and log is pointed at a temporary directory before any src
+module is imported, since their singletons read these paths at import time.
+Embeddings come from the local provider, so no test needs network access.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+STATE_DIR = tempfile.mkdtemp(prefix="drive-search-tests-")
+os.environ.update({
+    "CHROMA_DB_PATH": os.path.join(STATE_DIR, "chroma_db"),
+    "INDEX_STATE_PATH": os.path.join(STATE_DIR, "index_state.db"),
+    "LEXICAL_INDEX_PATH": os.path.join(STATE_DIR, "lexical_index.db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(STATE_DIR, "embedding_cache.db"),
+    "QUANTIZED_INDEX_PATH": os.path.join(STATE_DIR, "quantized_index.db"),
+    "DRIVE_CATALOG_PATH": os.path.join(STATE_DIR, "drive_catalog.db"),
+    "SLOW_QUERY_LOG_PATH": os.path.join(STATE_DIR, "slow_queries.log"),
+    "EMBEDDING_PROVIDER": "local",
+    "OPENAI_API_KEY": "test",
+    "SEARCH_MODE": "hybrid",
+})
+# Run from the backend directory without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _shutdown_pdf_pool():
+    yield
+    from src.services.pdf_extractor import pdf_extractor
+    pdf_extractor.shutdown()
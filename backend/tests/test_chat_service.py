@@ -0,0 +1,120 @@
+"""ChatService against a fake LLM and a stubbed retrieval step."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes import FakeOpenAI
+from src.services import chat_service as chat_module
+from src.services.answer_cache import SemanticAnswerCache
+from src.types import ChatRequest, SearchResult
+
+SOURCES = [
+    SearchResult(id="file-1_0", score=0.9, text="The budget was approved in March.", metadata={"file_id": "file-1"}, highlights=[])
+]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    async def fake_search(**kwargs):
+        return [source.model_copy() for source in SOURCES]
+
+    monkeypatch.setattr(chat_module, "search_documents", fake_search)
+    monkeypatch.setattr(chat_module, "answer_cache", SemanticAnswerCache())
+    service = chat_module.ChatService()
+    service.llm = FakeOpenAI(chat_first_token_ms=20, chat_token_ms=1, chat_tokens=5)
+    return service
+
+
+def test_failing_query_embedding_skips_the_answer_cache(service, monkeypatch):
+    async def unavailable(query):
+        raise RuntimeError("embeddings API down")
+
+    monkeypatch.setattr(chat_module, "generate_query_embedding", unavailable)
+    response = asyncio.run(service.chat(ChatRequest(message="When was the budget approved?", debug=True)))
+    assert response.sources and "error" not in response.message
+    assert response.debug["counts"]["answer_cache_skipped"] == 1
+
+
+def test_slow_query_embedding_times_out_into_retrieval(service, monkeypatch):
+    async def slow(query):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(chat_module, "generate_query_embedding", slow)
+    monkeypatch.setattr(chat_module, "QUERY_EMBEDDING_TIMEOUT_SECONDS", 0.05)
+    events = asyncio.run(_collect(service.chat_stream(ChatRequest(message="When was the budget approved?"))))
+    assert [event["event"] for event in events][0] == "sources"
+    assert events[-1]["event"] == "done"
+
+
+def test_lexical_mode_makes_no_embedding_call(service, monkeypatch):
+    async def unexpected(query):
+        raise AssertionError("lexical chat must not embed the question")
+
+    monkeypatch.setattr(chat_module, "generate_query_embedding", unexpected)
+    monkeypatch.setattr(chat_module, "SEARCH_MODE", "lexical")
+    response = asyncio.run(service.chat(ChatRequest(message="When was the budget approved?", debug=True)))
+    assert response.sources
+    assert "answer_cache_skipped" not in response.debug["counts"]
+
+
+def test_expired_answers_are_dropped_on_lookup():
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    response = chat_module.ChatResponse(message="March", sources=SOURCES)
+    cache.store([1.0, 0.0], (None, None), response, 1.0)
+    cache.store([0.9, 0.1], (None, None), response, 1.0)
+    # Age the first entry past its TTL
+    cache._entries[(None, None)][0]["expires_at"] = 0
+
+    assert cache.lookup([1.0, 0.0], (None, None)) is not None
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["expirations"] == 1
+
+
+class _BrokenStream:
+    """A completion stream that fails after a few tokens, like a dropped connection."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        for token in ("The budget ", "was "):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+        raise ConnectionError("stream interrupted")
+
+    async def close(self):
+        self.closed = True
+
+
+def test_stream_sends_sources_before_tokens_and_times_the_first_token(service, monkeypatch):
+    monkeypatch.setattr(chat_module, "SEARCH_MODE", "lexical")
+    events = asyncio.run(_collect(service.chat_stream(ChatRequest(message="When was the budget approved?", debug=True))))
+    names = [event["event"] for event in events]
+
+    assert names[0] == "sources" and names[-1] == "done"
+    assert names[1:-1] == ["token"] * 5
+    assert events[0]["data"][0]["id"] == "file-1_0"
+    done = events[-1]["data"]
+    # The fake LLM waits 20 ms before its first token
+    assert 20 <= done["time_to_first_token_ms"] <= done["total_ms"]
+    assert done["debug"]["stages_ms"]["llm_first_token"] >= 20
+
+
+def test_stream_failing_midway_ends_with_an_error_event(service, monkeypatch):
+    monkeypatch.setattr(chat_module, "SEARCH_MODE", "lexical")
+    stream = _BrokenStream()
+
+    async def create(**kwargs):
+        return stream
+
+    monkeypatch.setattr(service.llm.chat.completions, "create", create)
+    events = asyncio.run(_collect(service.chat_stream(ChatRequest(message="When was the budget approved?"))))
+
+    assert [event["event"] for event in events] == ["sources", "token", "token", "error"]
+    assert "stream interrupted" in events[-1]["data"]["message"]
+    assert stream.closed
+
+
+async def _collect(events):
+    return [event async for event in events]
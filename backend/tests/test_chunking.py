@@ -0,0 +1,43 @@
+"""Streaming chunkers on Google Docs-style text."""
+
+from src.utils.chunking import TextChunker, count_tokens, split_to_budget
+
+
+def _docs_export(sections: int) -> str:
+    # Docs text/plain exports end every paragraph with a single "\r\n"
+    paragraph = "Quarterly revenue grew in every region. Costs held steady over the period. " * 3
+    lines = []
+    for i in range(sections):
+        lines.append(f"{i + 1}. Regional results")
+        lines.extend(f"{paragraph}({i}.{j})" for j in range(4))
+    return "\r\n".join(lines) + "\r\n"
+
+
+def test_single_line_breaks_complete_chunks_while_feeding():
+    text = _docs_export(40)
+    chunker = TextChunker(max_tokens=200, overlap_tokens=20)
+    fed = []
+    for start in range(0, len(text), 1000):
+        fed.extend(chunker.feed(text[start:start + 1000]))
+    flushed = chunker.flush()
+
+    assert len(fed) > 10 * len(flushed)
+    assert all(count_tokens(chunk) <= 200 for chunk in fed + flushed)
+    # Headings open a chunk rather than trailing the previous section
+    assert not any(chunk.endswith("Regional results") for chunk in fed)
+    assert sum(chunk.startswith(f"{i + 1}. Regional results") for i in range(40) for chunk in fed) >= 39
+    assert "\r" not in "".join(fed + flushed)
+
+
+def test_lines_split_across_feeds_are_rejoined():
+    chunker = TextChunker(max_tokens=200, overlap_tokens=0)
+    chunks = chunker.feed("first para\r") + chunker.feed("\nsecond ") + chunker.feed("para\r\n\r\nthird")
+    chunks += chunker.flush()
+    assert chunks == ["first para\nsecond para\n\nthird"]
+
+
+def test_split_to_budget_keeps_long_runs_within_budget():
+    words = " ".join(f"word{i}" for i in range(5000))
+    pieces = split_to_budget(words, 50, count_tokens)
+    assert all(count_tokens(piece) <= 50 for piece in pieces)
+    assert " ".join(pieces).split() == words.split()
@@ -0,0 +1,31 @@
+"""The Drive catalog keeps its SQLite work off the event loop."""
+
+import asyncio
+import threading
+import time
+
+from src.services.drive_catalog import DriveCatalog
+
+
+def test_ensure_fresh_reads_state_and_seeds_folders_in_a_thread(tmp_path, monkeypatch):
+    catalog = DriveCatalog(str(tmp_path / "catalog.db"))
+    catalog._set_state(catalog.PAGE_TOKEN_KEY, "token-1")
+    catalog._set_state(catalog.REFRESHED_AT_KEY, str(time.time()))
+    threads = []
+    list_folders = catalog.list_folders
+
+    def recording_list_folders():
+        threads.append(threading.current_thread())
+        return list_folders()
+
+    monkeypatch.setattr(catalog, "list_folders", recording_list_folders)
+
+    async def run():
+        await catalog.ensure_fresh()
+        await catalog.ensure_fresh()
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    # Seeded once, from a worker thread; a fresh catalog starts no refresh
+    assert len(threads) == 1 and threads[0] is not loop_thread
+    assert catalog._refresh_task is None
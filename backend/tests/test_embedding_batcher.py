@@ -0,0 +1,80 @@
+"""Request packing, retry counting and failure isolation of the embedding batcher."""
+
+import asyncio
+
+import pytest
+
+from src.services.embedding_batcher import EmbeddingBatcher, EmbeddingFailed
+from src.services.embedding_provider import LocalEmbeddingProvider
+
+
+class _Retryable(Exception):
+    pass
+
+
+class _FlakyProvider(LocalEmbeddingProvider):
+    """Rejects any batch containing a "poison" text; fails the first call retryably."""
+
+    def __init__(self, transient_failures: int = 0):
+        super().__init__(dimensions=16)
+        self.transient_failures = transient_failures
+        self.calls = []
+
+    async def aembed(self, texts):
+        self.calls.append(len(texts))
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise _Retryable("rate limited")
+        if any("poison" in text for text in texts):
+            raise ValueError("input too long")
+        return self.embed(texts)
+
+    def is_retryable(self, error):
+        return isinstance(error, _Retryable)
+
+
+def _batcher(provider):
+    return EmbeddingBatcher(provider, max_wait_seconds=0.05, base_delay_seconds=0, max_delay_seconds=0)
+
+
+def test_retries_are_counted_apart_from_requests():
+    provider = _FlakyProvider(transient_failures=2)
+    batcher = _batcher(provider)
+    vectors = asyncio.run(batcher.embed(["alpha", "beta"]))
+
+    assert len(vectors) == 2
+    assert provider.calls == [2, 2, 2]
+    assert batcher.stats()["requests"] == 1
+    assert batcher.stats()["retries"] == 2
+
+
+def test_rejected_batch_only_fails_the_file_with_the_bad_text():
+    provider = _FlakyProvider()
+    batcher = _batcher(provider)
+
+    async def run():
+        # Three files packed into one request; only the second one is bad
+        return await asyncio.gather(
+            batcher.embed([f"file a chunk {i}" for i in range(5)]),
+            batcher.embed(["file b chunk 0", "file b poison chunk"]),
+            batcher.embed([f"file c chunk {i}" for i in range(5)]),
+            return_exceptions=True
+        )
+
+    a, b, c = asyncio.run(run())
+    assert provider.calls[0] == 12
+    assert len(a) == 5 and len(c) == 5
+    assert isinstance(b, EmbeddingFailed)
+    stats = batcher.stats()
+    assert stats["failed_texts"] == 1
+    assert stats["splits"] > 0
+    assert stats["texts"] == 11
+
+
+def test_single_text_rejection_is_not_split():
+    provider = _FlakyProvider()
+    batcher = _batcher(provider)
+    with pytest.raises(EmbeddingFailed):
+        asyncio.run(batcher.embed(["poison"]))
+    assert provider.calls == [1]
+    assert batcher.stats()["splits"] == 0
@@ -0,0 +1,41 @@
+"""Embedding provider configuration and event-loop behaviour."""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.services.embedding_provider import LocalEmbeddingProvider, OpenAIEmbeddingProvider
+
+
+def test_dimensions_are_only_sent_to_text_embedding_3_models():
+    assert OpenAIEmbeddingProvider("text-embedding-3-small", 512)._request_options() == {"dimensions": 512}
+    assert OpenAIEmbeddingProvider("text-embedding-3-large")._request_options() == {}
+    assert OpenAIEmbeddingProvider("text-embedding-ada-002")._request_options() == {}
+    assert OpenAIEmbeddingProvider("text-embedding-ada-002", 1536)._request_options() == {}
+
+
+def test_custom_dimensions_on_older_models_are_a_config_error():
+    with pytest.raises(ValueError, match="text-embedding-3"):
+        OpenAIEmbeddingProvider("text-embedding-ada-002", 512)
+
+
+def test_local_batches_are_embedded_off_the_event_loop(monkeypatch):
+    provider = LocalEmbeddingProvider(dimensions=64)
+    threads = []
+    embed = provider.embed
+
+    def recording_embed(texts):
+        threads.append(threading.current_thread())
+        return embed(texts)
+
+    monkeypatch.setattr(provider, "embed", recording_embed)
+
+    async def run():
+        await provider.aembed(["one query"])
+        await provider.aembed([f"chunk {i}" for i in range(256)])
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert threads[0] is loop_thread
+    assert threads[1] is not loop_thread
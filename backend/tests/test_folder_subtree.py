@@ -0,0 +1,96 @@
+"""Folder filters cover whole subtrees, and follow files and folders that move."""
+
+import asyncio
+import random
+
+import pytest
+
+from benchmarks.fakes import FakeDriveService, make_doc
+from src.services import ingestion_service as ingestion_module
+from src.services.folder_tree import FOLDER_MIME_TYPE, ancestry_metadata, folder_depth_key
+from src.services.index_state import index_state
+from src.tools.search_tool import search_documents
+
+MODES = ("vector", "lexical", "hybrid")
+
+
+def _folder(folder_id, parent):
+    return {"id": folder_id, "name": folder_id.title(), "mimeType": FOLDER_MIME_TYPE, "parents": [parent]}
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    # top / mid / leaf, plus a separate "other" folder at the root
+    listing = [_folder("top", "root"), _folder("mid", "top"), _folder("leaf", "mid"), _folder("other", "root")]
+    rng = random.Random(5)
+    content = {}
+    for file_id, parent in (("doc-top", "top"), ("doc-mid", "mid"), ("doc-leaf", "leaf"), ("doc-other", "other")):
+        content[file_id] = make_doc(rng, 1).encode()
+        listing.append({
+            "id": file_id,
+            "name": file_id,
+            "mimeType": "application/vnd.google-apps.document",
+            "modifiedTime": "2024-01-01T00:00:00.000Z",
+            "md5Checksum": file_id,
+            "parents": [parent],
+        })
+    drive = FakeDriveService(listing, content, latency_ms=0)
+    monkeypatch.setattr(ingestion_module, "drive_service", drive)
+    _sync(drive, full_sync=True)
+    return drive
+
+
+def _sync(drive, full_sync=False, changes=None):
+    if changes is not None:
+        drive.list_changes = lambda token, page_size=1000: (changes, token)
+    service = ingestion_module.ingestion_service
+    asyncio.run(service.start_ingestion(full_sync=full_sync))
+    assert service.error is None
+
+
+def _found(folder_id, mode):
+    results = asyncio.run(search_documents("budget contract invoice report", folder_id=folder_id, limit=50, mode=mode))
+    return {result.metadata["file_id"] for result in results}
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_folder_filter_reaches_files_nested_two_levels_down(drive, mode):
+    assert _found("top", mode) == {"doc-top", "doc-mid", "doc-leaf"}
+    assert _found("mid", mode) == {"doc-mid", "doc-leaf"}
+    assert _found("leaf", mode) == {"doc-leaf"}
+
+
+def test_moved_file_is_found_only_under_its_new_ancestors(drive):
+    moved = dict(next(f for f in drive.listing if f["id"] == "doc-leaf"), parents=["other"])
+    _sync(drive, changes=[{"fileId": "doc-leaf", "file": moved}])
+
+    assert index_state.get_file_ancestors("doc-leaf") == ["root", "other"]
+    for mode in MODES:
+        assert "doc-leaf" not in _found("top", mode)
+        assert "doc-leaf" not in _found("mid", mode)
+        assert _found("other", mode) == {"doc-other", "doc-leaf"}
+
+
+def test_moving_a_folder_up_blanks_the_deeper_depth_keys(drive):
+    # leaf moves from top/mid to the root: its files lose two levels of ancestry
+    _sync(drive, changes=[{"fileId": "leaf", "file": _folder("leaf", "root")}])
+
+    chunks = ingestion_module.ingestion_service.collection.get(where={"file_id": "doc-leaf"}, include=["metadatas"])
+    for metadata in chunks["metadatas"]:
+        assert metadata[folder_depth_key(0)] == "root"
+        assert metadata[folder_depth_key(1)] == "leaf"
+        assert metadata[folder_depth_key(2)] == ""
+        assert metadata[folder_depth_key(3)] == ""
+    for mode in MODES:
+        assert _found("top", mode) == {"doc-top", "doc-mid"}
+        assert _found("leaf", mode) == {"doc-leaf"}
+
+
+def test_ancestry_metadata_blanks_keys_below_the_new_depth():
+    assert ancestry_metadata(["a", "b"], previous_depth=4) == {
+        folder_depth_key(0): "a",
+        folder_depth_key(1): "b",
+        folder_depth_key(2): "",
+        folder_depth_key(3): "",
+    }
+    assert ancestry_metadata(["a"]) == {folder_depth_key(0): "a"}
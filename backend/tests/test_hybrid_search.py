@@ -0,0 +1,96 @@
+"""Lexical and hybrid search over a small corpus, and reciprocal-rank fusion."""
+
+import asyncio
+import uuid
+
+import chromadb
+import pytest
+
+from src.services.embedding_provider import LocalEmbeddingProvider
+from src.services.lexical_index import LexicalIndex
+from src.tools import search_tool
+from src.tools.search_tool import _reciprocal_rank_fusion, search_documents
+
+CHUNKS = {
+    # file_id, folder_id, text
+    "exact": ("file-a", "finance", "Invoice INV-2024-0042 covers consulting services for the March audit."),
+    "near-1": ("file-b", "finance", "Invoice INV-2024-0041 covers consulting services for the February audit."),
+    "near-2": ("file-c", "finance", "Invoices for consulting services are issued after each monthly audit."),
+    "other-folder": ("file-d", "legal", "Consulting services contract and audit terms for invoices."),
+    "unrelated": ("file-e", "legal", "Team offsite agenda with travel and catering details."),
+}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    ids = list(CHUNKS)
+    documents = [CHUNKS[chunk_id][2] for chunk_id in ids]
+    metadatas = [
+        {"file_id": file_id, "folder_id": folder_id, "file_name": file_id, "chunk_number": 0}
+        for file_id, folder_id, _ in CHUNKS.values()
+    ]
+
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"test-{uuid.uuid4().hex}", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=ids, documents=documents, metadatas=metadatas, embeddings=LocalEmbeddingProvider().embed(documents)
+    )
+    lexical = LexicalIndex(str(tmp_path / "lexical.db"))
+    lexical.add_chunks(ids, documents, metadatas)
+
+    monkeypatch.setattr(search_tool, "collection", collection)
+    monkeypatch.setattr(search_tool, "lexical_index", lexical)
+    monkeypatch.setattr(search_tool, "embedding_provider", LocalEmbeddingProvider())
+    monkeypatch.setattr(search_tool, "MMR_LAMBDA", 1.0)
+    yield collection, lexical
+    client.delete_collection(collection.name)
+
+
+def _search(query, mode, **filters):
+    return [result.id for result in asyncio.run(search_documents(query, limit=5, mode=mode, **filters))]
+
+
+@pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+def test_exact_identifier_outranks_semantic_neighbours(corpus, mode):
+    ranked = _search("INV-2024-0042", mode)
+    assert ranked[0] == "exact"
+    if mode == "lexical":
+        assert "unrelated" not in ranked
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_folder_and_file_filters_restrict_results(corpus, mode):
+    query = "invoice invoices for consulting"
+    assert set(_search(query, mode, folder_id="legal")) <= {"other-folder", "unrelated"}
+    assert "other-folder" in _search(query, mode, folder_id="legal")
+    assert _search(query, mode, file_id="file-b") == ["near-1"]
+
+
+@pytest.mark.parametrize("mode", ["lexical", "hybrid"])
+def test_removed_file_disappears_from_results(corpus, mode):
+    collection, lexical = corpus
+    lexical.remove_file("file-a")
+    collection.delete(where={"file_id": "file-a"})
+
+    ranked = _search("INV-2024-0042", mode)
+    assert "exact" not in ranked
+    assert ranked[0] == "near-1"
+
+
+def test_lexical_search_ignores_stopword_only_queries(corpus):
+    _, lexical = corpus
+    assert lexical.search("the and of") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+    lexical = [{"id": "b", "score": 12.0}, {"id": "d", "score": 3.0}]
+
+    fused = {candidate["id"]: candidate["score"] for candidate in _reciprocal_rank_fusion([vector, lexical], k=60)}
+
+    best_possible = 2 / 61
+    assert fused["b"] == pytest.approx((1 / 62 + 1 / 61) / best_possible)
+    assert fused["a"] == pytest.approx((1 / 61) / best_possible)
+    assert fused["d"] == pytest.approx((1 / 62) / best_possible)
+    assert max(fused, key=fused.get) == "b"
+    assert _reciprocal_rank_fusion([vector, vector])[0]["score"] == pytest.approx(1.0)
@@ -0,0 +1,90 @@
+"""Index GC against a temporary Chroma collection, lexical index and file table."""
+
+import uuid
+
+import chromadb
+import pytest
+
+from src.services import index_gc as index_gc_module
+from src.services.index_gc import IndexGarbageCollector
+from src.services.index_state import IndexStateStore
+from src.services.lexical_index import LexicalIndex
+
+
+def _chunk(file_id, chunk_number):
+    return f"{file_id}_chunk_{chunk_number}", {"file_id": file_id, "folder_id": "folder", "chunk_number": chunk_number}
+
+
+@pytest.fixture
+def indexes(tmp_path, monkeypatch):
+    # live: 2 recorded chunks, plus a third left from a longer old version
+    # gone: no longer in the file table
+    state = IndexStateStore(str(tmp_path / "state.db"))
+    state.record_file({"id": "live", "name": "Live"}, chunk_count=2)
+
+    vector_chunks = [_chunk("live", 0), _chunk("live", 1), _chunk("live", 2), _chunk("gone", 0)]
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"test-{uuid.uuid4().hex}", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=[chunk_id for chunk_id, _ in vector_chunks],
+        metadatas=[metadata for _, metadata in vector_chunks],
+        embeddings=[[1.0, float(i), 0.5] for i in range(len(vector_chunks))],
+        documents=["text"] * len(vector_chunks),
+    )
+
+    # The lexical index also has a chunk the vector store never got
+    lexical_chunks = vector_chunks + [_chunk("lexical-only", 0)]
+    lexical = LexicalIndex(str(tmp_path / "lexical.db"))
+    lexical.add_chunks(
+        [chunk_id for chunk_id, _ in lexical_chunks],
+        ["quarterly report"] * len(lexical_chunks),
+        [metadata for _, metadata in lexical_chunks],
+    )
+
+    monkeypatch.setattr(index_gc_module, "index_state", state)
+    monkeypatch.setattr(index_gc_module, "lexical_index", lexical)
+    yield collection, lexical
+    client.delete_collection(collection.name)
+
+
+def _lexical_ids(lexical):
+    return sorted(chunk_id for chunk_id, _, _ in lexical.get_chunk_refs())
+
+
+def test_collect_classifies_and_deletes_orphans(indexes):
+    collection, lexical = indexes
+
+    report = IndexGarbageCollector(collection).collect()
+
+    assert report["total_vectors"] == 4
+    assert report["orphaned_vectors"] == 2
+    assert report["orphaned_by_reason"] == {"deleted_file": 1, "stale_chunk": 1}
+    assert report["dead_vector_ratio"] == 0.5
+    assert report["orphaned_lexical_chunks"] == 3
+    assert sorted(collection.get()["ids"]) == ["live_chunk_0", "live_chunk_1"]
+    assert _lexical_ids(lexical) == ["live_chunk_0", "live_chunk_1"]
+    assert sorted(hit["id"] for hit in lexical.search("quarterly")) == ["live_chunk_0", "live_chunk_1"]
+
+
+def test_dry_run_reports_without_deleting(indexes):
+    collection, lexical = indexes
+
+    report = IndexGarbageCollector(collection).collect(dry_run=True)
+
+    assert report["dry_run"] is True
+    assert report["orphaned_vectors"] == 2
+    assert report["orphaned_lexical_chunks"] == 3
+    assert report["query_latency_after_ms"] is None
+    assert len(collection.get()["ids"]) == 4
+    assert len(_lexical_ids(lexical)) == 5
+
+
+def test_collect_refuses_while_the_index_lock_is_held(indexes):
+    collection, _ = indexes
+    assert index_gc_module.index_lock.acquire("ingestion")
+    try:
+        with pytest.raises(ValueError, match="Ingestion in progress"):
+            IndexGarbageCollector(collection).collect()
+    finally:
+        index_gc_module.index_lock.release()
+    assert len(collection.get()["ids"]) == 4
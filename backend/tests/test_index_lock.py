@@ -0,0 +1,55 @@
+"""Ingestion and index GC exclude each other through the shared index lock."""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes import ingest
+from src.services.index_gc import index_gc
+from src.services.index_lock import index_lock
+from src.services.ingestion_service import ingestion_service
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(ingest.router, prefix="/api")
+    return TestClient(app)
+
+
+@pytest.fixture
+def reserved_ingestion():
+    ingestion_service.reserve()
+    yield
+    ingestion_service.is_ingesting = False
+    index_lock.release()
+
+
+def test_gc_is_rejected_while_ingestion_holds_the_index(client, reserved_ingestion):
+    response = client.post("/api/ingest/gc")
+    assert response.status_code == 409
+    assert "Ingestion in progress" in response.json()["detail"]
+    assert client.post("/api/ingest/start").status_code == 409
+
+
+def test_ingestion_is_rejected_while_gc_runs(client, monkeypatch):
+    attempts = []
+
+    def scan_while_ingestion_starts():
+        # An ingestion request arriving in the middle of the reconcile
+        attempts.append(client.post("/api/ingest/start").status_code)
+        with pytest.raises(ValueError, match="garbage collection"):
+            asyncio.run(ingestion_service.start_ingestion())
+        return iter(())
+
+    monkeypatch.setattr(index_gc, "_scan_collection", scan_while_ingestion_starts)
+    report = index_gc.collect(dry_run=True)
+
+    assert attempts == [409]
+    assert report["orphaned_vectors"] == 0
+    assert not ingestion_service.is_ingesting
+    # Released once GC is done
+    assert index_lock.acquire("test")
+    index_lock.release()
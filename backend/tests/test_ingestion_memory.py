@@ -0,0 +1,41 @@
+"""Memory bounds of the streaming text -> chunk path of ingestion."""
+
+import asyncio
+import tempfile
+
+from src.services import ingestion_service as ingestion_module
+from src.utils.chunking import TextChunker
+
+
+class _RecordingChunker(TextChunker):
+    peak_pending = 0
+
+    def feed(self, text):
+        chunks = super().feed(text)
+        _RecordingChunker.peak_pending = max(_RecordingChunker.peak_pending, len(self._pending))
+        return chunks
+
+
+async def _chunk_file(content, file_metadata):
+    service = ingestion_module.ingestion_service
+    count = 0
+    async for _ in service._iter_chunks(service._iter_text(file_metadata, content), file_metadata):
+        count += 1
+    return count
+
+
+def test_pending_text_stays_bounded_for_large_single_newline_docs(monkeypatch):
+    monkeypatch.setattr(ingestion_module, "TextChunker", _RecordingChunker)
+    # A ~2 MB Google Docs text/plain export: paragraphs end with a single "\r\n"
+    paragraph = "The committee reviewed the budget and approved the plan for next year. " * 4
+    text = "\r\n".join(f"{paragraph}({i})" for i in range(7000)) + "\r\n"
+    file_metadata = {"id": "doc-large", "name": "large", "mimeType": ingestion_module.MimeType.DOCUMENT}
+
+    with tempfile.TemporaryFile() as content:
+        content.write(text.encode("utf-8"))
+        chunks = asyncio.run(_chunk_file(content, file_metadata))
+
+    assert len(text) > 2_000_000
+    assert chunks > 1000
+    # Only the unfinished line is buffered, never the document
+    assert _RecordingChunker.peak_pending <= len(paragraph) + 16
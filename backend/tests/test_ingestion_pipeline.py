@@ -0,0 +1,30 @@
+"""Error handling of the staged ingestion pipeline."""
+
+import asyncio
+
+from src.services.ingestion_pipeline import PipelineStage, StagedPipeline
+
+
+def test_failing_error_callback_does_not_stall_the_pipeline():
+    stored = []
+
+    async def parse(item):
+        if item % 3 == 0:
+            raise ValueError(f"bad item {item}")
+        return item
+
+    async def store(item):
+        stored.append(item)
+
+    def on_error(item, stage, error):
+        # e.g. the index state database refusing the retry record
+        raise RuntimeError("database is locked")
+
+    pipeline = StagedPipeline(
+        [PipelineStage("parse", parse, concurrency=1), PipelineStage("store", store)],
+        queue_size=2,
+        on_error=on_error
+    )
+    asyncio.run(asyncio.wait_for(pipeline.run(range(12)), timeout=5))
+
+    assert sorted(stored) == [i for i in range(12) if i % 3]
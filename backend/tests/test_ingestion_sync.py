@@ -0,0 +1,119 @@
+"""Full, delta and failed syncs against the fake Drive from benchmarks.fakes."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes import CorpusSpec, FakeDriveService, build_corpus
+from src.services import ingestion_service as ingestion_module
+from src.services.drive_service import DriveService
+from src.services.index_state import index_state
+from src.services.lexical_index import lexical_index
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    listing, content = build_corpus(CorpusSpec(files=6, docs_share=1, sheets_share=0, pdfs_share=0, doc_kb=2, folders=2))
+    drive = FakeDriveService(listing, content, latency_ms=0)
+    monkeypatch.setattr(ingestion_module, "drive_service", drive)
+    return drive
+
+
+def _file_ids(drive):
+    return {f["id"] for f in drive.listing if f["id"].startswith("file-")}
+
+
+def _chunk_file_ids():
+    service = ingestion_module.ingestion_service
+    return {metadata["file_id"] for metadata in service.collection.get(include=["metadatas"])["metadatas"]}
+
+
+def _ingest(full_sync=False):
+    service = ingestion_module.ingestion_service
+    asyncio.run(service.start_ingestion(full_sync=full_sync))
+    return service
+
+
+def test_full_sync_indexes_every_file(drive):
+    service = _ingest(full_sync=True)
+    assert service.error is None
+    assert set(index_state.get_file_ids()) == _file_ids(drive)
+    assert _chunk_file_ids() == _file_ids(drive)
+
+
+def test_delta_sync_applies_removals_and_edits(drive, monkeypatch):
+    _ingest(full_sync=True)
+    edited = dict(next(f for f in drive.listing if f["id"] == "file-1"), md5Checksum="changed")
+    drive.content["file-1"] = b"Renewal contract for the warehouse supplier, signed this quarter."
+    changes = [{"fileId": "file-0", "removed": True}, {"fileId": "file-1", "file": edited}]
+    monkeypatch.setattr(drive, "list_changes", lambda token, page_size=1000: (changes, token))
+
+    service = _ingest()
+
+    assert service.error is None
+    assert "file-0" not in index_state.get_file_ids()
+    assert "file-0" not in _chunk_file_ids()
+    assert index_state.get_file("file-1")["md5_checksum"] == "changed"
+
+
+def test_failed_listing_removes_nothing(drive, monkeypatch):
+    _ingest(full_sync=True)
+    indexed = set(index_state.get_file_ids())
+
+    def failing_list_files(folder_id=None, page_size=100):
+        raise RuntimeError("403 rate limit exceeded")
+
+    monkeypatch.setattr(drive, "list_files", failing_list_files)
+    service = _ingest(full_sync=True)
+
+    assert "rate limit" in service.error
+    assert set(index_state.get_file_ids()) == indexed
+    assert _chunk_file_ids() == indexed
+
+
+class _FailingFilesApi:
+    """files().list() that serves one page and then fails."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        self.calls += 1
+        return self
+
+    def execute(self):
+        if self.calls == 1:
+            return {"files": [{"id": "a"}], "nextPageToken": "page-2"}
+        raise RuntimeError("503 backend error")
+
+
+def test_list_files_raises_instead_of_returning_a_partial_listing():
+    service = DriveService.__new__(DriveService)
+    service.credentials = object()
+    api = _FailingFilesApi()
+    service._clients = SimpleNamespace(get_service=lambda: api)
+
+    with pytest.raises(RuntimeError, match="503"):
+        service.list_files()
+    assert api.calls == 2
+
+
+def test_shorter_new_version_leaves_no_stale_chunks(drive, monkeypatch):
+    _ingest(full_sync=True)
+    service = ingestion_module.ingestion_service
+    before = service.collection.get(where={"file_id": "file-2"}, include=[])["ids"]
+    assert len(before) > 1
+
+    edited = dict(next(f for f in drive.listing if f["id"] == "file-2"), md5Checksum="shorter")
+    drive.content["file-2"] = b"The warehouse lease was renewed for another two years."
+    monkeypatch.setattr(drive, "list_changes", lambda token, page_size=1000: ([{"fileId": "file-2", "file": edited}], token))
+    _ingest()
+
+    assert service.collection.get(where={"file_id": "file-2"}, include=[])["ids"] == ["file-2_chunk_0"]
+    lexical_ids = [chunk_id for chunk_id, file_id, _ in lexical_index.get_chunk_refs() if file_id == "file-2"]
+    assert lexical_ids == ["file-2_chunk_0"]
+    assert index_state.get_chunk_counts()["file-2"] == 1
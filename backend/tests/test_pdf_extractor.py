@@ -0,0 +1,86 @@
+"""Timeouts of the PDF worker pool, with slow stand-ins for the worker functions."""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.services import pdf_extractor as pdf_module
+from src.services.pdf_extractor import PdfExtractor, PdfSkipped
+
+
+# Worker stand-ins: the file holds how long the "extraction" takes. They live
+# at module level so the spawned workers can import them by name
+def slow_count_pages(path):
+    with open(f"{path}.pid", "w") as f:
+        f.write(str(os.getpid()))
+    with open(path) as f:
+        time.sleep(float(f.read()))
+    return 1
+
+
+def slow_extract_pages(path, start, end):
+    return [f"text of {path}"]
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    monkeypatch.setattr(pdf_module, "_count_pages", slow_count_pages)
+    monkeypatch.setattr(pdf_module, "_extract_pages", slow_extract_pages)
+    extractor = PdfExtractor(workers=1, timeout_seconds=1.5)
+    yield extractor
+    extractor.shutdown()
+
+
+def _pdf(tmp_path, name, seconds):
+    path = tmp_path / f"{name}.pdf"
+    path.write_text(str(seconds))
+    return str(path)
+
+
+async def _pages(extractor, path):
+    try:
+        return [page async for page in extractor.iter_pages(path, path)]
+    except PdfSkipped as e:
+        return e
+
+
+def test_time_queued_behind_other_files_does_not_count(extractor, tmp_path):
+    paths = [_pdf(tmp_path, f"doc{i}", 0.8) for i in range(3)]
+
+    async def run():
+        # Start the worker first so its start-up isn't charged to a file
+        await _pages(extractor, _pdf(tmp_path, "warmup", 0))
+        return await asyncio.gather(*(_pages(extractor, path) for path in paths))
+
+    # With one worker the third file waits ~1.6s for it, longer than its budget
+    results = asyncio.run(run())
+    assert results == [[f"text of {path}"] for path in paths]
+
+
+def test_stuck_worker_is_skipped_and_the_pool_replaced(extractor, tmp_path):
+    async def run():
+        await _pages(extractor, _pdf(tmp_path, "warmup", 0))
+        executor = extractor._executor
+        stuck = await _pages(extractor, _pdf(tmp_path, "stuck", 30))
+        return executor, stuck, await _pages(extractor, _pdf(tmp_path, "after", 0))
+
+    executor, stuck, after = asyncio.run(run())
+    assert isinstance(stuck, PdfSkipped)
+    assert extractor._executor is not executor
+    assert len(after) == 1
+    with open(tmp_path / "stuck.pdf.pid") as f:
+        assert not _is_running(int(f.read()))
+
+
+def _is_running(pid, wait_seconds=5.0):
+    # The old pool reaps its killed workers in the background
+    deadline = time.monotonic() + wait_seconds
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        time.sleep(0.05)
+    return True
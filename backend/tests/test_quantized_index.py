@@ -0,0 +1,57 @@
+"""Filtering of the int8 vector index."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from src.services.quantized_index import Int8VectorIndex
+
+
+def _index(tmp_path):
+    index = Int8VectorIndex(str(tmp_path / "int8.db"))
+    rng = np.random.default_rng(3)
+    ids, metadatas = [], []
+    for file_number in range(6):
+        for chunk in range(4):
+            ids.append(f"file-{file_number}_{chunk}")
+            metadatas.append({"file_id": f"file-{file_number}", "folder_id": f"folder-{file_number % 2}"})
+    index.add(ids, rng.normal(size=(len(ids), 32)).tolist(), metadatas)
+    return index, rng.normal(size=32).tolist()
+
+
+def _files(chunk_ids):
+    return {chunk_id.split("_")[0] for chunk_id in chunk_ids}
+
+
+def test_filters_by_single_ids_and_id_collections(tmp_path):
+    index, query = _index(tmp_path)
+    assert _files(index.search(query, 50, {"file_id": "file-3"})) == {"file-3"}
+    assert _files(index.search(query, 50, {"file_id": ["file-1", "file-4", "missing"]})) == {"file-1", "file-4"}
+    assert _files(index.search(query, 50, {"folder_id": "folder-1"})) == {"file-1", "file-3", "file-5"}
+    assert index.search(query, 50, {"file_id": "missing"}) == []
+    assert len(index.search(query, 50)) == 24
+
+
+def test_moves_and_removals_update_the_filters(tmp_path):
+    index, query = _index(tmp_path)
+    index.search(query, 1)  # load the in-memory copy
+    index.update_folder("file-0", "folder-new")
+    index.remove_file("file-5")
+
+    assert _files(index.search(query, 50, {"folder_id": "folder-new"})) == {"file-0"}
+    assert _files(index.search(query, 50, {"folder_id": "folder-0"})) == {"file-2", "file-4"}
+    assert _files(index.search(query, 50, {"folder_id": "folder-1"})) == {"file-1", "file-3"}
+
+
+def test_importing_quantize_opens_no_index(tmp_path):
+    path = tmp_path / "int8.db"
+    subprocess.run(
+        [sys.executable, "-c", "from src.services.quantized_index import quantize"],
+        cwd=Path(__file__).resolve().parents[1],
+        env=dict(os.environ, QUANTIZED_INDEX_PATH=str(path)),
+        check=True,
+    )
+    assert not path.exists()
@@ -0,0 +1,65 @@
+"""Single-flight behaviour of the query embedding cache."""
+
+import asyncio
+
+import pytest
+
+from src.tools.query_cache import QueryEmbeddingCache
+
+
+def test_leader_timeout_does_not_cancel_coalesced_waiters():
+    cache = QueryEmbeddingCache()
+    calls = []
+
+    async def compute(query):
+        calls.append(query)
+        await asyncio.sleep(0.3)
+        return [1.0, 2.0]
+
+    async def run():
+        leader = asyncio.wait_for(cache.get_or_compute("Budget  plan", compute), 0.05)
+        follower = asyncio.wait_for(cache.get_or_compute("budget plan", compute), 5)
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(run())
+    assert isinstance(leader_result, asyncio.TimeoutError)
+    assert follower_result == [1.0, 2.0]
+    assert calls == ["budget plan"]
+    # The computation finished despite the leader giving up, so it was cached
+    assert cache.stats()["size"] == 1
+
+
+def test_compute_errors_reach_every_waiter_as_ordinary_exceptions():
+    cache = QueryEmbeddingCache()
+
+    async def compute(query):
+        await asyncio.sleep(0.05)
+        raise RuntimeError("embeddings unavailable")
+
+    async def run():
+        return await asyncio.gather(
+            cache.get_or_compute("q", compute),
+            cache.get_or_compute("q", compute),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.stats()["size"] == 0
+
+
+def test_cancelled_caller_alone_leaves_nothing_inflight():
+    cache = QueryEmbeddingCache()
+
+    async def compute(query):
+        await asyncio.sleep(0.05)
+        return [0.5]
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_compute("q", compute), 0.01)
+        await asyncio.sleep(0.1)
+        return await cache.get_or_compute("q", compute)
+
+    assert asyncio.run(run()) == [0.5]
+    assert cache.stats()["hits"] == 1
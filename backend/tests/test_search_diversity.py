@@ -0,0 +1,57 @@
+"""Candidate pool sizing and MMR re-ranking of search candidates."""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.tools import search_tool
+from src.tools.search_tool import _select_candidates, candidate_pool_size, maximal_marginal_relevance
+from src.utils.tracing import RequestTrace
+
+
+def _candidate(chunk_id, score, embedding):
+    return {"id": chunk_id, "score": score, "text": chunk_id, "metadata": {}, "embedding": np.asarray(embedding, dtype=np.float32)}
+
+
+@pytest.fixture
+def near_duplicates():
+    # Three overlapping chunks of one passage, then two distinct, slightly weaker hits
+    return [
+        _candidate("dup-1", 0.95, [1.0, 0.0, 0.0]),
+        _candidate("dup-2", 0.94, [0.99, 0.01, 0.0]),
+        _candidate("dup-3", 0.93, [0.98, 0.02, 0.0]),
+        _candidate("other-1", 0.80, [0.0, 1.0, 0.0]),
+        _candidate("other-2", 0.75, [0.0, 0.0, 1.0]),
+    ]
+
+
+def _select(candidates, limit):
+    return [c["id"] for c in asyncio.run(_select_candidates(candidates, limit, RequestTrace("search", "q")))]
+
+
+def test_mmr_demotes_near_duplicates(monkeypatch, near_duplicates):
+    monkeypatch.setattr(search_tool, "MMR_LAMBDA", 0.5)
+    assert _select(near_duplicates, 3) == ["dup-1", "other-1", "other-2"]
+
+
+def test_mmr_lambda_one_keeps_relevance_order(monkeypatch, near_duplicates):
+    monkeypatch.setattr(search_tool, "MMR_LAMBDA", 1.0)
+    assert _select(near_duplicates, 3) == ["dup-1", "dup-2", "dup-3"]
+    relevance = np.array([c["score"] for c in near_duplicates], dtype=np.float32)
+    vectors = np.stack([c["embedding"] for c in near_duplicates])
+    assert maximal_marginal_relevance(relevance, vectors, 5, 1.0) == [0, 1, 2, 3, 4]
+
+
+def test_mmr_handles_empty_and_short_pools():
+    assert maximal_marginal_relevance(np.array([]), np.zeros((0, 3)), 3, 0.5) == []
+    assert maximal_marginal_relevance(np.array([0.2, 0.9]), np.eye(2), 5, 0.5) == [1, 0]
+
+
+def test_candidate_pool_size_is_clamped(monkeypatch):
+    monkeypatch.setattr(search_tool, "CANDIDATE_POOL_FACTOR", 4)
+    monkeypatch.setattr(search_tool, "CANDIDATE_POOL_MIN", 20)
+    monkeypatch.setattr(search_tool, "CANDIDATE_POOL_MAX", 200)
+    assert candidate_pool_size(1) == 20
+    assert candidate_pool_size(10) == 40
+    assert candidate_pool_size(1000) == 200
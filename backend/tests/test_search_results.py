@@ -0,0 +1,41 @@
+"""File-level metadata is joined into search results from the index state."""
+
+import asyncio
+
+from src.services.index_state import IndexStateStore
+from src.tools import search_tool
+from src.tools.search_tool import _attach_file_metadata
+from src.types import SearchResult
+from src.utils.tracing import RequestTrace
+
+
+def _result(file_id):
+    return SearchResult(
+        id=f"{file_id}_chunk_0", score=0.9, text="text", metadata={"file_id": file_id, "chunk_number": 0}, highlights=[]
+    )
+
+
+def test_results_carry_file_metadata_and_tolerate_missing_rows(tmp_path, monkeypatch):
+    state = IndexStateStore(str(tmp_path / "state.db"))
+    state.record_file(
+        {
+            "id": "known",
+            "name": "Budget",
+            "mimeType": "application/pdf",
+            "webViewLink": "https://drive.example/known",
+        },
+        path="Finance/Budget",
+    )
+    monkeypatch.setattr(search_tool, "index_state", state)
+
+    known, missing = asyncio.run(
+        _attach_file_metadata([_result("known"), _result("missing")], RequestTrace("search", "q"))
+    )
+
+    assert known.metadata["path"] == "Finance/Budget"
+    assert known.metadata["mime_type"] == "application/pdf"
+    assert known.metadata["web_view_link"] == "https://drive.example/known"
+    assert known.metadata["file_name"] == "Budget"
+    # Columns Drive didn't fill are left out rather than set to None
+    assert "size" not in known.metadata
+    assert missing.metadata == {"file_id": "missing", "chunk_number": 0}
@@ -0,0 +1,40 @@
+"""The search route returns results, and the trace in its body when asked for it."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routes import search as search_route
+from src.types import SearchResult
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def search_documents(query, folder_id=None, file_id=None, limit=10, mode=None, trace=None):
+        with trace.span("vector_query"):
+            trace.count("vector_candidates", 3)
+        return [SearchResult(id="file_chunk_0", score=0.8, text=query, metadata={"file_id": "file"}, highlights=[])]
+
+    monkeypatch.setattr(search_route, "search_documents", search_documents)
+    app = FastAPI()
+    app.include_router(search_route.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_debug_trace_is_returned_in_the_body(client):
+    response = client.post("/api/search", json={"query": "budget", "debug": True})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["id"] for result in body["results"]] == ["file_chunk_0"]
+    assert body["debug"]["counts"] == {"vector_candidates": 3}
+    assert "vector_query" in body["debug"]["stages_ms"]
+    assert "vector_query" in response.headers["Server-Timing"]
+    assert "X-Search-Trace" not in response.headers
+
+
+def test_debug_is_omitted_by_default(client):
+    response = client.post("/api/search", json={"query": "budget"})
+
+    assert response.json()["debug"] is None
+    assert "Server-Timing" not in response.headers
@@ -3,6 +3,7 @@ import type {
   DriveFile,
   DriveFolder,
   SearchRequest,
+  SearchResponse,
   SearchResult,
   ChatRequest,
   ChatResponse,
@@ -58,7 +59,7 @@ export const driveApi = {
   // Search endpoints
   searchDocuments: async (request: SearchRequest): Promise<SearchResult[]> => {
     const response = await api.post('/search', request);
-    return response.data;
+    return (response.data as SearchResponse).results;
   },
 
   // Chat endpoint
@@ -46,6 +46,10 @@ export interface SearchRequest {
   limit?: number;
 }
 
+export interface SearchResponse {
+  results: SearchResult[];
+}
+
 export interface ChatRequest {
   message: string;
   conversationHistory?: ChatMessage[];